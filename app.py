@@ -1,7 +1,6 @@
 import os
 from flask import Flask, send_from_directory
 from flask_mail import Mail
-from flask_bcrypt import Bcrypt
 from flask_login import LoginManager
 from config import Config
 from routes.auth_routes import auth_bp 
@@ -10,21 +9,25 @@ from routes.pdf_routes import pdf_bp
 from routes.share_routes import share_bp
 from routes.user_routes import user_bp
 from utils.database import get_db_pool
+from utils.job_queue import get_job_queue
+from utils.mail_outbox import get_mail_outbox
+from utils.metrics import get_metrics
+from utils.password_hasher import get_password_hasher
+from utils.query_tracer import get_query_tracer
+from utils.user_cache import get_user_cache, load_cached_user
 
 def create_application():
     app = Flask(__name__)
     app.config.from_object(Config)
     
     mail = Mail(app)
-    bcrypt = Bcrypt(app)
     login_manager = LoginManager(app)
     login_manager.login_view = 'auth_routes.login'
 
     @login_manager.user_loader
     def load_user(user_id):
-        from models import User
         try:
-            user = User.get_by_id(user_id)
+            user = load_cached_user(user_id)
             if not user:
                 print(f"User with ID {user_id} not found")
                 return None
@@ -33,12 +36,36 @@ def create_application():
             print(f"Error loading user: {e}")
             return None
 
+    # First, so its worker processes fork before any background threads exist
+    password_hasher = get_password_hasher()
+    password_hasher.init_app(app)
+    app.password_hasher = password_hasher
+
+    metrics = get_metrics()
+    metrics.init_app(app)
+    app.metrics = metrics
+
+    query_tracer = get_query_tracer()
+    query_tracer.init_app(app)
+    app.query_tracer = query_tracer
+
     db_pool = get_db_pool()
     db_pool.init_app(app)
     app.db_pool = db_pool 
+
+    user_cache = get_user_cache()
+    user_cache.init_app(app)
+    app.user_cache = user_cache
+
+    job_queue = get_job_queue()
+    job_queue.init_app(app)
+    app.job_queue = job_queue
+
+    mail_outbox = get_mail_outbox()
+    mail_outbox.init_app(app)
+    app.mail_outbox = mail_outbox
     
     app.mail = mail
-    app.bcrypt = bcrypt
     app.login_manager = login_manager
     
     app.register_blueprint(auth_bp)
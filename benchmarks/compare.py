@@ -0,0 +1,96 @@
+"""Compare two run.py results and flag regressions.
+
+    python benchmarks/compare.py benchmarks/results/<base>.json benchmarks/results/<new>.json
+
+For every route measured at the same concurrency in both runs, prints the
+p50/p95/p99 latency and requests per second side by side. A route regresses
+when its p95 grows, or its throughput drops, by more than --threshold
+percent (and the p95 change exceeds --min-delta-ms, so noise on very fast
+routes doesn't count). Exits with status 1 if anything regressed.
+"""
+import argparse
+import sys
+
+from common import load_json
+
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'rps')
+
+
+def change(base, new):
+    if base in (None, 0) or new is None:
+        return None
+    return (new - base) / base * 100
+
+
+def is_regression(base, new, threshold, min_delta_ms):
+    p95 = change(base['p95_ms'], new['p95_ms'])
+    if p95 is not None and p95 > threshold and new['p95_ms'] - base['p95_ms'] > min_delta_ms:
+        return True
+    rps = change(base['rps'], new['rps'])
+    return rps is not None and rps < -threshold
+
+
+def compare(base, new, threshold, min_delta_ms):
+    """Rows of (concurrency, route, {metric: (base, new, % change)}, regressed)"""
+    new_levels = {level['concurrency']: level for level in new['levels']}
+    rows = []
+    for base_level in base['levels']:
+        new_level = new_levels.get(base_level['concurrency'])
+        if new_level is None:
+            continue
+        routes = dict(base_level['routes'], TOTAL=base_level['total'])
+        new_routes = dict(new_level['routes'], TOTAL=new_level['total'])
+        for route, base_stats in routes.items():
+            new_stats = new_routes.get(route)
+            if new_stats is None or route == 'login':
+                continue
+            values = {metric: (base_stats[metric], new_stats[metric], change(base_stats[metric], new_stats[metric]))
+                      for metric in METRICS}
+            rows.append((base_level['concurrency'], route, values,
+                         is_regression(base_stats, new_stats, threshold, min_delta_ms)))
+    return rows
+
+
+def describe(run):
+    dirty = ' (dirty)' if run.get('dirty') else ''
+    label = f" - {run['label']}" if run.get('label') else ''
+    return f"{run['commit']}{dirty} at {run['started_at']}{label}"
+
+
+def cell(values):
+    base, new, pct = values
+    if base is None or new is None:
+        return f"{'-':>22}"
+    pct_text = f"{pct:+.0f}%" if pct is not None else ''
+    return f"{base:>8.1f}{new:>8.1f}{pct_text:>6}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=10, help='percent change that counts as a regression')
+    parser.add_argument('--min-delta-ms', type=float, default=2, help='ignore p95 changes smaller than this')
+    args = parser.parse_args()
+
+    base, new = load_json(args.base), load_json(args.new)
+    print(f"base: {describe(base)}")
+    print(f"new:  {describe(new)}")
+    if base.get('volumes') != new.get('volumes'):
+        print(f"warning: seeded volumes differ ({base.get('volumes')} vs {new.get('volumes')})")
+
+    rows = compare(base, new, args.threshold, args.min_delta_ms)
+    print(f"\n{'conc':>4}  {'route':<16}" + ''.join(f"{metric:>22}" for metric in METRICS))
+    for concurrency, route, values, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{concurrency:>4}  {route:<16}" + ''.join(cell(values[m]) for m in METRICS) + flag)
+
+    regressions = [row for row in rows if row[3]]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:g}%")
+        sys.exit(1)
+    print('\nNo regressions')
+
+
+if __name__ == '__main__':
+    main()
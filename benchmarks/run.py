@@ -0,0 +1,282 @@
+"""Drive a running instance of the app through the core user flows and report latency per route.
+
+    python benchmarks/seed.py
+    gunicorn app:app --worker-class gthread --workers 1 --threads 64 &
+    python benchmarks/run.py --base-url http://127.0.0.1:8000 --concurrency 1,8,32 --duration 30
+
+Each virtual user logs in as its own seeded account over a keep-alive
+connection, then loops over a weighted mix of dashboard, upload, view,
+comment and shared-link requests until the level's time is up. Requests
+made during --warmup are not counted. Results (p50/p95/p99 and requests
+per second per route and level, with the commit they were taken at) go to
+benchmarks/results/<commit>-<time>.json for compare.py.
+"""
+import argparse
+import http.client
+import json
+import math
+import random
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from common import DEFAULT_MANIFEST, RESULTS_DIR, git_revision, load_json, make_pdf, write_json
+
+# Flow -> weight in the mix
+FLOWS = {
+    'dashboard': 25,
+    'dashboard_page': 10,
+    'view': 20,
+    'comments': 15,
+    'comment': 10,
+    'shared_view': 15,
+    'upload': 5,
+}
+# Form posts answer with a redirect; everything else should not redirect
+# (a redirect there means the session or the file was lost)
+EXPECTED_STATUS = {'login': {302}, 'upload': {302}}
+OK_STATUSES = {200, 304}
+
+
+class Client:
+    """One virtual user: a keep-alive connection and its cookies"""
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.https = parts.scheme == 'https'
+        self.timeout = timeout
+        self.cookies = {}
+        self.conn = None
+
+    def _connect(self):
+        factory = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        self.conn = factory(self.host, self.port, timeout=self.timeout)
+        self.conn.connect()
+        # Headers and body go out in separate writes; don't let Nagle hold the second
+        self.conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def request(self, method, path, body=None, headers=None):
+        """(status, body bytes, seconds); redirects are returned, not followed"""
+        headers = dict(headers or {})
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f"{k}={v}" for k, v in self.cookies.items())
+        started = time.perf_counter()
+        for attempt in range(2):
+            if self.conn is None:
+                self._connect()
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                # The server closed an idle keep-alive connection; retry once on a new one
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+        elapsed = time.perf_counter() - started
+        for header in response.headers.get_all('Set-Cookie') or []:
+            cookie = SimpleCookie()
+            cookie.load(header)
+            for name, morsel in cookie.items():
+                self.cookies[name] = morsel.value
+        if response.getheader('Connection', '').lower() == 'close':
+            self.conn.close()
+            self.conn = None
+        return response.status, data, elapsed
+
+
+class VirtualUser(threading.Thread):
+    def __init__(self, index, args, manifest, recorder, deadline):
+        super().__init__(name=f"vu-{index}", daemon=True)
+        self.args = args
+        self.rng = random.Random(args.random_seed * 1000 + index)
+        self.account = manifest['users'][index % len(manifest['users'])]
+        self.password = manifest['password']
+        self.shares = manifest['shares']
+        self.recorder = recorder
+        self.deadline = deadline
+        self.client = Client(args.base_url, args.timeout)
+        self.uploads = 0
+        self.next_cursor = None
+
+    def run(self):
+        login = self.call('login', 'POST', '/login',
+                          body=urlencode({'email': self.account['email'], 'password': self.password}),
+                          headers={'Content-Type': 'application/x-www-form-urlencoded'})
+        if login is None:
+            return
+        names, weights = zip(*FLOWS.items())
+        while time.monotonic() < self.deadline:
+            flow = self.rng.choices(names, weights)[0]
+            getattr(self, f"flow_{flow}")()
+
+    def call(self, route, method, path, body=None, headers=None):
+        try:
+            status, data, elapsed = self.client.request(method, path, body, headers)
+        except Exception:
+            self.recorder.record(route, None, False)
+            return None
+        ok = status in EXPECTED_STATUS.get(route, OK_STATUSES)
+        self.recorder.record(route, elapsed, ok)
+        return data if ok else None
+
+    def own_file(self):
+        return self.rng.choice(self.account['files'])
+
+    def flow_dashboard(self):
+        self.call('dashboard', 'GET', '/dashboard')
+
+    def flow_dashboard_page(self):
+        query = f"?cursor={self.next_cursor}" if self.next_cursor else ''
+        data = self.call('dashboard_page', 'GET', f"/dashboard/files{query}")
+        if data:
+            self.next_cursor = json.loads(data).get('next_cursor')
+
+    def flow_view(self):
+        self.call('view', 'GET', f"/view/{self.own_file()}")
+
+    def flow_comments(self):
+        self.call('comments', 'GET', f"/{self.own_file()}")
+
+    def flow_comment(self):
+        body = json.dumps({'file_id': self.own_file(), 'content': f"Benchmark comment {uuid.uuid4().hex[:8]}"})
+        self.call('comment', 'POST', '/add', body=body, headers={'Content-Type': 'application/json'})
+
+    def flow_shared_view(self):
+        if self.shares:
+            self.call('shared_view', 'GET', f"/shared/{self.rng.choice(self.shares)['token']}")
+
+    def flow_upload(self):
+        self.uploads += 1
+        boundary = uuid.uuid4().hex
+        pdf = make_pdf(f"{self.name}-{self.uploads}-{uuid.uuid4().hex}")
+        body = (f"--{boundary}\r\n"
+                f'Content-Disposition: form-data; name="file"; filename="bench-{self.uploads}.pdf"\r\n'
+                "Content-Type: application/pdf\r\n\r\n").encode() + pdf + f"\r\n--{boundary}--\r\n".encode()
+        self.call('upload', 'POST', '/upload', body=body,
+                  headers={'Content-Type': f"multipart/form-data; boundary={boundary}"})
+
+
+class Recorder:
+    """Latencies per route, ignoring anything before the end of warmup"""
+
+    def __init__(self, measure_from):
+        self.measure_from = measure_from
+        self.samples = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def record(self, route, elapsed, ok):
+        if time.monotonic() < self.measure_from and route != 'login':
+            return
+        with self._lock:
+            if ok:
+                self.samples.setdefault(route, []).append(elapsed)
+            else:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of a sorted list"""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def summarize(latencies, errors, seconds):
+    ordered = sorted(latencies)
+    ms = lambda value: round(value * 1000, 2) if value is not None else None
+    return {
+        'count': len(ordered),
+        'errors': errors,
+        'rps': round(len(ordered) / seconds, 2) if seconds > 0 else None,
+        'mean_ms': ms(sum(ordered) / len(ordered)) if ordered else None,
+        'p50_ms': ms(percentile(ordered, 0.50)),
+        'p95_ms': ms(percentile(ordered, 0.95)),
+        'p99_ms': ms(percentile(ordered, 0.99)),
+        'max_ms': ms(ordered[-1]) if ordered else None,
+    }
+
+
+def run_level(concurrency, args, manifest):
+    started = time.monotonic()
+    measure_from = started + args.warmup
+    deadline = measure_from + args.duration
+    recorder = Recorder(measure_from)
+    users = [VirtualUser(i, args, manifest, recorder, deadline) for i in range(concurrency)]
+    for user in users:
+        user.start()
+    for user in users:
+        user.join(args.duration + args.warmup + args.timeout * 2)
+
+    routes = {}
+    for route in sorted(set(recorder.samples) | set(recorder.errors)):
+        # Logins all happen up front, so a rate for them means nothing
+        seconds = 0 if route == 'login' else args.duration
+        routes[route] = summarize(recorder.samples.get(route, []), recorder.errors.get(route, 0), seconds)
+    measured = [s for route, samples in recorder.samples.items() if route != 'login' for s in samples]
+    errors = sum(count for route, count in recorder.errors.items() if route != 'login')
+    return {
+        'concurrency': concurrency,
+        'duration_s': args.duration,
+        'routes': routes,
+        'total': summarize(measured, errors, args.duration),
+    }
+
+
+def print_level(level):
+    print(f"\nconcurrency {level['concurrency']}, {level['duration_s']}s")
+    print(f"{'route':<16}{'count':>8}{'err':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for route, stats in list(level['routes'].items()) + [('TOTAL', level['total'])]:
+        rps, p50, p95, p99 = (stats[key] if stats[key] is not None else '-'
+                              for key in ('rps', 'p50_ms', 'p95_ms', 'p99_ms'))
+        print(f"{route:<16}{stats['count']:>8}{stats['errors']:>6}{rps:>9}{p50:>10}{p95:>10}{p99:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST)
+    parser.add_argument('--concurrency', default='1,8,32', help='comma-separated virtual user counts')
+    parser.add_argument('--duration', type=float, default=30, help='measured seconds per level')
+    parser.add_argument('--warmup', type=float, default=5, help='unmeasured seconds before each level')
+    parser.add_argument('--timeout', type=float, default=30, help='per-request timeout')
+    parser.add_argument('--random-seed', type=int, default=1)
+    parser.add_argument('--label', help='free-form note stored with the results')
+    parser.add_argument('--output', help='results file (default benchmarks/results/<commit>-<time>.json)')
+    args = parser.parse_args()
+
+    manifest = load_json(args.manifest)
+    commit, dirty = git_revision()
+    now = datetime.now()
+    levels = []
+    for concurrency in (int(n) for n in args.concurrency.split(',')):
+        level = run_level(concurrency, args, manifest)
+        print_level(level)
+        levels.append(level)
+
+    results = {
+        'commit': commit,
+        'dirty': dirty,
+        'label': args.label,
+        'started_at': now.isoformat(timespec='seconds'),
+        'base_url': args.base_url,
+        'flows': FLOWS,
+        'volumes': manifest.get('volumes'),
+        'levels': levels,
+    }
+    output = args.output or f"{RESULTS_DIR}/{commit}{'-dirty' if dirty else ''}-{now:%Y%m%d-%H%M%S}.json"
+    write_json(output, results)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+"""Seed the configured MySQL database with benchmark users, files, shares and comments.
+
+    python benchmarks/seed.py --users 50 --files-per-user 40 --comments-per-file 20
+
+Benchmark accounts are bench-<n>@example.com and are replaced on every run,
+so the data set is the same for the same arguments and --random-seed. The
+ids and share tokens that run.py needs are written to the manifest
+(benchmarks/seed.json by default).
+"""
+import argparse
+import hashlib
+import os
+import random
+import secrets
+import sys
+from datetime import datetime, timedelta
+
+from common import BENCH_PASSWORD, DEFAULT_MANIFEST, REPO_DIR, make_pdf, write_json
+
+sys.path.insert(0, REPO_DIR)
+
+import bcrypt
+import mysql.connector
+from config import Config
+
+EMAIL_PATTERN = 'bench-%@example.com'
+BATCH = 1000
+
+
+def connect():
+    return mysql.connector.connect(
+        host=Config.DB_HOST,
+        user=Config.DB_USER,
+        password=Config.DB_PASSWORD,
+        database=Config.DB_NAME,
+    )
+
+
+def insert_many(cursor, sql, rows):
+    for start in range(0, len(rows), BATCH):
+        cursor.executemany(sql, rows[start:start + BATCH])
+
+
+def reset(cursor, content_hash):
+    """Drop earlier benchmark data; everything else cascades from users"""
+    cursor.execute("DELETE FROM users WHERE email LIKE %s", (EMAIL_PATTERN,))
+    cursor.execute("""
+        DELETE FROM pdf_blobs
+        WHERE content_hash = %s
+          AND NOT EXISTS (SELECT 1 FROM pdf_files WHERE content_hash = %s)
+    """, (content_hash, content_hash))
+
+
+def seed(args):
+    rng = random.Random(args.random_seed)
+    pdf = make_pdf('seed')
+    content_hash = hashlib.sha256(pdf).hexdigest()
+    stored_name = f"{content_hash}.pdf"
+    os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
+    with open(os.path.join(Config.UPLOAD_FOLDER, stored_name), 'wb') as f:
+        f.write(pdf)
+
+    conn = connect()
+    cursor = conn.cursor(dictionary=True)
+    reset(cursor, content_hash)
+
+    # One hash for everyone; the cost matches what the app would produce
+    rounds = Config.PASSWORD_HASH_ROUNDS or 12
+    password = bcrypt.hashpw(BENCH_PASSWORD.encode(), bcrypt.gensalt(rounds)).decode()
+    insert_many(cursor, "INSERT INTO users (name, email, password) VALUES (%s, %s, %s)",
+                [(f"Bench User {n}", f"bench-{n}@example.com", password) for n in range(args.users)])
+    cursor.execute("SELECT id, email FROM users WHERE email LIKE %s ORDER BY id", (EMAIL_PATTERN,))
+    users = cursor.fetchall()
+    user_ids = [user['id'] for user in users]
+
+    file_count = len(users) * args.files_per_user
+    cursor.execute("""
+        INSERT INTO pdf_blobs (content_hash, filepath, byte_size, ref_count, text_indexed_at)
+        VALUES (%s, %s, %s, %s, NOW())
+        ON DUPLICATE KEY UPDATE ref_count = ref_count + VALUES(ref_count)
+    """, (content_hash, stored_name, len(pdf), file_count))
+
+    now = datetime.now()
+    file_rows = []
+    for user_id in user_ids:
+        for n in range(args.files_per_user):
+            uploaded = now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+            file_rows.append((user_id, f"report-{user_id}-{n}.pdf", stored_name, content_hash, len(pdf),
+                              uploaded, uploaded))
+    # Metadata as process_upload would have stored it for the one-page seed PDF
+    insert_many(cursor, """
+        INSERT INTO pdf_files
+            (user_id, filename, filepath, content_hash, original_size, page_count, metadata_at,
+             upload_date, upload_time)
+        VALUES (%s, %s, %s, %s, %s, 1, NOW(), %s, %s)
+    """, file_rows)
+    cursor.execute("""
+        SELECT f.id, f.user_id FROM pdf_files f
+        JOIN users u ON u.id = f.user_id
+        WHERE u.email LIKE %s
+        ORDER BY f.id
+    """, (EMAIL_PATTERN,))
+    files = cursor.fetchall()
+
+    shared = rng.sample(files, int(len(files) * args.share_ratio))
+    shares = [(f['id'], secrets.token_urlsafe(32), f['user_id']) for f in shared]
+    insert_many(cursor, "INSERT INTO shared_files (file_id, share_token, created_by) VALUES (%s, %s, %s)", shares)
+
+    seed_comments(cursor, rng, files, user_ids, args)
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+    files_by_user = {}
+    for f in files:
+        files_by_user.setdefault(f['user_id'], []).append(f['id'])
+    return {
+        'seeded_at': now.isoformat(timespec='seconds'),
+        'random_seed': args.random_seed,
+        'volumes': {
+            'users': len(users),
+            'files': len(files),
+            'shares': len(shares),
+            'comments': len(files) * args.comments_per_file,
+        },
+        'password': BENCH_PASSWORD,
+        'users': [{'email': user['email'], 'files': files_by_user.get(user['id'], [])} for user in users],
+        'shares': [{'file_id': file_id, 'token': token} for file_id, token, _ in shares],
+    }
+
+
+def seed_comments(cursor, rng, files, user_ids, args):
+    """Top-level comments, then replies one level down, with paths and sync events like the app writes"""
+    replies_per_file = int(args.comments_per_file * args.reply_ratio)
+    roots_per_file = args.comments_per_file - replies_per_file
+    insert_many(cursor, """
+        INSERT INTO comments (file_id, user_id, content, depth) VALUES (%s, %s, %s, 0)
+    """, [(f['id'], rng.choice(user_ids), f"Comment {n} on file {f['id']}")
+          for f in files for n in range(roots_per_file)])
+    cursor.execute("""
+        UPDATE comments c
+        JOIN pdf_files f ON f.id = c.file_id
+        JOIN users u ON u.id = f.user_id
+        SET c.path = CONCAT(LPAD(c.id, 10, '0'), '/')
+        WHERE u.email LIKE %s AND c.path = ''
+    """, (EMAIL_PATTERN,))
+
+    if replies_per_file and roots_per_file:
+        cursor.execute("""
+            SELECT c.id, c.file_id FROM comments c
+            JOIN pdf_files f ON f.id = c.file_id
+            JOIN users u ON u.id = f.user_id
+            WHERE u.email LIKE %s
+        """, (EMAIL_PATTERN,))
+        roots = {}
+        for row in cursor.fetchall():
+            roots.setdefault(row['file_id'], []).append(row['id'])
+        insert_many(cursor, """
+            INSERT INTO comments (file_id, user_id, content, parent_id, depth) VALUES (%s, %s, %s, %s, 1)
+        """, [(file_id, rng.choice(user_ids), f"Reply {n}", rng.choice(ids))
+              for file_id, ids in roots.items() for n in range(replies_per_file)])
+        cursor.execute("""
+            UPDATE comments c
+            JOIN comments p ON p.id = c.parent_id
+            JOIN pdf_files f ON f.id = c.file_id
+            JOIN users u ON u.id = f.user_id
+            SET c.path = CONCAT(p.path, LPAD(c.id, 10, '0'), '/')
+            WHERE u.email LIKE %s AND c.path = ''
+        """, (EMAIL_PATTERN,))
+
+    cursor.execute("""
+        INSERT INTO comment_events (file_id, comment_id, event)
+        SELECT c.file_id, c.id, 'added' FROM comments c
+        JOIN pdf_files f ON f.id = c.file_id
+        JOIN users u ON u.id = f.user_id
+        WHERE u.email LIKE %s
+        ORDER BY c.id
+    """, (EMAIL_PATTERN,))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--files-per-user', type=int, default=40)
+    parser.add_argument('--comments-per-file', type=int, default=20)
+    parser.add_argument('--reply-ratio', type=float, default=0.5, help='share of comments that are replies')
+    parser.add_argument('--share-ratio', type=float, default=0.25, help='share of files with a share link')
+    parser.add_argument('--random-seed', type=int, default=1)
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST)
+    args = parser.parse_args()
+
+    manifest = seed(args)
+    write_json(args.manifest, manifest)
+    volumes = ', '.join(f"{count} {name}" for name, count in manifest['volumes'].items())
+    print(f"Seeded {volumes}; manifest written to {args.manifest}")
+
+
+if __name__ == '__main__':
+    main()
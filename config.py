@@ -13,14 +13,153 @@ class Config:
     DB_USER = os.getenv('DB_USER') or 'root'
     DB_PASSWORD = os.getenv('DB_PASSWORD') or ''
     DB_NAME = os.getenv('DB_NAME') or 'pdf_collab'
+    DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 2))
+    DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 20))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 3600))
+    DB_POOL_IDLE_TIMEOUT = int(os.getenv('DB_POOL_IDLE_TIMEOUT', 300))
+    DB_POOL_PING_INTERVAL = int(os.getenv('DB_POOL_PING_INTERVAL', 30))
+    # Debug: log the checkout stack of connections held longer than this
+    DB_LEAK_THRESHOLD_MS = int(os.getenv('DB_LEAK_THRESHOLD_MS', 0)) or None
+
+    # Flask-Login identity cache; USER_CACHE_REDIS_URL (needs redis-py) shares it across workers
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 300))
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 10000))
+    USER_CACHE_REDIS_URL = os.getenv('USER_CACHE_REDIS_URL')
     MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
     MAIL_PORT = int(os.getenv('MAIL_PORT', 587))
     MAIL_USE_TLS = os.getenv('MAIL_USE_TLS', 'true').lower() in ['true', 'on', '1']
     MAIL_USERNAME = os.getenv('MAIL_USERNAME')
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER', 'noreply@yourdomain.com')
+
+    # Outbound mail is queued in mail_outbox; set MAIL_WORKERS=0 to deliver only from worker.py
+    MAIL_WORKERS = int(os.getenv('MAIL_WORKERS', 1))
+    MAIL_BATCH_SIZE = int(os.getenv('MAIL_BATCH_SIZE', 50))
+    MAIL_POLL_INTERVAL = int(os.getenv('MAIL_POLL_INTERVAL', 5))
+    MAIL_RATE_PER_MINUTE = int(os.getenv('MAIL_RATE_PER_MINUTE', 120))
+    MAIL_RETRY_BASE_SECONDS = int(os.getenv('MAIL_RETRY_BASE_SECONDS', 60))
+    MAIL_RETRY_MAX_SECONDS = int(os.getenv('MAIL_RETRY_MAX_SECONDS', 3600))
+    MAIL_STALE_SECONDS = int(os.getenv('MAIL_STALE_SECONDS', 300))
+    MAIL_RETENTION_DAYS = int(os.getenv('MAIL_RETENTION_DAYS', 7))
     UPLOAD_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), 'uploads'))
     ALLOWED_EXTENSIONS = {'pdf'}
+
+    # Resumable chunked uploads
+    MAX_UPLOAD_SIZE = int(os.getenv('MAX_UPLOAD_SIZE', 512 * 1024 * 1024))
+    UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024))
+    UPLOAD_SESSION_TTL_HOURS = int(os.getenv('UPLOAD_SESSION_TTL_HOURS', 24))
+
+    # Batch uploads (many PDFs, or ZIP archives of them, in one request)
+    BATCH_UPLOAD_MAX_FILES = int(os.getenv('BATCH_UPLOAD_MAX_FILES', 500))
+    BATCH_UPLOAD_MAX_BYTES = int(os.getenv('BATCH_UPLOAD_MAX_BYTES', 2 * 1024 * 1024 * 1024))
+    BATCH_UPLOAD_WORKERS = int(os.getenv('BATCH_UPLOAD_WORKERS', 4))
+    # Largest request body Flask will read (a full batch plus multipart overhead);
+    # bigger requests get a 413 before anything is spooled to disk
+    MAX_CONTENT_LENGTH = max(MAX_UPLOAD_SIZE, BATCH_UPLOAD_MAX_BYTES) + 16 * 1024 * 1024
+
+    # PDF serving; set PDF_SENDFILE_BACKEND to 'nginx' (X-Accel-Redirect) or
+    # 'apache' (X-Sendfile) to let the front proxy stream the bytes
+    PDF_SENDFILE_BACKEND = os.getenv('PDF_SENDFILE_BACKEND', '')
+    PDF_ACCEL_REDIRECT_PREFIX = os.getenv('PDF_ACCEL_REDIRECT_PREFIX', '/protected-uploads/')
+    PDF_CACHE_MAX_AGE = int(os.getenv('PDF_CACHE_MAX_AGE', 3600))
+    PDF_MAX_RANGES = int(os.getenv('PDF_MAX_RANGES', 16))
+
+    # Dashboard listing
+    DASHBOARD_PAGE_SIZE = int(os.getenv('DASHBOARD_PAGE_SIZE', 24))
+
+    # Comment threads; InnoDB stops cascading deletes 15 levels down
+    COMMENT_THREADS_PER_PAGE = int(os.getenv('COMMENT_THREADS_PER_PAGE', 20))
+    COMMENT_MAX_DEPTH = min(int(os.getenv('COMMENT_MAX_DEPTH', 12)), 14)
+    COMMENT_SYNC_BATCH_SIZE = int(os.getenv('COMMENT_SYNC_BATCH_SIZE', 500))
+    # Sync cursors stay this far behind the newest comment event, so one whose
+    # transaction commits late is sent again rather than skipped
+    COMMENT_SYNC_SETTLE_SECONDS = int(os.getenv('COMMENT_SYNC_SETTLE_SECONDS', 5))
+
+    # gunicorn gthread threads in the single web process (read by the Procfile/Dockerfile)
+    WEB_THREADS = int(os.getenv('WEB_THREADS', 64))
+
+    # Live comment streams (Server-Sent Events); each open stream holds a server
+    # thread, so at most half the threads may stream and the rest keep serving pages
+    LIVE_MAX_SUBSCRIBERS = min(int(os.getenv('LIVE_MAX_SUBSCRIBERS', WEB_THREADS // 4)), WEB_THREADS // 2)
+    LIVE_HEARTBEAT_SECONDS = int(os.getenv('LIVE_HEARTBEAT_SECONDS', 15))
+    LIVE_STREAM_MAX_SECONDS = int(os.getenv('LIVE_STREAM_MAX_SECONDS', 300))
+
+    # Share-link token lookups; revoked or refreshed links stop resolving in
+    # other processes within SHARE_CACHE_TTL
+    SHARE_CACHE_TTL = int(os.getenv('SHARE_CACHE_TTL', 60))
+    SHARE_CACHE_NEGATIVE_TTL = int(os.getenv('SHARE_CACHE_NEGATIVE_TTL', 30))
+    SHARE_CACHE_SIZE = int(os.getenv('SHARE_CACHE_SIZE', 10000))
+
+    # Bulk share-by-email
+    SHARE_MAX_RECIPIENTS = int(os.getenv('SHARE_MAX_RECIPIENTS', 500))
+    SHARE_MAX_CSV_BYTES = int(os.getenv('SHARE_MAX_CSV_BYTES', 256 * 1024))
+
+    # Password hashing (bcrypt in a process pool). PASSWORD_HASH_ROUNDS=0 picks the
+    # cost at startup so one hash takes about PASSWORD_HASH_TARGET_MS; stored hashes
+    # with a lower cost are upgraded on the next login
+    PASSWORD_HASH_ROUNDS = int(os.getenv('PASSWORD_HASH_ROUNDS', 12))
+    PASSWORD_HASH_TARGET_MS = int(os.getenv('PASSWORD_HASH_TARGET_MS', 250))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', min(os.cpu_count() or 1, 4)))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 16))
+    PASSWORD_HASH_TIMEOUT = int(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+
+    # Prometheus metrics on /metrics, served only when METRICS_TOKEN is set (send it as a bearer token).
+    # PROFILE_SLOW_REQUEST_MS > 0 samples request stacks and writes folded
+    # stacks for requests slower than that to PROFILE_DIR
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ['true', 'on', '1']
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    PROFILE_SLOW_REQUEST_MS = int(os.getenv('PROFILE_SLOW_REQUEST_MS', 0))
+    PROFILE_SAMPLE_INTERVAL_MS = int(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', 10))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+
+    # SQL tracing: statements repeated QUERY_REPEAT_THRESHOLD+ times in one request
+    # (likely N+1) and statements over SLOW_QUERY_MS (with EXPLAIN) are logged.
+    # QUERY_TRACE_HEADER adds X-Query-Summary to responses; unset follows debug mode
+    QUERY_TRACE_ENABLED = os.getenv('QUERY_TRACE_ENABLED', 'true').lower() in ['true', 'on', '1']
+    QUERY_REPEAT_THRESHOLD = int(os.getenv('QUERY_REPEAT_THRESHOLD', 5))
+    SLOW_QUERY_MS = int(os.getenv('SLOW_QUERY_MS', 250))
+    SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'true').lower() in ['true', 'on', '1']
+    QUERY_TRACE_LOG_INTERVAL = int(os.getenv('QUERY_TRACE_LOG_INTERVAL', 300))
+    QUERY_TRACE_HEADER = os.getenv('QUERY_TRACE_HEADER')
+
+    # Rendered dashboard cards and comment threads, keyed on data versions
+    FRAGMENT_CACHE_SIZE = int(os.getenv('FRAGMENT_CACHE_SIZE', 2000))
+    FRAGMENT_CACHE_TTL = int(os.getenv('FRAGMENT_CACHE_TTL', 600))
+
+    # Full-text search
+    SEARCH_RESULT_LIMIT = int(os.getenv('SEARCH_RESULT_LIMIT', 50))
+
+    # Background jobs; set JOB_WORKERS=0 to run them only in worker.py
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 2))
+    JOB_RETRY_BASE_SECONDS = int(os.getenv('JOB_RETRY_BASE_SECONDS', 30))
+    JOB_RETRY_MAX_SECONDS = int(os.getenv('JOB_RETRY_MAX_SECONDS', 3600))
+    JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', 600))
+    JOB_RETENTION_DAYS = int(os.getenv('JOB_RETENTION_DAYS', 7))
+
+    # Page thumbnails and previews (rendered with poppler's pdftoppm)
+    PREVIEW_RENDERER = os.getenv('PREVIEW_RENDERER', 'pdftoppm')
+    PREVIEW_CACHE_DIR = os.getenv('PREVIEW_CACHE_DIR') or os.path.join(UPLOAD_FOLDER, '.previews')
+    PREVIEW_CACHE_MAX_BYTES = int(os.getenv('PREVIEW_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    PREVIEW_MAX_CONCURRENT_RENDERS = int(os.getenv('PREVIEW_MAX_CONCURRENT_RENDERS', 2))
+    PREVIEW_RENDER_TIMEOUT = int(os.getenv('PREVIEW_RENDER_TIMEOUT', 30))
+    THUMBNAIL_WIDTH = int(os.getenv('THUMBNAIL_WIDTH', 240))
+    PREVIEW_WIDTH = int(os.getenv('PREVIEW_WIDTH', 800))
+    PREVIEW_CACHE_MAX_AGE = int(os.getenv('PREVIEW_CACHE_MAX_AGE', 86400))
+
+    # Linearized, object-stream-compressed copies of uploads (qpdf), served in
+    # place of the original; skipped when qpdf is not installed
+    PDF_OPTIMIZE_ENABLED = os.getenv('PDF_OPTIMIZE_ENABLED', 'true').lower() in ['true', 'on', '1']
+    QPDF_PATH = os.getenv('QPDF_PATH', 'qpdf')
+    PDF_OPTIMIZE_TIMEOUT = int(os.getenv('PDF_OPTIMIZE_TIMEOUT', 120))
+
+    # Single pages split out of PDFs for the viewer (PyPDF2), cached on disk
+    PAGE_CACHE_DIR = os.getenv('PAGE_CACHE_DIR') or os.path.join(UPLOAD_FOLDER, '.pages')
+    PAGE_CACHE_MAX_BYTES = int(os.getenv('PAGE_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+    PAGE_SPLIT_MAX_CONCURRENT = int(os.getenv('PAGE_SPLIT_MAX_CONCURRENT', 4))
+    PAGE_SPLIT_TIMEOUT = int(os.getenv('PAGE_SPLIT_TIMEOUT', 30))
+    PAGE_SPLIT_MAX_PAGES = int(os.getenv('PAGE_SPLIT_MAX_PAGES', 10))
     
     # Create upload folder if it doesn't exist
     if not os.path.exists(UPLOAD_FOLDER):
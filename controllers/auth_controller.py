@@ -1,9 +1,11 @@
-from extensions import bcrypt
 from flask import current_app, render_template, request, flash, redirect, url_for
 from flask_login import login_user, logout_user, current_user
-from utils.database import db_cursor
+from utils.database import db_transaction, execute, query_one
 from utils.auth_utils import is_email_registered, validate_registration, validate_login
+from utils.mail_outbox import get_mail_outbox
 from utils.mail_utils import send_password_reset_email
+from utils.password_hasher import PasswordHasherBusy
+from utils.user_cache import invalidate_user
 import secrets
 from datetime import datetime, timedelta
 from models import User
@@ -18,22 +20,19 @@ def register():
             flash("Email already exists.", "danger")
             return redirect(url_for('auth_routes.register'))
 
-        hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
-
         try:
-            connection = current_app.db_pool.get_connection()
-            cursor = connection.cursor()
-            cursor.execute("""
+            hashed_password = User.generate_password_hash(password)
+            execute("""
                 INSERT INTO users (name, email, password)
                 VALUES (%s, %s, %s)
             """, (name, email, hashed_password))
-            connection.commit()
-            cursor.close()
-            connection.close()
 
             flash("Registration successful. Please log in.", "success")
             return redirect(url_for('auth_routes.login'))
 
+        except PasswordHasherBusy:
+            flash("The server is busy, please try again in a moment.", "warning")
+            return render_template("auth/register.html"), 503
         except Exception as e:
             print(f"Error during registration: {e}")
             flash("An error occurred. Please try again.", "danger")
@@ -73,14 +72,14 @@ def forgot_password():
     if request.method == 'POST':
         email = request.form['email']
         
-        with db_cursor() as cursor:
+        user = None
+        with db_transaction() as cursor:
             # Check if email exists
             cursor.execute("SELECT id, email, name FROM users WHERE email = %s", (email,))
             user_data = cursor.fetchone()  # This returns a dictionary
             
             if user_data:
                 # Convert to User object before passing to email function
-                from models import User
                 user = User(**user_data)
                 
                 # Generate reset token (valid for 1 hour)
@@ -93,54 +92,68 @@ def forgot_password():
                     (user.id, reset_token, expiry_time)
                 )
                 
-                # Send reset email
+                # Queued in the same transaction; delivery happens in the background
                 reset_url = url_for('auth_routes.reset_password', token=reset_token, _external=True)
-                send_password_reset_email(user, reset_url)
-                flash('Password reset link has been sent to your email', 'success')
-            else:
-                flash('If this email exists in our system, a reset link will be sent', 'success')
+                send_password_reset_email(user, reset_url, cursor=cursor)
+        
+        if user:
+            get_mail_outbox().wake()
+            flash('Password reset link has been sent to your email', 'success')
+        else:
+            flash('If this email exists in our system, a reset link will be sent', 'success')
         
         return redirect(url_for('auth_routes.login'))
     
     return render_template('auth/forgot_password.html')
 
 def reset_password(token):
-    with db_cursor() as cursor:
-        # Verify token
-        cursor.execute("""
-            SELECT prt.*, u.email 
-            FROM password_reset_tokens prt
-            JOIN users u ON prt.user_id = u.id
-            WHERE prt.token = %s AND prt.expires_at > NOW() AND prt.used = 0
-        """, (token,))
-        token_data = cursor.fetchone()
+    # Verify token
+    token_data = query_one("""
+        SELECT prt.*, u.email 
+        FROM password_reset_tokens prt
+        JOIN users u ON prt.user_id = u.id
+        WHERE prt.token = %s AND prt.expires_at > NOW() AND prt.used = 0
+    """, (token,))
+    
+    if not token_data:
+        flash('Invalid or expired password reset link', 'danger')
+        return redirect(url_for('auth_routes.forgot_password'))
+    
+    if request.method == 'POST':
+        new_password = request.form['password']
+        confirm_password = request.form['confirm_password']
         
-        if not token_data:
-            flash('Invalid or expired password reset link', 'danger')
-            return redirect(url_for('auth_routes.forgot_password'))
+        if new_password != confirm_password:
+            flash('Passwords do not match', 'danger')
+            return redirect(request.url)
         
-        if request.method == 'POST':
-            new_password = request.form['password']
-            confirm_password = request.form['confirm_password']
-            
-            if new_password != confirm_password:
-                flash('Passwords do not match', 'danger')
-                return redirect(request.url)
-            
-            # Update password
+        # Hash outside the transaction so a pooled connection isn't held for bcrypt
+        try:
             hashed_password = User.generate_password_hash(new_password)
+        except PasswordHasherBusy:
+            flash('The server is busy, please try again in a moment.', 'warning')
+            return redirect(request.url)
+
+        with db_transaction() as cursor:
+            # Mark token as used; a concurrent reset with the same link loses here
             cursor.execute(
-                "UPDATE users SET password = %s WHERE id = %s",
-                (hashed_password, token_data['user_id'])
-            )
-            
-            # Mark token as used
-            cursor.execute(
-                "UPDATE password_reset_tokens SET used = 1 WHERE token = %s",
+                "UPDATE password_reset_tokens SET used = 1 WHERE token = %s AND used = 0",
                 (token,)
             )
-            
-            flash('Password updated successfully. Please login with your new password.', 'success')
-            return redirect(url_for('auth_routes.login'))
+            claimed = cursor.rowcount == 1
+            if claimed:
+                cursor.execute(
+                    "UPDATE users SET password = %s WHERE id = %s",
+                    (hashed_password, token_data['user_id'])
+                )
+        if not claimed:
+            flash('Invalid or expired password reset link', 'danger')
+            return redirect(url_for('auth_routes.forgot_password'))
+
+        # Only once committed, or a reload could cache the old hash again
+        invalidate_user(token_data['user_id'])
+        
+        flash('Password updated successfully. Please login with your new password.', 'success')
+        return redirect(url_for('auth_routes.login'))
     
     return render_template('auth/reset_password.html', token=token)
\ No newline at end of file
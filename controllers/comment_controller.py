@@ -1,28 +1,52 @@
+import hashlib
+import json
+import queue
+import time
 from datetime import datetime
-from flask import jsonify, request
+from flask import Response, current_app, jsonify, request
 from flask_login import current_user
-from utils.database import db_cursor
+from config import Config
+from controllers.pdf_controller import get_pdf_with_access
+from utils.comment_threads import (
+    CommentThreadError,
+    build_tree,
+    changes_since,
+    delete_thread,
+    insert_comment,
+    latest_event_id,
+    settled_event_id,
+)
+from utils.database import db_cursor, db_transaction
+from utils.event_broker import TooManySubscribers, get_event_broker
+from utils.fragment_cache import comment_thread_fragment
+from utils.pagination import InvalidCursor
+from utils.share_cache import resolve_share_token
 
-def valid_share_token(token):
-    """Check if a share token is valid and allows comments"""
+def valid_share_token(token, file_id):
+    """Check if a share token is valid for this file and allows comments"""
+    share = resolve_share_token(token)
+    return bool(share and share['allow_comments'] and share['file_id'] == int(file_id))
+
+def can_view_comments(file_id, share_token=None):
+    """Owner access, or a live share link for this file"""
+    if share_token:
+        share = resolve_share_token(share_token)
+        if share and share['file_id'] == file_id:
+            return True
+    if not current_user.is_authenticated:
+        return False
     with db_cursor() as cursor:
-        cursor.execute("""
-            SELECT id FROM shared_files 
-            WHERE share_token = %s 
-            AND (expires_at IS NULL OR expires_at > NOW())
-            AND allow_comments = TRUE
-        """, (token,))
-        return cursor.fetchone() is not None
+        return get_pdf_with_access(cursor, file_id, current_user.id) is not None
+
+def comment_channel(file_id):
+    return f"comments:{int(file_id)}"
 
 def save_user_comment(data, user_id):
     """Save comment or reply for authenticated user"""
-    with db_cursor() as cursor:
-        cursor.execute("""
-            INSERT INTO comments 
-            (file_id, user_id, content, parent_id, created_at)
-            VALUES (%s, %s, %s, %s, NOW())
-        """, (data['file_id'], user_id, data['content'], data.get('parent_id')))
-        comment_id = cursor.lastrowid
+    with db_transaction() as cursor:
+        comment_id, depth, event_id = insert_comment(
+            cursor, data['file_id'], data['content'],
+            parent_id=data.get('parent_id'), user_id=user_id)
 
         cursor.execute("""
             SELECT users.name, comments.created_at
@@ -38,20 +62,19 @@ def save_user_comment(data, user_id):
             'user_name': row['name'],
             'content': data['content'],
             'parent_id': data.get('parent_id'),
+            'depth': depth,
             'created_at': row['created_at'].strftime("%Y-%m-%d %H:%M:%S"),
-            'replies': []
+            'replies': [],
+            'cursor': event_id
         }
 
 def save_guest_comment(data):
     """Save comment for guest user"""
     guest_name = data.get('guest_name', 'Anonymous')[:50] 
-    with db_cursor() as cursor:
-        cursor.execute("""
-            INSERT INTO comments 
-            (file_id, guest_name, content, parent_id, created_at)
-            VALUES (%s, %s, %s, %s, NOW())
-        """, (data['file_id'], guest_name, data['content'], data.get('parent_id')))
-        return cursor.lastrowid
+    with db_transaction() as cursor:
+        return insert_comment(
+            cursor, data['file_id'], data['content'],
+            parent_id=data.get('parent_id'), guest_name=guest_name)
     
 
 def add_comment():
@@ -61,79 +84,173 @@ def add_comment():
         return jsonify({'success': False, 'error': 'Missing file_id or content'}), 400
 
     if not current_user.is_authenticated:
-        if not valid_share_token(data.get('share_token')):
+        if not valid_share_token(data.get('share_token'), data['file_id']):
             return jsonify({'success': False, 'error': 'Invalid share token'}), 403
 
         guest_name = data.get('guest_name', 'Anonymous')[:50]
-        comment_id = save_guest_comment(data)
+        try:
+            comment_id, depth, event_id = save_guest_comment(data)
+        except CommentThreadError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         created_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        return jsonify({
-            'success': True,
-            'comment': {
-                'id': comment_id,
-                'user_name': guest_name,
-                'content': data['content'],
-                'parent_id': data.get('parent_id'),
-                'created_at': created_at,
-                'replies': []
-            }
-        })
+        comment_data = {
+            'id': comment_id,
+            'user_name': guest_name,
+            'content': data['content'],
+            'parent_id': data.get('parent_id'),
+            'depth': depth,
+            'created_at': created_at,
+            'replies': [],
+            'cursor': event_id
+        }
     else:
-        comment_data = save_user_comment(data, current_user.id)
-        return jsonify({
-            'success': True,
-            'comment': comment_data
-        })
+        try:
+            comment_data = save_user_comment(data, current_user.id)
+        except CommentThreadError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+
+    get_event_broker().publish(comment_channel(data['file_id']), 'comment_added', comment_data)
+    return jsonify({
+        'success': True,
+        'comment': comment_data
+    })
+
+def serialize_comment(row):
+    return {
+        'id': row['id'],
+        'content': row['content'],
+        'user_name': row['user_name'],
+        'created_at': row['created_at'].strftime('%Y-%m-%d %H:%M:%S'),
+        'parent_id': row['parent_id'],
+        'depth': row['depth']
+    }
 
 def get_comments(file_id):
+    """Page of root threads with all of their replies, nested to any depth.
+
+    The ETag is derived from the file's latest comment event, so an
+    unchanged listing is answered with 304 after one index lookup.
+    """
+    share_token = request.args.get('share_token')
+    if not can_view_comments(file_id, share_token):
+        return jsonify({'success': False, 'error': 'Access denied'}), 403
+
     try:
         with db_cursor() as cursor:
-            cursor.execute("""
-                SELECT c.*, COALESCE(u.name, c.guest_name, 'Guest') as user_name 
-                FROM comments c
-                LEFT JOIN users u ON c.user_id = u.id
-                WHERE c.file_id = %s
-                ORDER BY c.created_at ASC
-            """, (file_id,))
-            comments = cursor.fetchall()
-
-            # Prepare comment objects
-            all_comments = [{
-                'id': c['id'],
-                'content': c['content'],
-                'user_name': c['user_name'],
-                'created_at': c['created_at'].strftime('%Y-%m-%d %H:%M:%S'),
-                'parent_id': c['parent_id'],
-                'replies': []
-            } for c in comments]
-
-            # Organize comments by parent-child relationship
-            comment_map = {c['id']: c for c in all_comments}
-            root_comments = []
-
-            for comment in all_comments:
-                if comment['parent_id']:
-                    parent = comment_map.get(comment['parent_id'])
-                    if parent:
-                        parent['replies'].append(comment)
-                else:
-                    root_comments.append(comment)
-
-            return jsonify({'success': True, 'comments': root_comments})
+            latest = latest_event_id(cursor, file_id)
+            variant = f"{request.query_string.decode()}:{current_user.is_authenticated}"
+            etag = f"{file_id}-{latest}-{hashlib.md5(variant.encode()).hexdigest()[:12]}"
+            if request.if_none_match.contains(etag):
+                response = current_app.response_class(status=304)
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'private, no-cache'
+                return response
+
+            rows, next_cursor, html = comment_thread_fragment(
+                cursor, file_id, latest, request.args.get('cursor'),
+                can_reply=current_user.is_authenticated or bool(share_token))
+            sync_cursor = settled_event_id(cursor, file_id)
+    except InvalidCursor:
+        return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
 
-def delete_comment(comment_id):
+    comments = build_tree(serialize_comment(row) for row in rows)
+    data = {
+        'success': True,
+        'comments': comments,
+        'next_cursor': next_cursor,
+        'sync_cursor': sync_cursor
+    }
+    if request.args.get('format') == 'html':
+        data['html'] = html
+
+    response = jsonify(data)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def get_comment_changes(file_id):
+    """Comments added or deleted after the since cursor (a sync_cursor from a
+    previous listing or change batch)"""
+    if not can_view_comments(file_id, request.args.get('share_token')):
+        return jsonify({'success': False, 'error': 'Access denied'}), 403
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid since cursor'}), 400
+
     try:
         with db_cursor() as cursor:
+            rows, has_more, sync_cursor = changes_since(cursor, file_id, since)
+    except Exception as e:
+        current_app.logger.error(f"Comment sync error: {str(e)}", exc_info=True)
+        return jsonify({'error': 'Internal server error'}), 500
+
+    changes = []
+    for row in rows:
+        if row['event'] == 'added':
+            changes.append({'event': 'added', 'comment': serialize_comment(row)})
+        else:
+            changes.append({'event': 'deleted', 'id': row['id']})
+    return jsonify({
+        'success': True,
+        'changes': changes,
+        'sync_cursor': sync_cursor,
+        'has_more': has_more
+    })
+
+def delete_comment(comment_id):
+    try:
+        with db_transaction() as cursor:
             cursor.execute("""
-                SELECT 1 FROM comments 
-                WHERE id = %s AND user_id = %s
+                SELECT file_id, path FROM comments 
+                WHERE id = %s AND user_id = %s AND deleted_at IS NULL
             """, (comment_id, current_user.id))
-            if not cursor.fetchone():
+            comment = cursor.fetchone()
+            if not comment:
                 return jsonify({'error': 'No permission to delete this comment'}), 403
             
-            cursor.execute("DELETE FROM comments WHERE id = %s", (comment_id,))
-            return jsonify({'success': True})
+            # Tombstone the thread so delta sync clients learn about it
+            deleted_ids, event_id = delete_thread(cursor, comment['file_id'], comment['path'])
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
+
+    get_event_broker().publish(comment_channel(comment['file_id']), 'comment_deleted',
+                               {'id': comment_id, 'deleted_ids': deleted_ids, 'cursor': event_id})
+    return jsonify({'success': True, 'deleted_ids': deleted_ids})
+
+def comment_stream(file_id):
+    """Server-Sent Events feed of comment_added / comment_deleted deltas for one file"""
+    if not can_view_comments(file_id, request.args.get('share_token')):
+        return jsonify({'success': False, 'error': 'Access denied'}), 403
+
+    broker = get_event_broker()
+    channel = comment_channel(file_id)
+    try:
+        subscriber = broker.subscribe(channel)
+    except TooManySubscribers:
+        return jsonify({'success': False, 'error': 'Too many live connections'}), 503
+
+    deadline = time.monotonic() + Config.LIVE_STREAM_MAX_SECONDS
+
+    def stream():
+        # Reconnect quickly when we end the stream at the deadline
+        yield "retry: 2000\n\n"
+        while time.monotonic() < deadline:
+            try:
+                message = subscriber.get(timeout=Config.LIVE_HEARTBEAT_SECONDS)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            if message is None:
+                break  # Fell behind; the client reconnects
+            event_id, event, data = message
+            yield f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+    response = Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    response.call_on_close(lambda: broker.unsubscribe(channel, subscriber))
+    return response
@@ -1,16 +1,40 @@
 from flask import (
     current_app,
+    jsonify,
     render_template, 
     request,
     flash, 
     redirect, 
     url_for, 
-    send_from_directory,
+    abort,
 )
 from flask_login import login_required, current_user
-from utils.database import db_cursor
+from utils.batch_upload import BatchUploadError, save_batch
+from utils.blob_store import drop_blob_files, optimized_blob_name, optimized_blob_path, release_blob
+from utils.chunked_upload import (
+    UploadSessionError,
+    abort_session,
+    append_chunk,
+    create_session,
+    current_offset,
+    finalize_session,
+    get_session,
+)
+from utils.comment_threads import latest_event_id, settled_event_id
+from utils.database import db_cursor, db_transaction
 from utils.file_upload import allowed_file, save_uploaded_file
+from utils.fragment_cache import bump_files_version, cached_fragment, comment_thread_fragment, files_version
+from utils.page_split import BUSY_RETRY_AFTER, PageSplitBusy, PageUnavailable, page_cache, page_count, page_etag, split_pages, viewer_page_count
+from utils.pagination import InvalidCursor, decode_cursor, encode_cursor
+from utils.pdf_serving import content_etag, send_pdf
+from utils.pdf_text import search_pages
+from utils.preview_cache import PreviewUnavailable, preview_cache, preview_etag, render_page
+from utils.share_cache import invalidate_share, resolve_share_token
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file
+from markupsafe import Markup
 import os
+from datetime import datetime
 from config import Config
 import logging
 
@@ -20,47 +44,61 @@ logger = logging.getLogger(__name__)
 @login_required
 def dashboard():
     search_query = request.args.get('q', '')
+    view = dashboard_view(request.args)
     
     try:
         with db_cursor() as cursor:
-            # Initialize empty lists as fallback
-            user_pdfs = []
-            shared_pdfs = []
-            
-            # Get user's PDFs (with null check)
-            cursor.execute("""
-                SELECT id, filename, upload_date 
-                FROM pdf_files 
-                WHERE user_id = %s 
-                ORDER BY upload_date DESC
-            """, (current_user.id,))
-            result = cursor.fetchall()
-            user_pdfs = result if result else []
-            
-            # Get shared PDFs (with null check)
-            cursor.execute("""
-                SELECT pf.id, pf.filename, pf.upload_date, u.name as owner_name 
-                FROM pdf_files pf
-                JOIN shared_files sf ON pf.id = sf.file_id
-                JOIN users u ON pf.user_id = u.id
-                WHERE sf.created_by = %s  # Changed from shared_with to created_by
-                ORDER BY pf.upload_date DESC
-            """, (current_user.id,))
-            result = cursor.fetchall()
-            shared_pdfs = result if result else []
+            user_pdfs, next_cursor, cards_html = dashboard_fragment(
+                cursor, current_user.id, request.args.get('cursor'), view)
             
             return render_template('dashboard.html', 
                                user_pdfs=user_pdfs,
-                               shared_pdfs=shared_pdfs,
-                               search_query=search_query)
+                               next_cursor=next_cursor,
+                               cards_html=cards_html,
+                               search_query=search_query,
+                               view=view,
+                               sorts=DASHBOARD_SORTS)
             
+    except InvalidCursor:
+        return redirect(url_for('pdf_routes.dashboard', **view))
     except Exception as e:
         current_app.logger.error(f"Dashboard error: {str(e)}", exc_info=True)
         flash('Error loading dashboard content', 'warning')
         return render_template('dashboard.html', 
                            user_pdfs=[], 
-                           shared_pdfs=[],
-                           search_query=search_query)
+                           search_query=search_query,
+                           view=view,
+                           sorts=DASHBOARD_SORTS)
+
+@login_required
+def dashboard_files():
+    """Next page of dashboard cards for infinite scroll"""
+    try:
+        with db_cursor() as cursor:
+            user_pdfs, next_cursor, cards_html = dashboard_fragment(
+                cursor, current_user.id, request.args.get('cursor'), dashboard_view(request.args))
+    except InvalidCursor:
+        return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
+    except Exception as e:
+        current_app.logger.error(f"Dashboard page error: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': 'Could not load files'}), 500
+
+    return jsonify({
+        'success': True,
+        'files': [{
+            'id': pdf['id'],
+            'filename': pdf['filename'],
+            'upload_date': pdf['upload_date'].isoformat(),
+            'is_shared': bool(pdf['is_shared']),
+            'job_status': pdf['job_status'],
+            'page_count': pdf['page_count'],
+            'byte_size': pdf['original_size'],
+            'title': pdf['title'],
+            'author': pdf['author'],
+        } for pdf in user_pdfs],
+        'html': cards_html,
+        'next_cursor': next_cursor
+    })
 
 @login_required
 def upload_file():
@@ -102,6 +140,146 @@ def upload_file():
     
     return redirect(url_for('pdf_routes.dashboard'))
 
+@login_required
+def upload_batch():
+    """Upload many PDFs, or ZIP archives of them, in one request; per-file results"""
+    # Refuse oversized batches before the form is parsed and spooled
+    if request.content_length and request.content_length > Config.MAX_CONTENT_LENGTH:
+        return jsonify({'success': False, 'error': 'Batch is too large'}), 413
+
+    files = [f for f in request.files.getlist('files') if f.filename]
+    if not files:
+        return jsonify({'success': False, 'error': 'No files selected'}), 400
+
+    try:
+        results = save_batch(files, current_user.id)
+    except BatchUploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), 413
+    except Exception as e:
+        current_app.logger.error(f"Batch upload failed: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': 'Error uploading files'}), 500
+
+    uploaded = sum(1 for result in results if result['success'])
+    return jsonify({
+        'success': uploaded > 0,
+        'uploaded': uploaded,
+        'failed': len(results) - uploaded,
+        'files': results,
+    })
+
+@login_required
+def upload_session_init():
+    """Open a resumable chunked upload"""
+    data = request.get_json(silent=True) or {}
+    filename = data.get('filename', '')
+    total_size = data.get('size')
+
+    if not filename or not allowed_file(filename):
+        return jsonify({'success': False, 'error': 'Only PDF files are allowed'}), 400
+    if not isinstance(total_size, int):
+        return jsonify({'success': False, 'error': 'Missing file size'}), 400
+
+    try:
+        session_id = create_session(current_user.id, filename, total_size)
+        return jsonify({
+            'success': True,
+            'session_id': session_id,
+            'offset': 0,
+            'chunk_size': Config.UPLOAD_CHUNK_SIZE
+        }), 201
+    except UploadSessionError as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status
+    except Exception as e:
+        current_app.logger.error(f"Upload session init failed: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': 'Internal server error'}), 500
+
+@login_required
+def upload_session_status(session_id):
+    """Report how many bytes have been received so a client can resume"""
+    try:
+        session = get_session(session_id, current_user.id)
+        return jsonify({
+            'success': True,
+            'session_id': session_id,
+            'offset': session['offset'],
+            'size': session['total_size']
+        })
+    except UploadSessionError as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status
+
+@login_required
+def upload_session_chunk(session_id):
+    """Append the raw request body at ?offset= (or the Upload-Offset header)"""
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        offset = request.headers.get('Upload-Offset', type=int)
+    if offset is None:
+        return jsonify({'success': False, 'error': 'Missing offset'}), 400
+
+    try:
+        session = get_session(session_id, current_user.id)
+        new_offset = append_chunk(session, offset, request.stream)
+        return jsonify({'success': True, 'offset': new_offset})
+    except UploadSessionError as e:
+        return jsonify({'success': False, 'error': str(e), 'offset': e.offset}), e.status
+    except Exception as e:
+        current_app.logger.error(f"Upload chunk failed: {str(e)}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': 'Chunk failed, resume from offset',
+            'offset': current_offset(session_id)
+        }), 500
+
+@login_required
+def upload_session_finalize(session_id):
+    """Store a fully received upload and record it in pdf_files"""
+    try:
+        session = get_session(session_id, current_user.id)
+        finalize_session(session, current_user.id)
+        flash('File uploaded successfully', 'success')
+        return jsonify({'success': True, 'redirect': url_for('pdf_routes.dashboard')})
+    except UploadSessionError as e:
+        return jsonify({'success': False, 'error': str(e), 'offset': e.offset}), e.status
+    except Exception as e:
+        current_app.logger.error(f"Upload finalize failed: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': 'Internal server error'}), 500
+
+@login_required
+def upload_session_abort(session_id):
+    try:
+        session = get_session(session_id, current_user.id)
+        abort_session(session)
+        return jsonify({'success': True})
+    except UploadSessionError as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status
+
+@login_required
+def job_status():
+    """Recent background jobs for the current user's files"""
+    try:
+        with db_cursor() as cursor:
+            cursor.execute("""
+                SELECT id, job_type, file_id, status, attempts, run_after, updated_at
+                FROM jobs
+                WHERE user_id = %s
+                ORDER BY id DESC
+                LIMIT 50
+            """, (current_user.id,))
+            jobs = cursor.fetchall()
+
+        return jsonify({'success': True, 'jobs': [{
+            'id': job['id'],
+            'job_type': job['job_type'],
+            'file_id': job['file_id'],
+            'status': job['status'],
+            'attempts': job['attempts'],
+            'run_after': job['run_after'].strftime('%Y-%m-%d %H:%M:%S'),
+            'updated_at': job['updated_at'].strftime('%Y-%m-%d %H:%M:%S')
+        } for job in jobs]})
+    except Exception as e:
+        current_app.logger.error(f"Job status error: {str(e)}", exc_info=True)
+        return jsonify({'error': 'Internal server error'}), 500
+
 @login_required
 def view_pdf(file_id):
     try:
@@ -111,11 +289,17 @@ def view_pdf(file_id):
                 flash('You do not have access to this file', 'danger')
                 return redirect(url_for('pdf_routes.dashboard'))
             
-            comments = get_comments_for_file(cursor, file_id)
+            comments, comments_cursor, comments_html = comment_thread_fragment(
+                cursor, file_id, latest_event_id(cursor, file_id))
+            sync_cursor = settled_event_id(cursor, file_id)
             
             return render_template('pdf_viewer.html', 
                                pdf_file=pdf_file, 
                                comments=comments,
+                               comments_html=comments_html,
+                               comments_cursor=comments_cursor,
+                               sync_cursor=sync_cursor,
+                               page_count=pdf_file['page_count'] or viewer_page_count(pdf_file['content_hash']),
                                file_url=url_for('pdf_routes.uploaded_file', filename=pdf_file['filepath']))
     except Exception as e:
         flash('An error occurred while accessing the file', 'danger')
@@ -123,13 +307,85 @@ def view_pdf(file_id):
 
 @login_required
 def uploaded_file(filename):
-    """Serve uploaded PDF files"""
-    return send_from_directory(Config.UPLOAD_FOLDER, filename)
+    """Serve uploaded PDF files with Range, ETag and conditional GET support"""
+    path = safe_join(Config.UPLOAD_FOLDER, filename)
+    if path is None:
+        abort(404)
+    content_hash = content_etag(filename)
+    # Blob names are derivable from a document's bytes, so knowing the URL
+    # proves nothing; the caller must have access to a file stored there
+    with db_cursor() as cursor:
+        allowed = can_read_stored_file(cursor, filename, content_hash, current_user.id)
+    if not allowed:
+        abort(404)
+    # The linearized copy, when there is one, unless ?original=1 asks for the upload as-is
+    if content_hash and not request.args.get('original'):
+        optimized = optimized_blob_path(content_hash)
+        if os.path.exists(optimized):
+            return send_pdf(optimized, etag=f"{content_hash}-linear",
+                            accel_path=optimized_blob_name(content_hash))
+    return send_pdf(path, etag=content_hash, accel_path=filename)
+
+@login_required
+def thumbnail(file_id):
+    """First-page thumbnail for dashboard cards"""
+    return _send_preview(file_id, 1, Config.THUMBNAIL_WIDTH)
+
+@login_required
+def page_preview(file_id, page):
+    """Low-resolution render of a single page"""
+    return _send_preview(file_id, page, Config.PREVIEW_WIDTH)
+
+def _send_preview(file_id, page, width):
+    with db_cursor() as cursor:
+        pdf_file = get_pdf_with_access(cursor, file_id, current_user.id)
+    if not pdf_file or not pdf_file['content_hash'] or page < 1:
+        abort(404)
+
+    try:
+        path = render_page(pdf_file['content_hash'], page, width)
+    except PreviewUnavailable as e:
+        current_app.logger.info(f"No preview for file {file_id} page {page}: {str(e)}")
+        abort(404)
+
+    # Content-addressed, so the image never changes for this URL's blob
+    response = send_file(path, request.environ,
+                         mimetype='image/png',
+                         etag=preview_etag(pdf_file['content_hash'], page, width),
+                         max_age=Config.PREVIEW_CACHE_MAX_AGE,
+                         response_class=current_app.response_class)
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
+def view_page(file_id, page):
+    """Standalone PDF of one page (or ?count=N pages starting there), so the
+    viewer only downloads what is being read. Guests pass ?share_token=."""
+    with db_cursor() as cursor:
+        pdf_file = get_viewable_pdf(cursor, file_id, request.args.get('share_token'))
+    if not pdf_file or not pdf_file['content_hash'] or page < 1:
+        abort(404)
+
+    content_hash = pdf_file['content_hash']
+    count = max(1, min(request.args.get('count', 1, type=int), Config.PAGE_SPLIT_MAX_PAGES))
+    try:
+        total = page_count(content_hash)
+        last = min(page + count - 1, total)
+        path = split_pages(content_hash, page, last)
+    except PageUnavailable as e:
+        current_app.logger.info(f"No page {page} for file {file_id}: {str(e)}")
+        abort(404)
+    except PageSplitBusy:
+        return 'Too many pages are being prepared, please try again', 503, {'Retry-After': str(BUSY_RETRY_AFTER)}
+
+    response = send_pdf(path, etag=page_etag(content_hash, page, last))
+    response.headers['X-Page-Count'] = str(total)
+    return response
 
 @login_required
 def delete_pdf(file_id):
     try:
-        with db_cursor() as cursor:
+        with db_transaction() as cursor:
             # Verify file ownership
             cursor.execute("SELECT * FROM pdf_files WHERE id = %s AND user_id = %s", 
                          (file_id, current_user.id))
@@ -139,16 +395,28 @@ def delete_pdf(file_id):
                 flash('File not found or you do not have permission to delete it', 'danger')
                 return redirect(url_for('pdf_routes.dashboard'))
             
-            # Delete the physical file
-            file_path = os.path.join(Config.UPLOAD_FOLDER, pdf_file['filepath'])
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            
             # Delete database records
             cursor.execute("DELETE FROM pdf_files WHERE id = %s", (file_id,))
+            bump_files_version(cursor, current_user.id)
             
-            flash('PDF deleted successfully', 'success')
-            return redirect(url_for('pdf_routes.dashboard'))
+            # Drop our blob reference; the bytes go with the last one
+            if pdf_file['content_hash']:
+                released = release_blob(cursor, pdf_file['content_hash'])
+
+        # Files are only removed once the rows no longer point at them
+        if not pdf_file['content_hash']:
+            # Uploads from before the blob store own their file outright
+            file_path = os.path.join(Config.UPLOAD_FOLDER, pdf_file['filepath'])
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        elif released and drop_blob_files(pdf_file['content_hash'], released):
+            preview_cache.discard(pdf_file['content_hash'])
+            page_cache.discard(pdf_file['content_hash'])
+
+        # Its share link went with it
+        invalidate_share(file_id)
+        flash('PDF deleted successfully', 'success')
+        return redirect(url_for('pdf_routes.dashboard'))
     except Exception as e:
         flash('Error deleting PDF', 'danger')
         return redirect(url_for('pdf_routes.dashboard'))
@@ -164,7 +432,7 @@ def search():
         with db_cursor() as cursor:
             # Search user's own PDFs
             cursor.execute("""
-                SELECT id, filename, upload_date 
+                SELECT id, filename, upload_date, page_count, original_size, title, author
                 FROM pdf_files 
                 WHERE user_id = %s AND filename LIKE %s
                 ORDER BY upload_date DESC
@@ -183,12 +451,23 @@ def search():
                 AND pf.filename LIKE %s
             """, (current_user.id, f"%{search_query}%"))
             shared_pdfs = cursor.fetchall()
-            
-            return render_template('dashboard.html', 
-                               user_pdfs=user_pdfs,
-                               shared_pdfs=shared_pdfs,
-                               search_query=search_query)
-            
+
+        # Ranked matches inside document text
+        text_hits = search_pages(current_user.id, search_query,
+                                 limit=Config.SEARCH_RESULT_LIMIT)
+
+        # Per-query results, so the cards are rendered fresh rather than cached
+        cards_html = Markup(render_template('_pdf_cards.html', user_pdfs=user_pdfs))
+
+        return render_template('dashboard.html',
+                           user_pdfs=user_pdfs,
+                           cards_html=cards_html,
+                           shared_pdfs=shared_pdfs,
+                           text_hits=text_hits,
+                           search_query=search_query,
+                           view=dashboard_view(request.args),
+                           sorts=DASHBOARD_SORTS)
+
     except Exception as e:
         logger.error(f"Search error: {str(e)}")
         flash('Error performing search', 'danger')
@@ -196,6 +475,89 @@ def search():
 
 
 # Helper functions
+# Dashboard sort -> (column, direction, cursor type); each has a (user_id, column, id) index
+DASHBOARD_SORTS = {
+    'newest': ('upload_date', 'DESC', datetime),
+    'oldest': ('upload_date', 'ASC', datetime),
+    'name': ('filename', 'ASC', str),
+    'pages': ('page_count', 'DESC', int),
+    'size': ('original_size', 'DESC', int),
+}
+
+def dashboard_view(args):
+    """Sort and filters from the query string, keeping only the ones that are set"""
+    view = {'sort': args.get('sort') if args.get('sort') in DASHBOARD_SORTS else 'newest'}
+    author = args.get('author', '').strip()
+    if author:
+        view['author'] = author
+    for name in ('min_pages', 'max_pages'):
+        value = args.get(name, type=int)
+        if value is not None and value >= 0:
+            view[name] = value
+    return view
+
+def dashboard_fragment(cursor, user_id, after=None, view=None):
+    """(user_pdfs, next_cursor, rendered cards) for a dashboard page, built once per files_version"""
+    view = view or {'sort': 'newest'}
+    def build():
+        user_pdfs, next_cursor = get_dashboard_page(cursor, user_id, after, view=view)
+        return user_pdfs, next_cursor, Markup(render_template('_pdf_cards.html', user_pdfs=user_pdfs))
+    key = ('files', user_id, files_version(cursor, user_id), after or '', tuple(sorted(view.items())))
+    return cached_fragment(key, build)
+
+def get_dashboard_page(cursor, user_id, after=None, limit=None, view=None):
+    """One page of the user's files in the view's order (newest first by
+    default), keyset-paginated on (sort column, id) and narrowed by its
+    author prefix and page-count range.
+
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    view = view or {'sort': 'newest'}
+    column, direction, value_type = DASHBOARD_SORTS[view['sort']]
+    limit = limit or Config.DASHBOARD_PAGE_SIZE
+    conditions = ""
+    params = [user_id]
+    if 'author' in view:
+        escaped = view['author'].replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        conditions += " AND pf.author LIKE %s"
+        params.append(f"{escaped}%")
+    if 'min_pages' in view:
+        conditions += " AND pf.page_count >= %s"
+        params.append(view['min_pages'])
+    if 'max_pages' in view:
+        conditions += " AND pf.page_count <= %s"
+        params.append(view['max_pages'])
+    if after:
+        value, last_id = decode_cursor(after, value_type, int)
+        op = '<' if direction == 'DESC' else '>'
+        conditions += f" AND (pf.{column} {op} %s OR (pf.{column} = %s AND pf.id {op} %s))"
+        params += [value, value, last_id]
+
+    # Sharing and post-upload job state ride along so a page is a single
+    # index range scan on (user_id, sort column, id); a pending retry
+    # outranks an older failure
+    cursor.execute(f"""
+        SELECT pf.id, pf.filename, pf.upload_date,
+               pf.page_count, pf.original_size, pf.pdf_version, pf.title, pf.author,
+               sf.id IS NOT NULL AS is_shared,
+               (SELECT j.status FROM jobs j
+                WHERE j.file_id = pf.id AND j.status IN ('queued', 'running', 'failed')
+                ORDER BY j.status = 'failed', j.id DESC
+                LIMIT 1) AS job_status
+        FROM pdf_files pf
+        LEFT JOIN shared_files sf ON sf.file_id = pf.id
+        WHERE pf.user_id = %s{conditions}
+        ORDER BY pf.{column} {direction}, pf.id {direction}
+        LIMIT %s
+    """, (*params, limit + 1))
+    rows = cursor.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][column], rows[-1]['id'])
+    return rows, next_cursor
+
 def get_pdf_with_access(cursor, file_id, user_id):
     cursor.execute("""
         SELECT pf.* FROM pdf_files pf
@@ -204,12 +566,25 @@ def get_pdf_with_access(cursor, file_id, user_id):
     """, (file_id, user_id, user_id))
     return cursor.fetchone()
 
-def get_comments_for_file(cursor, file_id):
-    cursor.execute("""
-        SELECT c.*, COALESCE(u.name, 'Guest') as user_name 
-        FROM comments c
-        LEFT JOIN users u ON c.user_id = u.id
-        WHERE c.file_id = %s
-        ORDER BY c.created_at ASC
-    """, (file_id,))
-    return cursor.fetchall()
\ No newline at end of file
+def can_read_stored_file(cursor, filename, content_hash, user_id):
+    """Whether user_id owns, or has shared, a pdf_files row stored under filename"""
+    column, value = ('pf.content_hash', content_hash) if content_hash else ('pf.filepath', filename)
+    cursor.execute(f"""
+        SELECT 1 FROM pdf_files pf
+        LEFT JOIN shared_files sf ON pf.id = sf.file_id
+        WHERE {column} = %s AND (pf.user_id = %s OR sf.created_by = %s)
+        LIMIT 1
+    """, (value, user_id, user_id))
+    return cursor.fetchone() is not None
+
+def get_viewable_pdf(cursor, file_id, share_token=None):
+    """The file if the current user has access or share_token is a live link to it"""
+    if current_user.is_authenticated:
+        pdf_file = get_pdf_with_access(cursor, file_id, current_user.id)
+        if pdf_file:
+            return pdf_file
+    share = resolve_share_token(share_token)
+    if share and share['file_id'] == file_id:
+        cursor.execute("SELECT * FROM pdf_files WHERE id = %s", (file_id,))
+        return cursor.fetchone()
+    return None
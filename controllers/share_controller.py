@@ -1,16 +1,27 @@
-from flask import current_app, render_template, request, flash, redirect, url_for
+from flask import current_app, jsonify, render_template, request, flash, redirect, url_for
 from flask_login import login_required, current_user
-from utils.database import db_cursor
+from utils.comment_threads import latest_event_id, settled_event_id
+from utils.database import db_cursor, db_transaction
+from utils.fragment_cache import bump_files_version, comment_thread_fragment
+from utils.page_split import viewer_page_count
+from utils.share_cache import invalidate_share, resolve_share_token
+from utils.share_recipients import (
+    add_recipients,
+    parse_recipients,
+    read_csv_recipients,
+    split_recipients,
+)
+from config import Config
 import secrets
 from datetime import datetime, timedelta
-from extensions import mail
-from utils.mail_utils import send_share_email
-from flask_mail import Message 
+from utils.mail_outbox import get_mail_outbox
+from utils.mail_utils import send_share_emails
 
 @login_required
 def share_pdf(file_id):
     """Handle PDF sharing page"""
     try:
+        resent = 0
         with db_cursor() as cursor:
             # 1. Verify file ownership
             cursor.execute("""
@@ -57,7 +68,12 @@ def share_pdf(file_id):
                         SET share_token = %s, expires_at = %s
                         WHERE id = %s
                     """, (new_token, datetime.now() + timedelta(days=7), share['id']))
-                    flash('Share link refreshed successfully', 'success')
+                    # The old link is dead; everyone it was mailed to gets the new one
+                    resent = resend_share_link(cursor, share['id'], new_token, pdf_file['filename'])
+                    if resent:
+                        flash(f'Share link refreshed and sent again to {resent} recipient(s)', 'success')
+                    else:
+                        flash('Share link refreshed successfully', 'success')
 
                 elif action == 'permissions':
                     allow_comments = 'allow_comments' in request.form
@@ -70,14 +86,39 @@ def share_pdf(file_id):
                     """, (allow_comments, allow_download, file_id, current_user.id))
             
                     flash('Permissions updated successfully', 'success')
-                                    
-                return redirect(url_for('share_routes.share_pdf', file_id=file_id))
 
-            # 4. Render the template
-            return render_template('share_pdf.html',
-                pdf_file=pdf_file,
-                share=share,
-                share_expiry_delta=timedelta(days=7))
+                elif action == 'revoke' and share:
+                    cursor.execute("""
+                        DELETE FROM share_recipients
+                        WHERE id = %s AND share_id = %s
+                    """, (request.form.get('recipient_id'), share['id']))
+                    flash('Recipient removed', 'success')
+
+                # The dashboard card shows whether the file is shared
+                bump_files_version(cursor, current_user.id)
+            else:
+                shared_with = []
+                if share:
+                    cursor.execute("""
+                        SELECT id, email, access_type FROM share_recipients
+                        WHERE share_id = %s
+                        ORDER BY created_at DESC
+                        LIMIT %s
+                    """, (share['id'], Config.SHARE_MAX_RECIPIENTS))
+                    shared_with = cursor.fetchall()
+
+                # 4. Render the template
+                return render_template('share_pdf.html',
+                    pdf_file=pdf_file,
+                    share=share,
+                    shared_with=shared_with,
+                    share_expiry_delta=timedelta(days=7))
+
+        # Committed; guests must not keep resolving the old token or permissions
+        invalidate_share(file_id)
+        if resent:
+            get_mail_outbox().wake()
+        return redirect(url_for('share_routes.share_pdf', file_id=file_id))
                 
     except Exception as e:
         flash(f'Error: {str(e)}', 'danger')
@@ -92,91 +133,143 @@ def share_pdf_email(file_id):
         return redirect(url_for('share_routes.share_pdf', file_id=file_id))
     
     try:
-        with db_cursor() as cursor:
-            # Get file and share info
-            cursor.execute("""
-                SELECT pf.filename, sf.share_token
-                FROM pdf_files pf
-                JOIN shared_files sf ON pf.id = sf.file_id
-                WHERE pf.id = %s AND pf.user_id = %s
-                LIMIT 1
-            """, (file_id, current_user.id))
-            result = cursor.fetchone()
-            
-            if not result or not result.get('share_token'):
-                flash('❌ Please create a share link first', 'danger')
-                return redirect(url_for('share_routes.share_pdf', file_id=file_id))
-            
-            # Prepare email content
-            share_url = url_for('share_routes.view_shared_pdf', 
-                              token=result['share_token'], 
-                              _external=True)
-            
-            try:
-                msg = Message(
-                    subject=f"📄 {current_user.name} shared a PDF with you",
-                    recipients=[email],
-                    sender=current_app.config['MAIL_DEFAULT_SENDER'],
-                    body=f"""
-                    {current_user.name} has shared a PDF with you:
-                    File: {result['filename']}
-                    Link: {share_url}
-                    This link expires in 7 days.
-                    """
-                )
-                
-                mail.send(msg)
-                print(f"Attempting to send email to {email}") 
-                print(f"Using SMTP: {current_app.config['MAIL_SERVER']}:{current_app.config['MAIL_PORT']}")
-                print(f"Auth: {current_app.config['MAIL_USERNAME']}")
-                flash('✅ Share link sent successfully!', 'success')
-                current_app.logger.info(f"Email sent to {email}")
-                
-            except Exception as email_error:
-                error_msg = f"❌ Failed to send email: {str(email_error)}"
-                current_app.logger.error(error_msg)
-                flash(error_msg, 'danger')
-            
-            return redirect(url_for('share_routes.share_pdf', file_id=file_id))
+        # Asking again for one address means sending the link again
+        results = share_with_recipients(file_id, [email], resend=True)
+        if results is None:
+            flash('❌ Please create a share link first', 'danger')
+        elif results[0]['status'] == 'invalid':
+            flash('❌ Invalid email address', 'danger')
+        elif results[0]['status'] == 'resent':
+            flash('✅ Share link sent again', 'success')
+        else:
+            flash('✅ Share link is on its way!', 'success')
+        return redirect(url_for('share_routes.share_pdf', file_id=file_id))
             
     except Exception as e:
         error_msg = f"❌ System error: {str(e)}"
         current_app.logger.error(error_msg)
         flash(error_msg, 'danger')
         return redirect(url_for('share_routes.share_pdf', file_id=file_id))
+
+@login_required
+def share_pdf_bulk(file_id):
+    """Share the link with many recipients at once.
+
+    Accepts a JSON body {"recipients": [...] or "a@x, b@y"}, a form field
+    `recipients` with free text, and/or an uploaded `csv` file. Responds
+    with a status per recipient: queued, already_shared, resent, duplicate or
+    invalid. With `resend` set, people already shared with are mailed again.
+    """
+    if request.is_json:
+        data = request.get_json(silent=True) or {}
+        raw = data.get('recipients') or []
+        addresses = split_recipients(raw) if isinstance(raw, str) else [str(r) for r in raw]
+        resend = bool(data.get('resend'))
+    else:
+        addresses = split_recipients(request.form.get('recipients', ''))
+        resend = request.form.get('resend', '').lower() in ['true', 'on', '1']
+        upload = request.files.get('csv')
+        if upload and upload.filename:
+            addresses += read_csv_recipients(upload.read(Config.SHARE_MAX_CSV_BYTES))
+
+    if not addresses:
+        return jsonify({'success': False, 'error': 'No recipients given'}), 400
+    if len(addresses) > Config.SHARE_MAX_RECIPIENTS:
+        return jsonify({'success': False,
+                        'error': f"At most {Config.SHARE_MAX_RECIPIENTS} recipients per request"}), 413
+
+    try:
+        results = share_with_recipients(file_id, addresses, resend=resend)
+    except Exception as e:
+        current_app.logger.error(f"Bulk share error: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': 'Could not share the file'}), 500
+    if results is None:
+        return jsonify({'success': False, 'error': 'Please create a share link first'}), 404
+
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    return jsonify({'success': True, 'results': results, 'counts': counts})
+
+def share_with_recipients(file_id, addresses, resend=False):
+    """Validate, record and notify recipients of the owner's share link in one transaction.
+
+    Addresses already shared with are skipped, or mailed the link again
+    when resend is set. Returns per-recipient results, or None if the file
+    has no share link.
+    """
+    entries = parse_recipients(addresses)
+    with db_transaction() as cursor:
+        cursor.execute("""
+            SELECT sf.id, sf.share_token, pf.filename
+            FROM pdf_files pf
+            JOIN shared_files sf ON pf.id = sf.file_id
+            WHERE pf.id = %s AND pf.user_id = %s
+        """, (file_id, current_user.id))
+        share = cursor.fetchone()
+        if not share:
+            return None
+
+        valid = [entry['email'] for entry in entries if entry['status'] is None]
+        added = set(add_recipients(cursor, share['id'], valid, current_user.id))
+        notify = [email for email in valid if resend or email in added]
+        if notify:
+            share_url = url_for('share_routes.view_shared_pdf', token=share['share_token'], _external=True)
+            # One batched outbox insert, committed with the recipient rows
+            send_share_emails(notify, current_user.name, share['filename'], share_url, cursor=cursor)
+    if notify:
+        get_mail_outbox().wake()
+
+    for entry in entries:
+        if entry['status'] is None:
+            if entry['email'] in added:
+                entry['status'] = 'queued'
+            else:
+                entry['status'] = 'resent' if resend else 'already_shared'
+    return entries
+
+def resend_share_link(cursor, share_id, share_token, filename):
+    """Queue the current link for everyone a share was sent to; returns how many.
+
+    Commits with the caller's cursor; wake the outbox once it has.
+    """
+    cursor.execute("SELECT email FROM share_recipients WHERE share_id = %s", (share_id,))
+    recipients = [row['email'] for row in cursor.fetchall()]
+    if recipients:
+        share_url = url_for('share_routes.view_shared_pdf', token=share_token, _external=True)
+        send_share_emails(recipients, current_user.name, filename, share_url, cursor=cursor)
+    return len(recipients)
     
 def view_shared_pdf(token):
     """View a shared PDF without requiring login"""
     try:
+        # 1. Verify the share token is valid (cached, so bad links never reach MySQL)
+        share = resolve_share_token(token)
+        if not share:
+            flash('Invalid or expired share link', 'danger')
+            return redirect(url_for('auth_routes.login'))
+
         with db_cursor() as cursor:
-            # 1. Verify the share token is valid
-            cursor.execute("""
-                SELECT pf.*, sf.share_token, sf.allow_comments
-                FROM pdf_files pf
-                JOIN shared_files sf ON pf.id = sf.file_id
-                WHERE sf.share_token = %s
-                AND (sf.expires_at IS NULL OR sf.expires_at > NOW())
-            """, (token,))
+            cursor.execute("SELECT * FROM pdf_files WHERE id = %s", (share['file_id'],))
             pdf_file = cursor.fetchone()
-            
             if not pdf_file:
                 flash('Invalid or expired share link', 'danger')
                 return redirect(url_for('auth_routes.login'))
+            pdf_file.update(share_token=token, allow_comments=share['allow_comments'])
             
             # 2. Get comments for the PDF
-            cursor.execute("""
-                SELECT c.*, COALESCE(u.name, 'Anonymous') as user_name
-                FROM comments c
-                LEFT JOIN users u ON c.user_id = u.id
-                WHERE c.file_id = %s
-                ORDER BY c.created_at
-            """, (pdf_file['id'],))
-            comments = cursor.fetchall()
+            comments, comments_cursor, comments_html = comment_thread_fragment(
+                cursor, pdf_file['id'], latest_event_id(cursor, pdf_file['id']))
+            sync_cursor = settled_event_id(cursor, pdf_file['id'])
             
             # 3. Render the PDF viewer template
             return render_template('pdf_viewer.html',
                 pdf_file=pdf_file,
                 comments=comments,
+                comments_html=comments_html,
+                comments_cursor=comments_cursor,
+                sync_cursor=sync_cursor,
+                page_count=pdf_file['page_count'] or viewer_page_count(pdf_file['content_hash']),
                 file_url=url_for('pdf_routes.uploaded_file', filename=pdf_file['filepath']),
                 is_shared=True,
                 share_token=token
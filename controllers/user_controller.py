@@ -1,8 +1,10 @@
 from flask import jsonify, request
 from flask_login import current_user, login_required
 from models import User
-from utils.database import db_cursor
+from utils.database import db_cursor, execute, query_one
 from utils.auth_utils import validate_password_change
+from utils.password_hasher import PasswordHasherBusy
+from utils.user_cache import invalidate_user
 
 @login_required
 def get_user_profile():
@@ -46,11 +48,12 @@ def update_user_profile():
                 SET name = %s, email = %s 
                 WHERE id = %s
             """, (name, email, current_user.id))
-            
-            return jsonify({
-                'success': True,
-                'message': 'Profile updated successfully'
-            })
+        invalidate_user(current_user.id)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Profile updated successfully'
+        })
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
 
@@ -69,25 +72,24 @@ def change_password():
         return jsonify({'error': error}), 400
     
     try:
-        with db_cursor() as cursor:
-            # Verify current password
-            cursor.execute("SELECT password FROM users WHERE id = %s", (current_user.id,))
-            user = cursor.fetchone()
-            
-            if not user or not User.check_password_hash(user['password'], current_password):
-                return jsonify({'error': 'Current password is incorrect'}), 400
-            
-            # Update password
-            hashed_password = User.generate_password_hash(new_password)
-            cursor.execute("""
-                UPDATE users 
-                SET password = %s 
-                WHERE id = %s
-            """, (hashed_password, current_user.id))
-            
-            return jsonify({
-                'success': True,
-                'message': 'Password changed successfully'
-            })
+        # Hash outside db_cursor so a pooled connection isn't held for two bcrypt rounds
+        user = query_one("SELECT password FROM users WHERE id = %s", (current_user.id,))
+        if not user or not User.check_password_hash(user['password'], current_password):
+            return jsonify({'error': 'Current password is incorrect'}), 400
+
+        hashed_password = User.generate_password_hash(new_password)
+        execute("""
+            UPDATE users 
+            SET password = %s 
+            WHERE id = %s
+        """, (hashed_password, current_user.id))
+        invalidate_user(current_user.id)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Password changed successfully'
+        })
+    except PasswordHasherBusy:
+        return jsonify({'error': 'Server is busy, please try again'}), 503
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
\ No newline at end of file
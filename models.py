@@ -1,9 +1,7 @@
 from flask import current_app
 from flask_login import UserMixin
-from flask_bcrypt import Bcrypt
-from utils.database import db_cursor, db_pool, get_db_pool
-
-bcrypt = Bcrypt()
+from utils.database import get_db_pool, query_one
+from utils.password_hasher import get_password_hasher
 
 class User(UserMixin):
     def __init__(self, **kwargs):
@@ -18,31 +16,21 @@ class User(UserMixin):
 
     @staticmethod
     def generate_password_hash(password):
-        """Generate a password hash"""
-        return bcrypt.generate_password_hash(password).decode('utf-8')
+        """Generate a password hash (may raise PasswordHasherBusy)"""
+        return get_password_hasher().hash(password)
     
     @staticmethod
     def check_password_hash(hashed_password, password):
-        """Check if password matches hash"""
-        return bcrypt.check_password_hash(hashed_password, password)
+        """Check if password matches hash (may raise PasswordHasherBusy)"""
+        return get_password_hasher().verify(hashed_password, password)
     
     
     @staticmethod
     def get_by_id(user_id):
-        """Fixed version with proper connection handling"""
+        """Load a user by id, or None if missing or the lookup fails"""
         try:
-            # Access pool through current_app
-            if not hasattr(current_app, 'db_pool'):
-                raise RuntimeError("Database pool not initialized")
-                
-            connection = current_app.db_pool.get_connection()
-            try:
-                with connection.cursor(dictionary=True) as cursor:
-                    cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
-                    user_data = cursor.fetchone()
-                    return User(**user_data) if user_data else None
-            finally:
-                connection.close()
+            user_data = query_one("SELECT * FROM users WHERE id = %s", (user_id,))
+            return User(**user_data) if user_data else None
         except Exception as e:
             current_app.logger.error(f"User lookup failed: {str(e)}")
-            return None
\ No newline at end of file
+            return None
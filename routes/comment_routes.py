@@ -2,7 +2,9 @@ from flask import Blueprint
 from controllers.comment_controller import (
     add_comment,
     get_comments,
-    delete_comment
+    delete_comment,
+    comment_stream,
+    get_comment_changes
 )
 
 comment_bp = Blueprint('comment_routes', __name__)
@@ -10,4 +12,6 @@ comment_bp = Blueprint('comment_routes', __name__)
 # Comment routes
 comment_bp.route('/add', methods=['POST'])(add_comment)
 comment_bp.route('/<int:file_id>', methods=['GET'])(get_comments)
-comment_bp.route('/<int:comment_id>', methods=['DELETE'])(delete_comment)
\ No newline at end of file
+comment_bp.route('/<int:comment_id>', methods=['DELETE'])(delete_comment)
+comment_bp.route('/<int:file_id>/changes', methods=['GET'])(get_comment_changes)
+comment_bp.route('/<int:file_id>/events', methods=['GET'])(comment_stream)
\ No newline at end of file
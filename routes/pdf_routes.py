@@ -1,19 +1,41 @@
 from flask import Blueprint
 from controllers.pdf_controller import (
     dashboard,
+    dashboard_files,
     upload_file,
+    upload_batch,
+    upload_session_init,
+    upload_session_status,
+    upload_session_chunk,
+    upload_session_finalize,
+    upload_session_abort,
     view_pdf,
+    view_page,
     uploaded_file,
     delete_pdf,
-    search
+    search,
+    job_status,
+    thumbnail,
+    page_preview
 )
 
 pdf_bp = Blueprint('pdf_routes', __name__)
 
 # PDF management routes
 pdf_bp.route('/dashboard', methods=['GET'])(dashboard)
+pdf_bp.route('/dashboard/files', methods=['GET'])(dashboard_files)
 pdf_bp.route('/upload', methods=['POST'])(upload_file)
+pdf_bp.route('/upload/batch', methods=['POST'])(upload_batch)
+pdf_bp.route('/upload/sessions', methods=['POST'])(upload_session_init)
+pdf_bp.route('/upload/sessions/<session_id>', methods=['GET'])(upload_session_status)
+pdf_bp.route('/upload/sessions/<session_id>', methods=['PUT'])(upload_session_chunk)
+pdf_bp.route('/upload/sessions/<session_id>', methods=['DELETE'])(upload_session_abort)
+pdf_bp.route('/upload/sessions/<session_id>/finalize', methods=['POST'])(upload_session_finalize)
 pdf_bp.route('/view/<int:file_id>', methods=['GET'])(view_pdf)
+pdf_bp.route('/view/<int:file_id>/page/<int:page>', methods=['GET'])(view_page)
 pdf_bp.route('/uploads/<filename>', methods=['GET'])(uploaded_file)
+pdf_bp.route('/thumbnail/<int:file_id>', methods=['GET'])(thumbnail)
+pdf_bp.route('/preview/<int:file_id>/<int:page>', methods=['GET'])(page_preview)
 pdf_bp.route('/delete/<int:file_id>', methods=['POST'])(delete_pdf)
-pdf_bp.route('/search', methods=['GET'])(search)
\ No newline at end of file
+pdf_bp.route('/search', methods=['GET'])(search)
+pdf_bp.route('/jobs', methods=['GET'])(job_status)
\ No newline at end of file
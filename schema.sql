@@ -13,20 +13,119 @@ CREATE TABLE users (
     password VARCHAR(255) NOT NULL,
     reset_token VARCHAR(255),
     reset_token_expires DATETIME,
+    -- Bumped with every change to the user's dashboard cards; keys the fragment cache
+    files_version INT UNSIGNED NOT NULL DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Content-addressed PDF blobs, shared by every pdf_files row with the same bytes
+CREATE TABLE pdf_blobs (
+    content_hash CHAR(64) PRIMARY KEY,
+    filepath VARCHAR(255) NOT NULL,
+    byte_size BIGINT NOT NULL,
+    ref_count INT NOT NULL DEFAULT 1,
+    text_indexed_at DATETIME DEFAULT NULL,
+    -- Set once the linearized copy (uploads/<hash>.linear.pdf) was attempted
+    optimized_at DATETIME DEFAULT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Extracted page text per blob, searched with InnoDB FULLTEXT
+CREATE TABLE pdf_text_pages (
+    content_hash CHAR(64) NOT NULL,
+    page_number INT NOT NULL,
+    content MEDIUMTEXT NOT NULL,
+    PRIMARY KEY (content_hash, page_number),
+    FULLTEXT INDEX ft_content (content),
+    FOREIGN KEY (content_hash) REFERENCES pdf_blobs(content_hash) ON DELETE CASCADE
+);
+
 -- PDF files table
 CREATE TABLE pdf_files (
     id INT AUTO_INCREMENT PRIMARY KEY,
     user_id INT NOT NULL,
     filename VARCHAR(255) NOT NULL,
     filepath VARCHAR(255) NOT NULL,
+    content_hash CHAR(64),
+    -- Bytes as uploaded, and of the linearized copy served instead (NULL if none)
+    original_size BIGINT NOT NULL DEFAULT 0,
+    optimized_size BIGINT DEFAULT NULL,
+    -- Parsed once per upload by process_upload (page_count 0 = unreadable or pending)
+    page_count INT NOT NULL DEFAULT 0,
+    pdf_version VARCHAR(8) DEFAULT NULL,
+    title VARCHAR(255) DEFAULT NULL,
+    author VARCHAR(255) DEFAULT NULL,
+    subject VARCHAR(255) DEFAULT NULL,
+    creator VARCHAR(255) DEFAULT NULL,
+    producer VARCHAR(255) DEFAULT NULL,
+    created_at DATETIME DEFAULT NULL,
+    metadata_at DATETIME DEFAULT NULL,
     upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     upload_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX (content_hash),
+    -- Dashboard keyset pagination: WHERE user_id = ? ORDER BY <sort column> DESC, id DESC
+    INDEX idx_user_upload (user_id, upload_date, id),
+    INDEX idx_user_filename (user_id, filename, id),
+    INDEX idx_user_pages (user_id, page_count, id),
+    INDEX idx_user_size (user_id, original_size, id),
+    INDEX idx_user_author (user_id, author),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Resumable chunked uploads in progress; bytes live in uploads/.tmp/<id>.part
+CREATE TABLE upload_sessions (
+    id CHAR(32) PRIMARY KEY,
+    user_id INT NOT NULL,
+    filename VARCHAR(255) NOT NULL,
+    total_size BIGINT NOT NULL,
+    -- Claimed by the one finalize call that gets to register the file
+    status ENUM('open', 'finalizing') NOT NULL DEFAULT 'open',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX (created_at),
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
+-- Background jobs (post-upload processing), claimed with SKIP LOCKED
+CREATE TABLE jobs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    job_type VARCHAR(50) NOT NULL,
+    payload TEXT NOT NULL,
+    status ENUM('queued', 'running', 'done', 'failed') NOT NULL DEFAULT 'queued',
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 5,
+    run_after DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_at DATETIME DEFAULT NULL,
+    last_error TEXT,
+    user_id INT DEFAULT NULL,
+    file_id INT DEFAULT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX (status, run_after),
+    INDEX (user_id, status),
+    INDEX (file_id, status),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (file_id) REFERENCES pdf_files(id) ON DELETE CASCADE
+);
+
+-- Outbound mail, delivered in the background by utils.mail_outbox
+CREATE TABLE mail_outbox (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    recipient VARCHAR(255) NOT NULL,
+    subject VARCHAR(255) NOT NULL,
+    body TEXT,
+    html MEDIUMTEXT,
+    status ENUM('queued', 'sending', 'sent', 'failed') NOT NULL DEFAULT 'queued',
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 5,
+    run_after DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_at DATETIME DEFAULT NULL,
+    last_error TEXT,
+    sent_at DATETIME DEFAULT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX (status, run_after),
+    INDEX (status, sent_at)
+);
+
 -- Shared files table
 CREATE TABLE shared_files (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -39,19 +138,66 @@ CREATE TABLE shared_files (
     FOREIGN KEY (created_by) REFERENCES users(id) ON DELETE CASCADE
 );
 
+-- People a share link was emailed to
+CREATE TABLE share_recipients (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    share_id INT NOT NULL,
+    email VARCHAR(254) NOT NULL,
+    access_type VARCHAR(20) NOT NULL DEFAULT 'view',
+    created_by INT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE INDEX (share_id, email),
+    INDEX (share_id, created_at),
+    FOREIGN KEY (share_id) REFERENCES shared_files(id) ON DELETE CASCADE,
+    FOREIGN KEY (created_by) REFERENCES users(id) ON DELETE CASCADE
+);
+
 -- Comments table with nested comment support
 CREATE TABLE comments (
     id INT AUTO_INCREMENT PRIMARY KEY,
     file_id INT NOT NULL,
     user_id INT,
+    -- Display name for comments left through a share link (user_id NULL)
+    guest_name VARCHAR(50) DEFAULT NULL,
     content TEXT NOT NULL,
     parent_id INT DEFAULT NULL,
+    -- Materialized path: ancestors' ids and its own, zero-padded, each followed by '/'
+    path VARCHAR(200) CHARACTER SET ascii COLLATE ascii_bin NOT NULL DEFAULT '',
+    depth TINYINT UNSIGNED NOT NULL DEFAULT 0,
+    deleted_at DATETIME DEFAULT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_file_path (file_id, path),
+    INDEX idx_file_roots (file_id, depth, path),
     FOREIGN KEY (file_id) REFERENCES pdf_files(id) ON DELETE CASCADE,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL,
     FOREIGN KEY (parent_id) REFERENCES comments(id) ON DELETE CASCADE
 );
 
+-- Existing databases: after adding path/depth and the indexes above, backfill with
+-- UPDATE comments c JOIN (
+--     WITH RECURSIVE t AS (
+--         SELECT id, CONCAT(LPAD(id, 10, '0'), '/') AS path, 0 AS depth
+--         FROM comments WHERE parent_id IS NULL
+--         UNION ALL
+--         SELECT c.id, CONCAT(t.path, LPAD(c.id, 10, '0'), '/'), t.depth + 1
+--         FROM comments c JOIN t ON c.parent_id = t.id
+--     ) SELECT * FROM t
+-- ) p ON p.id = c.id
+-- SET c.path = p.path, c.depth = p.depth;
+
+-- Append-only log of comment inserts and tombstones; the latest id per file is
+-- its sync cursor (ETag on the comment listing, since= for delta sync)
+CREATE TABLE comment_events (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    file_id INT NOT NULL,
+    comment_id INT NOT NULL,
+    event ENUM('added', 'deleted') NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX (file_id, id),
+    FOREIGN KEY (file_id) REFERENCES pdf_files(id) ON DELETE CASCADE,
+    FOREIGN KEY (comment_id) REFERENCES comments(id) ON DELETE CASCADE
+);
+
 -- Password reset tokens table
 CREATE TABLE password_reset_tokens (
     id INT AUTO_INCREMENT PRIMARY KEY,
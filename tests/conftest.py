@@ -0,0 +1,78 @@
+import contextlib
+import os
+import sys
+
+import pytest
+
+# No background threads, worker processes or DB connections at import time
+os.environ.setdefault('JOB_WORKERS', '0')
+os.environ.setdefault('MAIL_WORKERS', '0')
+os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+os.environ.setdefault('PASSWORD_HASH_ROUNDS', '4')
+os.environ.setdefault('DB_POOL_MIN_SIZE', '0')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+class FakeCursor:
+    """Stands in for a db_cursor()/db_transaction() cursor.
+
+    Records every statement (whitespace collapsed) with its params and
+    answers fetchone()/fetchall() from results, in order. Each INSERT
+    gets the next id as lastrowid, like AUTO_INCREMENT.
+    """
+
+    def __init__(self, results=(), next_id=1):
+        self.statements = []
+        self.results = list(results)
+        self.lastrowid = None
+        self.rowcount = 0
+        self._next_id = next_id
+
+    def execute(self, sql, params=()):
+        self.statements.append((' '.join(sql.split()), list(params or ())))
+        if sql.lstrip().upper().startswith('INSERT'):
+            self.lastrowid = self._next_id
+            self._next_id += 1
+
+    def executemany(self, sql, rows):
+        self.statements.append((' '.join(sql.split()), [list(row) for row in rows]))
+
+    def fetchone(self):
+        return self.results.pop(0)
+
+    def fetchall(self):
+        return self.results.pop(0)
+
+    def sql(self):
+        return [statement for statement, _ in self.statements]
+
+
+def fake_cursor_factory(cursor):
+    """A db_cursor()/db_transaction() replacement that always yields cursor"""
+    @contextlib.contextmanager
+    def factory():
+        yield cursor
+    return factory
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import app
+    app.config.update(TESTING=True)
+    return app
+
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def upload_folder(tmp_path, monkeypatch):
+    """Point the blob store at an empty directory"""
+    from config import Config
+    from utils import blob_store
+    monkeypatch.setattr(Config, 'UPLOAD_FOLDER', str(tmp_path))
+    monkeypatch.setattr(blob_store, 'TEMP_FOLDER', str(tmp_path / '.tmp'))
+    return tmp_path
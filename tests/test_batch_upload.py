@@ -0,0 +1,138 @@
+import hashlib
+import io
+import json
+import os
+import zipfile
+
+import pytest
+from PyPDF2 import PdfFileWriter
+from werkzeug.datastructures import FileStorage
+
+from conftest import FakeCursor, fake_cursor_factory
+from config import Config
+from utils import batch_upload
+from utils.batch_upload import BatchUploadError, save_batch
+
+
+def make_pdf(pages=1):
+    writer = PdfFileWriter()
+    for _ in range(pages):
+        writer.addBlankPage(612, 792)
+    buf = io.BytesIO()
+    writer.write(buf)
+    return buf.getvalue()
+
+
+def make_zip(members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buf.getvalue()
+
+
+def upload(filename, data):
+    return FileStorage(stream=io.BytesIO(data), filename=filename)
+
+
+@pytest.fixture
+def cursor(upload_folder, app_context, monkeypatch):
+    cursor = FakeCursor(next_id=100)
+    monkeypatch.setattr(batch_upload, 'db_transaction', fake_cursor_factory(cursor))
+    monkeypatch.setattr(batch_upload, 'get_job_queue', lambda: type('Queue', (), {'wake': lambda self: None})())
+    return cursor
+
+
+def file_row(file_id, filename, data):
+    return {'id': file_id, 'filename': filename, 'content_hash': hashlib.sha256(data).hexdigest()}
+
+
+def inserts(cursor, table):
+    return [params for sql, params in cursor.statements if sql.startswith(f"INSERT INTO {table}")]
+
+
+def test_mixed_batch_reports_each_file_in_order(cursor, upload_folder):
+    one, two, three = make_pdf(1), make_pdf(2), make_pdf(3)
+    archive = make_zip({
+        'course/week1.pdf': two,
+        'course/notes.txt': 'notes',
+        '__MACOSX/course/._week1.pdf': 'resource fork',
+        'course/fake.pdf': 'hello',
+        'course/week2.pdf': three,
+        'course/': '',
+    })
+
+    # Another upload of the same user took id 102 in the middle of this batch
+    cursor.results = [[file_row(101, 'one.pdf', one), file_row(102, 'other.pdf', one),
+                       file_row(103, 'week1.pdf', two), file_row(104, 'week2.pdf', three)]]
+
+    results = save_batch([upload('one.pdf', one), upload('course.zip', archive),
+                          upload('notes.doc', b'x'), upload('broken.zip', b'junk')], 1)
+
+    assert [(r['filename'], r['success']) for r in results] == [
+        ('one.pdf', True), ('week1.pdf', True), ('notes.txt', False),
+        ('fake.pdf', False), ('week2.pdf', True), ('notes.doc', False), ('broken.zip', False)]
+    assert results[2]['error'] == 'Skipped: notes.txt in course.zip is not a PDF'
+    assert results[3]['error'] == 'Not a PDF file'
+    assert results[5]['error'] == 'Only PDF and ZIP files are allowed'
+    assert results[6]['error'] == 'Not a valid ZIP archive'
+
+    # One statement per table; the ids are read back from lastrowid on
+    files = inserts(cursor, 'pdf_files')
+    assert len(files) == 1 and len(files[0]) == 3 * 5
+    assert [params for sql, params in cursor.statements if sql.startswith('SELECT id')] == [[1, 101]]
+    assert [r['file_id'] for r in results if r['success']] == [101, 103, 104]
+    jobs = inserts(cursor, 'jobs')
+    assert len(jobs) == 1
+    assert [json.loads(jobs[0][i])['file_id'] for i in (1, 5, 9)] == [101, 103, 104]
+
+    stored = sorted(name for name in os.listdir(upload_folder) if name.endswith('.pdf'))
+    assert stored == sorted(f"{hashlib.sha256(data).hexdigest()}.pdf" for data in (one, two, three))
+    assert os.listdir(upload_folder / '.tmp') == []
+
+
+def test_duplicates_in_a_batch_share_one_blob(cursor, upload_folder):
+    data = make_pdf()
+    cursor.results = [[file_row(101, 'a.pdf', data), file_row(102, 'b.pdf', data)]]
+
+    results = save_batch([upload('a.pdf', data), upload('b.pdf', data)], 1)
+
+    assert all(r['success'] for r in results)
+    blobs = inserts(cursor, 'pdf_blobs')
+    assert blobs == [[hashlib.sha256(data).hexdigest(), f"{hashlib.sha256(data).hexdigest()}.pdf", len(data), 2]]
+    assert len([n for n in os.listdir(upload_folder) if n.endswith('.pdf')]) == 1
+    assert os.listdir(upload_folder / '.tmp') == []
+
+
+def test_batch_without_valid_pdfs_writes_nothing(cursor):
+    results = save_batch([upload('a.txt', b'text'), upload('b.pdf', b'not a pdf')], 1)
+    assert [r['success'] for r in results] == [False, False]
+    assert cursor.statements == []
+
+
+def test_too_many_files_rejects_whole_batch(cursor, monkeypatch):
+    monkeypatch.setattr(Config, 'BATCH_UPLOAD_MAX_FILES', 1)
+    archive = make_zip({'a.pdf': make_pdf(1), 'b.pdf': make_pdf(2)})
+
+    with pytest.raises(BatchUploadError):
+        save_batch([upload('course.zip', archive)], 1)
+    assert cursor.statements == []
+
+
+def test_plain_pdfs_count_toward_batch_size(cursor, monkeypatch):
+    data = make_pdf()
+    monkeypatch.setattr(Config, 'BATCH_UPLOAD_MAX_BYTES', len(data) * 2 - 1)
+
+    with pytest.raises(BatchUploadError):
+        save_batch([upload('a.pdf', data), upload('b.pdf', data)], 1)
+    assert cursor.statements == []
+
+
+def test_zip_members_count_uncompressed(cursor, monkeypatch):
+    data = make_pdf() + b' ' * 100000
+    archive = make_zip({'padded.pdf': data})
+    assert len(archive) < len(data) // 10
+    monkeypatch.setattr(Config, 'BATCH_UPLOAD_MAX_BYTES', len(data) - 1)
+
+    with pytest.raises(BatchUploadError):
+        save_batch([upload('course.zip', archive)], 1)
@@ -0,0 +1,104 @@
+import os
+
+from conftest import FakeCursor, fake_cursor_factory
+from utils import blob_store
+from utils.blob_store import (blob_path, commit_blob, commit_blobs, drop_blob_files,
+                              optimized_blob_path, release_blob, write_temp_blob)
+
+HASH_A = 'a' * 64
+HASH_B = 'b' * 64
+
+
+def temp_file(folder, name, data=b'%PDF-1.4'):
+    path = folder / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_commit_blobs_takes_one_reference_per_upload(upload_folder):
+    first = temp_file(upload_folder, 'first.part')
+    duplicate = temp_file(upload_folder, 'duplicate.part')
+    other = temp_file(upload_folder, 'other.part', b'%PDF-1.7')
+    cursor = FakeCursor()
+
+    commit_blobs(cursor, {HASH_A: (8, [first, duplicate]), HASH_B: (8, [other])})
+
+    statement, params = cursor.statements[0]
+    assert 'ON DUPLICATE KEY UPDATE ref_count = ref_count + VALUES(ref_count)' in statement
+    assert params == [HASH_A, f"{HASH_A}.pdf", 8, 2, HASH_B, f"{HASH_B}.pdf", 8, 1]
+    assert os.path.exists(blob_path(HASH_A)) and os.path.exists(blob_path(HASH_B))
+    assert not any(os.path.exists(p) for p in (first, duplicate, other))
+
+
+def test_commit_blob_keeps_existing_bytes(upload_folder):
+    existing = blob_path(HASH_A)
+    with open(existing, 'wb') as f:
+        f.write(b'stored')
+    upload = temp_file(upload_folder, 'upload.part')
+
+    assert commit_blob(FakeCursor(), upload, HASH_A, 8) == f"{HASH_A}.pdf"
+    assert not os.path.exists(upload)
+    with open(existing, 'rb') as f:
+        assert f.read() == b'stored'
+
+
+def test_release_blob_decrements_shared_blob(upload_folder):
+    open(blob_path(HASH_A), 'wb').close()
+    cursor = FakeCursor(results=[{'ref_count': 2}])
+
+    assert release_blob(cursor, HASH_A) == []
+    assert 'FOR UPDATE' in cursor.sql()[0]
+    assert cursor.sql()[1].startswith('UPDATE pdf_blobs SET ref_count = ref_count - 1')
+    assert os.path.exists(blob_path(HASH_A))
+
+
+def test_release_blob_leaves_files_for_after_commit(upload_folder):
+    for path in (blob_path(HASH_A), optimized_blob_path(HASH_A)):
+        open(path, 'wb').close()
+    cursor = FakeCursor(results=[{'ref_count': 1}])
+
+    paths = release_blob(cursor, HASH_A)
+
+    assert paths == [blob_path(HASH_A), optimized_blob_path(HASH_A)]
+    assert cursor.sql()[1] == 'DELETE FROM pdf_blobs WHERE content_hash = %s'
+    # A rollback must still find the bytes in place
+    assert all(os.path.exists(path) for path in paths)
+
+
+def test_release_blob_ignores_unknown_hash(upload_folder):
+    cursor = FakeCursor(results=[None])
+    assert release_blob(cursor, HASH_A) == []
+    assert len(cursor.statements) == 1
+
+
+def test_drop_blob_files_removes_released_files(upload_folder, monkeypatch):
+    paths = [blob_path(HASH_A), optimized_blob_path(HASH_A)]
+    open(paths[0], 'wb').close()
+    cursor = FakeCursor(results=[None])
+    monkeypatch.setattr(blob_store, 'db_transaction', fake_cursor_factory(cursor))
+
+    assert drop_blob_files(HASH_A, paths) is True
+    assert 'FOR UPDATE' in cursor.sql()[0]
+    assert not any(os.path.exists(path) for path in paths)
+
+
+def test_drop_blob_files_keeps_bytes_uploaded_again(upload_folder, monkeypatch):
+    path = blob_path(HASH_A)
+    open(path, 'wb').close()
+    monkeypatch.setattr(blob_store, 'db_transaction', fake_cursor_factory(FakeCursor(results=[{'1': 1}])))
+
+    assert drop_blob_files(HASH_A, [path]) is False
+    assert os.path.exists(path)
+
+
+def test_write_temp_blob_hashes_while_streaming(upload_folder):
+    import hashlib
+    import io
+    data = b'%PDF-1.4 ' + b'x' * 200000
+
+    temp_path, content_hash, size = write_temp_blob(io.BytesIO(data))
+
+    assert content_hash == hashlib.sha256(data).hexdigest()
+    assert size == len(data)
+    with open(temp_path, 'rb') as f:
+        assert f.read() == data
@@ -0,0 +1,64 @@
+from conftest import FakeCursor
+from config import Config
+from utils.comment_threads import changes_since, delete_thread, root_path, settled_event_id, subtree_end
+
+
+def test_delete_thread_tombstones_subtree_and_returns_its_own_last_event():
+    path = root_path(5)
+    cursor = FakeCursor(results=[[{'id': 5}, {'id': 6}, {'id': 8}]], next_id=100)
+
+    ids, event_id = delete_thread(cursor, 3, path)
+
+    assert ids == [5, 6, 8]
+    select, params = cursor.statements[0]
+    assert 'FOR UPDATE' in select
+    assert params == [3, path, subtree_end(path)]
+    assert cursor.statements[1] == (
+        "UPDATE comments SET deleted_at = NOW(), content = '' WHERE id IN (%s, %s, %s)", [5, 6, 8])
+    events = [params for sql, params in cursor.statements if sql.startswith('INSERT INTO comment_events')]
+    assert events == [[3, 5], [3, 6], [3, 8]]
+    # Not MAX(id): the id of the last tombstone written by this call
+    assert event_id == 102
+    assert not any('MAX(id)' in sql for sql in cursor.sql())
+
+
+def test_delete_thread_of_already_deleted_comment_is_a_no_op():
+    cursor = FakeCursor(results=[[]])
+    assert delete_thread(cursor, 3, root_path(5)) == ([], None)
+    assert len(cursor.statements) == 1
+
+
+def event(event_id, settled=True):
+    return {'event_id': event_id, 'event': 'added', 'settled': settled, 'id': event_id}
+
+
+def test_changes_since_hands_out_cursor_for_settled_events_only():
+    cursor = FakeCursor(results=[[event(11), event(12), event(14, settled=False), event(15, settled=False)]])
+
+    rows, has_more, sync_cursor = changes_since(cursor, 3, 10, limit=3)
+
+    # 13 may still be committing: 14 is sent now and again with it next time
+    assert [row['event_id'] for row in rows] == [11, 12, 14]
+    assert (has_more, sync_cursor) == (False, 12)
+    assert cursor.statements[0][1] == [Config.COMMENT_SYNC_SETTLE_SECONDS, 3, 10, 4]
+
+
+def test_changes_since_pages_through_settled_events():
+    cursor = FakeCursor(results=[[event(11), event(12), event(13)]])
+
+    rows, has_more, sync_cursor = changes_since(cursor, 3, 10, limit=2)
+
+    assert len(rows) == 2 and (has_more, sync_cursor) == (True, 12)
+
+
+def test_changes_since_keeps_the_cursor_when_nothing_is_new():
+    assert changes_since(FakeCursor(results=[[]]), 3, 10) == ([], False, 10)
+
+
+def test_settled_event_id_skips_events_inside_the_commit_window():
+    cursor = FakeCursor(results=[None])
+
+    assert settled_event_id(cursor, 3) == 0
+    statement, params = cursor.statements[0]
+    assert 'created_at < NOW() - INTERVAL %s SECOND ORDER BY id DESC LIMIT 1' in statement
+    assert params == [3, Config.COMMENT_SYNC_SETTLE_SECONDS]
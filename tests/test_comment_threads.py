@@ -0,0 +1,92 @@
+import pytest
+
+from conftest import FakeCursor
+from config import Config
+from utils.comment_threads import (CommentThreadError, build_tree, insert_comment,
+                                   load_threads, root_path, subtree_end)
+from utils.pagination import encode_cursor
+
+
+def test_paths_sort_replies_inside_their_subtree():
+    root = root_path(12)
+    reply = root + root_path(40)
+    grandchild = reply + root_path(41)
+    next_root = root_path(13)
+
+    assert root == '0000000012/'
+    assert sorted([next_root, grandchild, root, reply]) == [root, reply, grandchild, next_root]
+    # The subtree of 12 is the range [root, subtree_end(root))
+    assert root <= reply < subtree_end(root)
+    assert root <= grandchild < subtree_end(root)
+    assert subtree_end(root) <= next_root
+
+
+def test_insert_root_comment_sets_its_own_path():
+    cursor = FakeCursor(next_id=7)
+
+    comment_id, depth, event_id = insert_comment(cursor, 3, 'Hello', user_id=1)
+
+    assert (comment_id, depth, event_id) == (7, 0, 8)
+    assert cursor.statements[1] == ('UPDATE comments SET path = %s WHERE id = %s', ['0000000007/', 7])
+
+
+def test_insert_reply_extends_parent_path():
+    parent_path = root_path(7)
+    cursor = FakeCursor(results=[{'path': parent_path, 'depth': 0}], next_id=9)
+
+    comment_id, depth, _ = insert_comment(cursor, 3, 'Reply', parent_id=7, guest_name='Sam')
+
+    assert (comment_id, depth) == (9, 1)
+    assert cursor.statements[2][1] == [parent_path + root_path(9), 9]
+    insert_params = cursor.statements[1][1]
+    assert insert_params[:3] == [3, None, 'Sam']
+
+
+def test_reply_to_missing_or_deleted_parent_is_rejected():
+    cursor = FakeCursor(results=[None])
+    with pytest.raises(CommentThreadError):
+        insert_comment(cursor, 3, 'Reply', parent_id=99, user_id=1)
+    assert 'deleted_at IS NULL' in cursor.sql()[0]
+    assert len(cursor.statements) == 1
+
+
+def test_reply_past_max_depth_is_rejected():
+    cursor = FakeCursor(results=[{'path': root_path(1), 'depth': Config.COMMENT_MAX_DEPTH}])
+    with pytest.raises(CommentThreadError):
+        insert_comment(cursor, 3, 'Too deep', parent_id=1, user_id=1)
+
+
+def test_load_threads_pages_on_roots_and_fetches_their_replies():
+    roots = [{'id': 1, 'path': root_path(1)}, {'id': 4, 'path': root_path(4)},
+             {'id': 9, 'path': root_path(9)}]
+    replies = [{'id': 1}, {'id': 2}, {'id': 4}]
+    cursor = FakeCursor(results=[roots, replies])
+
+    rows, next_cursor = load_threads(cursor, 3, limit=2)
+
+    assert rows == replies
+    assert next_cursor == encode_cursor(4)
+    assert cursor.statements[0][1] == [3, '', 3]
+    assert cursor.statements[1][1] == [3, root_path(1), subtree_end(root_path(4))]
+
+    cursor = FakeCursor(results=[[]])
+    assert load_threads(cursor, 3, after=next_cursor, limit=2) == ([], None)
+    assert cursor.statements[0][1] == [3, root_path(4), 3]
+
+
+def test_build_tree_nests_path_ordered_rows():
+    rows = [
+        {'id': 1, 'parent_id': None},
+        {'id': 2, 'parent_id': 1},
+        {'id': 3, 'parent_id': 2},
+        {'id': 4, 'parent_id': 1},
+        {'id': 5, 'parent_id': None},
+    ]
+
+    tree = build_tree(rows)
+
+    assert [node['id'] for node in tree] == [1, 5]
+    assert [node['id'] for node in tree[0]['replies']] == [2, 4]
+    assert tree[0]['replies'][0]['replies'][0]['id'] == 3
+    assert tree[1]['replies'] == []
+    assert 'replies' not in rows[0]
@@ -0,0 +1,45 @@
+from datetime import datetime
+from unittest import mock
+
+import pytest
+
+from conftest import FakeCursor, fake_cursor_factory
+from controllers import pdf_controller
+from models import User
+
+REPORT = {'id': 3, 'filename': 'report.pdf', 'upload_date': datetime(2024, 1, 2),
+          'page_count': 12, 'original_size': 2048, 'title': 'Quarterly report', 'author': 'Ann Lee'}
+
+
+@pytest.fixture
+def client(app):
+    user = User(id=1, name='Ann', email='ann@example.com', created_at=None)
+    with mock.patch('flask_login.utils._get_user', return_value=user):
+        yield app.test_client()
+
+
+def search(client, monkeypatch, user_pdfs, text_hits=(), query='report'):
+    cursor = FakeCursor(results=[user_pdfs, []])
+    monkeypatch.setattr(pdf_controller, 'db_cursor', fake_cursor_factory(cursor))
+    monkeypatch.setattr(pdf_controller, 'search_pages', lambda *args, **kwargs: list(text_hits))
+    return client.get('/search', query_string={'q': query, 'sort': 'pages'})
+
+
+def test_search_renders_dashboard_with_view_controls(client, monkeypatch):
+    response = search(client, monkeypatch, [], text_hits=[
+        {'id': 3, 'filename': 'report.pdf', 'page_number': 4, 'snippet': 'the quarterly report'}])
+
+    assert response.status_code == 200
+    html = response.get_data(as_text=True)
+    assert 'Matches inside documents' in html
+    assert 'the quarterly report' in html
+    assert '<option value="pages" selected>' in html
+
+
+def test_search_renders_matching_file_cards(client, monkeypatch):
+    html = search(client, monkeypatch, [REPORT]).get_data(as_text=True)
+
+    assert 'id="pdf-grid"' in html
+    assert 'report.pdf' in html
+    assert 'Quarterly report' in html
+    assert '12 pages' in html
@@ -0,0 +1,160 @@
+import contextlib
+import smtplib
+import socket
+import ssl
+from collections import deque
+
+import pytest
+
+from conftest import FakeCursor, fake_cursor_factory
+from utils import mail_outbox
+from utils.mail_outbox import CONNECTION_ERRORS, MailOutbox
+
+
+@pytest.mark.parametrize('error', [
+    smtplib.SMTPServerDisconnected('Connection unexpectedly closed'),
+    smtplib.SMTPConnectError(421, b'Too many connections'),
+    ConnectionResetError(104, 'Connection reset by peer'),
+    socket.timeout('timed out'),
+])
+def test_lost_sessions_are_connection_errors(error):
+    assert isinstance(error, CONNECTION_ERRORS)
+
+
+@pytest.mark.parametrize('error', [
+    smtplib.SMTPRecipientsRefused({'bad@example.com': (550, b'No such user')}),
+    smtplib.SMTPDataError(554, b'Message rejected'),
+    smtplib.SMTPSenderRefused(553, b'Sender refused', 'noreply@example.com'),
+    UnicodeEncodeError('ascii', 'é', 0, 1, 'ordinal not in range'),
+])
+def test_message_errors_are_not_connection_errors(error):
+    # Every SMTPException is an OSError; these must fail only their own message
+    assert not isinstance(error, CONNECTION_ERRORS)
+
+
+class FakeConnection:
+    def __init__(self, errors):
+        self.errors = errors
+        self.sent = []
+
+    def send(self, message):
+        error = self.errors.get(message)
+        if error:
+            raise error
+        self.sent.append(message)
+
+
+@pytest.fixture
+def outbox(app, monkeypatch):
+    """MailOutbox whose database calls are recorded instead of run"""
+    box = MailOutbox()
+    box.app = app
+    box.calls = []
+    box.batches = []
+    monkeypatch.setattr(box, '_claim', lambda: deque(box.batches.pop(0)) if box.batches else deque())
+    monkeypatch.setattr(box, '_message', lambda row: row['id'])
+    monkeypatch.setattr(box, '_throttle', lambda: None)
+    monkeypatch.setattr(box, '_mark_sent', lambda ids: ids and box.calls.append(('sent', list(ids))))
+    monkeypatch.setattr(box, '_release', lambda rows: box.calls.append(('released', [r['id'] for r in rows])))
+    monkeypatch.setattr(box, '_retry_or_fail',
+                        lambda row, error: box.calls.append(('retry', row['id'], type(error).__name__)))
+    return box
+
+
+def use_connection(monkeypatch, connection):
+    @contextlib.contextmanager
+    def connect():
+        yield connection
+    monkeypatch.setattr(mail_outbox.mail, 'connect', connect)
+
+
+def test_refused_recipient_only_fails_its_own_message(outbox, monkeypatch):
+    connection = FakeConnection({2: smtplib.SMTPRecipientsRefused({'x@example.com': (550, b'No')})})
+    use_connection(monkeypatch, connection)
+    outbox.batches = [[{'id': 1}, {'id': 2}, {'id': 3}], [{'id': 4}]]
+
+    assert outbox._deliver() is True
+
+    assert connection.sent == [1, 3, 4]
+    assert outbox.calls == [('retry', 2, 'SMTPRecipientsRefused'), ('sent', [1, 3]), ('sent', [4])]
+
+
+def test_dropped_session_charges_message_in_flight_and_releases_the_rest(outbox, monkeypatch):
+    connection = FakeConnection({2: smtplib.SMTPServerDisconnected('Connection unexpectedly closed')})
+    use_connection(monkeypatch, connection)
+    outbox.batches = [[{'id': 1}, {'id': 2}, {'id': 3}, {'id': 4}]]
+
+    assert outbox._deliver() is True
+
+    assert connection.sent == [1]
+    assert outbox.calls == [('retry', 2, 'SMTPServerDisconnected'), ('released', [3, 4]), ('sent', [1])]
+
+
+@pytest.mark.parametrize('error', [
+    smtplib.SMTPAuthenticationError(535, b'Authentication failed'),
+    ssl.SSLError('certificate verify failed'),
+    socket.gaierror(-2, 'Name or service not known'),
+    smtplib.SMTPConnectError(421, b'Too many connections'),
+])
+def test_failed_session_setup_charges_every_claimed_message(outbox, monkeypatch, error):
+    def connect():
+        raise error
+    monkeypatch.setattr(mail_outbox.mail, 'connect', connect)
+    outbox.batches = [[{'id': 1}, {'id': 2}]]
+
+    assert outbox._deliver() is True
+
+    name = type(error).__name__
+    assert outbox.calls == [('retry', 1, name), ('retry', 2, name)]
+
+
+def test_maintenance_fails_stale_mail_that_is_out_of_attempts(app, monkeypatch):
+    cursor = FakeCursor()
+    monkeypatch.setattr(mail_outbox, 'db_cursor', fake_cursor_factory(cursor))
+    box = MailOutbox()
+    box.app = app
+    box._last_maintenance = float('-inf')
+
+    box._maintenance()
+
+    requeue = cursor.sql()[0]
+    assert "SET status = IF(attempts >= max_attempts, 'failed', 'queued')" in requeue
+    assert "WHERE status = 'sending'" in requeue
+
+
+def test_nothing_claimed_opens_no_session(outbox, monkeypatch):
+    def connect():
+        raise AssertionError('connected with nothing to send')
+    monkeypatch.setattr(mail_outbox.mail, 'connect', connect)
+
+    assert outbox._deliver() is False
+
+
+def test_queue_mail_wakes_workers_after_commit(monkeypatch):
+    cursor = FakeCursor()
+    events = []
+
+    @contextlib.contextmanager
+    def db_cursor():
+        yield cursor
+        events.append('commit')
+
+    class Outbox:
+        def wake(self):
+            events.append('wake')
+
+    monkeypatch.setattr(mail_outbox, 'db_cursor', db_cursor)
+    monkeypatch.setattr(mail_outbox, 'get_mail_outbox', Outbox)
+
+    assert mail_outbox.queue_mail(['a@example.com', 'b@example.com'], 'Hello', body='Hi') == 2
+    assert len(cursor.statements[0][1]) == 2
+    assert events == ['commit', 'wake']
+
+
+def test_enqueue_mail_leaves_waking_to_the_caller(monkeypatch):
+    # The caller's transaction hasn't committed yet, so a woken worker would find nothing
+    monkeypatch.setattr(mail_outbox, 'get_mail_outbox', lambda: pytest.fail('woken before commit'))
+    cursor = FakeCursor()
+
+    assert mail_outbox.enqueue_mail(cursor, ['a@example.com'], 'Hello') == 1
+    assert cursor.sql()[0].startswith('INSERT INTO mail_outbox')
@@ -0,0 +1,31 @@
+import pytest
+from flask import Flask
+
+from utils.metrics import Metrics
+
+
+def metrics_app(token):
+    app = Flask(__name__)
+    app.config.update(METRICS_ENABLED=True, METRICS_TOKEN=token, PROFILE_SLOW_REQUEST_MS=0)
+    metrics = Metrics(app)
+    metrics.render = lambda: 'http_requests_in_progress 0\n'
+    return app
+
+
+def test_metrics_are_not_served_without_a_token():
+    app = metrics_app(None)
+
+    assert 'metrics' not in app.view_functions
+    assert app.test_client().get('/metrics').status_code == 404
+
+
+@pytest.mark.parametrize('authorization, status', [
+    (None, 401),
+    ('Bearer wrong', 401),
+    ('Bearer s3cret', 200),
+])
+def test_metrics_require_the_bearer_token(authorization, status):
+    headers = {'Authorization': authorization} if authorization else {}
+    response = metrics_app('s3cret').test_client().get('/metrics', headers=headers)
+
+    assert response.status_code == status
@@ -0,0 +1,37 @@
+from datetime import datetime
+
+import pytest
+
+from utils.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trips_sort_key():
+    uploaded = datetime(2024, 5, 6, 7, 8, 9)
+    token = encode_cursor(uploaded, 42)
+
+    assert '=' not in token and '/' not in token and '+' not in token
+    assert decode_cursor(token, datetime, int) == (uploaded, 42)
+
+
+def test_cursor_round_trips_strings():
+    token = encode_cursor('Report: Q3 / final', 7)
+    assert decode_cursor(token, str, int) == ('Report: Q3 / final', 7)
+
+
+@pytest.mark.parametrize('token', ['', 'not base64!', 'bm90IGpzb24'])
+def test_malformed_cursor_is_rejected(token):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, int)
+
+
+def test_cursor_with_wrong_shape_is_rejected():
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor(1, 2), int)
+
+
+def test_cursor_with_wrong_types_is_rejected():
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor('yesterday', 3), datetime, int)
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor('abc'), int)
+
@@ -0,0 +1,55 @@
+import contextlib
+
+import pytest
+
+from conftest import FakeCursor
+from controllers import auth_controller
+from models import User
+
+TOKEN_DATA = {'user_id': 9, 'email': 'ann@example.com'}
+
+
+@pytest.fixture
+def reset(app, monkeypatch):
+    """Posts a new password for a valid token, recording commits and cache invalidations"""
+    events = []
+    cursor = FakeCursor()
+
+    @contextlib.contextmanager
+    def db_transaction():
+        events.append('begin')
+        yield cursor
+        events.append('commit')
+
+    monkeypatch.setattr(auth_controller, 'query_one', lambda sql, params: TOKEN_DATA)
+    monkeypatch.setattr(auth_controller, 'db_transaction', db_transaction)
+    monkeypatch.setattr(auth_controller, 'invalidate_user', lambda user_id: events.append(('invalidate', user_id)))
+    monkeypatch.setattr(User, 'generate_password_hash', staticmethod(lambda password: events.append('hash') or 'hashed'))
+
+    def run(claimed=True):
+        cursor.rowcount = 1 if claimed else 0
+        form = {'password': 'new-secret', 'confirm_password': 'new-secret'}
+        with app.test_request_context('/reset_password/abc', method='POST', data=form):
+            return auth_controller.reset_password('abc')
+
+    run.events, run.cursor = events, cursor
+    return run
+
+
+def test_password_is_hashed_before_and_cache_cleared_after_the_transaction(reset):
+    response = reset()
+
+    assert response.location.endswith('/login')
+    assert reset.events == ['hash', 'begin', 'commit', ('invalidate', 9)]
+    assert reset.cursor.statements == [
+        ('UPDATE password_reset_tokens SET used = 1 WHERE token = %s AND used = 0', ['abc']),
+        ('UPDATE users SET password = %s WHERE id = %s', ['hashed', 9]),
+    ]
+
+
+def test_token_used_concurrently_changes_nothing(reset):
+    response = reset(claimed=False)
+
+    assert response.location.endswith('/forgot_password')
+    assert reset.events == ['hash', 'begin', 'commit']
+    assert len(reset.cursor.statements) == 1
@@ -0,0 +1,83 @@
+from datetime import datetime
+
+import pytest
+from PyPDF2 import PdfFileWriter
+from PyPDF2.generic import NameObject, createStringObject
+
+from utils.pdf_metadata import parse_pdf_date, read_metadata
+
+
+def write_pdf(path, pages=1, info=None, indirect=False):
+    """A blank PDF whose document info holds info, optionally as indirect objects"""
+    writer = PdfFileWriter()
+    for _ in range(pages):
+        writer.addBlankPage(612, 792)
+    document_info = writer._info.getObject()
+    for key, value in (info or {}).items():
+        value = createStringObject(value)
+        document_info[NameObject(key)] = writer._addObject(value) if indirect else value
+    with open(path, 'wb') as out:
+        writer.write(out)
+    return str(path)
+
+
+@pytest.mark.parametrize('value, expected', [
+    ("D:20240102030405+01'00'", datetime(2024, 1, 2, 3, 4, 5)),
+    ('D:20240102030405Z', datetime(2024, 1, 2, 3, 4, 5)),
+    ('D:2024', datetime(2024, 1, 1)),
+    ('D:202402', datetime(2024, 2, 1)),
+    (' D:20240102 ', datetime(2024, 1, 2)),
+    ('D:20241302', None),
+    ('2024-01-02', None),
+    ('', None),
+    (None, None),
+])
+def test_parse_pdf_date(value, expected):
+    assert parse_pdf_date(value) == expected
+
+
+def test_read_metadata_reads_info_and_pages(tmp_path, app_context):
+    path = write_pdf(tmp_path / 'a.pdf', pages=3, info={
+        '/Title': '  Quarterly\n report ',
+        '/Author': 'Ann Lee',
+        '/CreationDate': "D:20240102030405+01'00'",
+    })
+
+    metadata = read_metadata(path)
+
+    assert metadata['page_count'] == 3
+    assert metadata['pdf_version'] == '1.3'
+    assert metadata['title'] == 'Quarterly report'
+    assert metadata['author'] == 'Ann Lee'
+    assert metadata['subject'] is None
+    assert metadata['created_at'] == datetime(2024, 1, 2, 3, 4, 5)
+
+
+def test_read_metadata_resolves_indirect_info_entries(tmp_path, app_context):
+    path = write_pdf(tmp_path / 'a.pdf', indirect=True, info={
+        '/Title': 'Indirect title',
+        '/Subject': 'Indirect subject',
+        '/CreationDate': 'D:20231231',
+    })
+
+    metadata = read_metadata(path)
+
+    assert metadata['title'] == 'Indirect title'
+    assert metadata['subject'] == 'Indirect subject'
+    assert metadata['created_at'] == datetime(2023, 12, 31)
+
+
+def test_read_metadata_truncates_long_values(tmp_path, app_context):
+    path = write_pdf(tmp_path / 'a.pdf', info={'/Title': 'x' * 1000})
+    assert len(read_metadata(path)['title']) == 255
+
+
+def test_unreadable_pdf_keeps_header_version(tmp_path, app_context):
+    path = tmp_path / 'broken.pdf'
+    path.write_bytes(b'%PDF-1.7\nnot really a pdf')
+
+    metadata = read_metadata(str(path))
+
+    assert metadata['pdf_version'] == '1.7'
+    assert metadata['page_count'] == 0
+    assert metadata['title'] is None and metadata['created_at'] is None
@@ -0,0 +1,32 @@
+from conftest import FakeCursor, fake_cursor_factory
+from utils import pdf_text
+from utils.blob_store import blob_path
+from utils.pdf_text import extract_pages, index_blob, make_snippet
+
+HASH = 'c' * 64
+
+
+def test_non_pdf_yields_no_pages(tmp_path, app_context):
+    path = tmp_path / 'notes.pdf'
+    path.write_text('plain text renamed to .pdf')
+    assert list(extract_pages(str(path))) == []
+
+
+def test_unreadable_blob_is_still_marked_indexed(upload_folder, app_context, monkeypatch):
+    with open(blob_path(HASH), 'wb') as f:
+        f.write(b'%PDF-1.4\nbroken')
+    cursor = FakeCursor(results=[{'text_indexed_at': None}])
+    monkeypatch.setattr(pdf_text, 'db_cursor', fake_cursor_factory(cursor))
+
+    index_blob(HASH)
+
+    assert cursor.sql()[1:] == [
+        'DELETE FROM pdf_text_pages WHERE content_hash = %s',
+        'UPDATE pdf_blobs SET text_indexed_at = NOW() WHERE content_hash = %s',
+    ]
+
+
+def test_snippet_highlights_terms_and_escapes_text():
+    snippet = make_snippet('Revenue <b>grew</b> in the third quarter', ['quarter'])
+    assert '<mark>quarter</mark>' in snippet
+    assert '&lt;b&gt;' in snippet
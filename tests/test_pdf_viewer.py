@@ -0,0 +1,34 @@
+from datetime import datetime
+
+import pytest
+from flask import render_template
+from markupsafe import Markup
+
+PDF_FILE = {'id': 1, 'user_id': 2, 'filename': 'report.pdf', 'filepath': f"{'a' * 64}.pdf",
+            'content_hash': 'a' * 64, 'allow_comments': True}
+COMMENT = {'id': 5, 'file_id': 1, 'user_id': None, 'parent_id': None, 'path': '0000000005/',
+           'depth': 0, 'content': 'Looks good', 'created_at': datetime(2024, 1, 2), 'user_name': 'Sam'}
+
+
+def render_viewer(app, comments):
+    """pdf_viewer.html for a share link, with the fragment built the way comment_thread_fragment does"""
+    with app.test_request_context('/shared/token'):
+        comments_html = Markup(render_template('_comment_list.html', comments=comments, can_reply=True))
+        return render_template('pdf_viewer.html', pdf_file=PDF_FILE, comments=comments,
+                               comments_html=comments_html, comments_cursor=None, sync_cursor=0,
+                               page_count=3, file_url='/uploads/report.pdf', is_shared=True,
+                               share_token='token')
+
+
+def test_empty_thread_fragment_is_not_empty(app):
+    # Why the viewer can't branch on the fragment itself
+    with app.test_request_context('/'):
+        assert render_template('_comment_list.html', comments=[], can_reply=True)
+
+
+@pytest.mark.parametrize('comments, placeholder', [([], True), ([COMMENT], False)])
+def test_viewer_shows_placeholder_only_without_comments(app, comments, placeholder):
+    html = render_viewer(app, comments)
+
+    assert ('No comments yet' in html) is placeholder
+    assert ('Looks good' in html) is not placeholder
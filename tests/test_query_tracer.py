@@ -0,0 +1,30 @@
+from utils.query_tracer import fingerprint
+
+
+def test_values_and_placeholders_share_a_fingerprint():
+    assert fingerprint("SELECT * FROM pdf_files WHERE id = 12 AND filename = 'a.pdf'") == \
+        fingerprint('SELECT * FROM pdf_files WHERE id = %s AND filename = %s') == \
+        'SELECT * FROM pdf_files WHERE id = ? AND filename = ?'
+
+
+def test_in_lists_of_any_length_are_folded():
+    short = fingerprint('SELECT id FROM comments WHERE id IN (%s)')
+    long = fingerprint('SELECT id FROM comments WHERE id IN (%s, %s,\n %s)')
+    literal = fingerprint('SELECT id FROM comments WHERE id in (1, 2, 3)')
+    assert short == long == 'SELECT id FROM comments WHERE id IN (...)'
+    assert literal == 'SELECT id FROM comments WHERE id IN (...)'
+
+
+def test_quoted_strings_with_escapes_are_one_literal():
+    sql = "UPDATE comments SET content = 'it\\'s 42' WHERE path >= \"0000000012/\""
+    assert fingerprint(sql) == 'UPDATE comments SET content = ? WHERE path >= ?'
+
+
+def test_whitespace_is_collapsed_and_identifiers_kept():
+    sql = """
+        SELECT  pf.id, pf.page_count
+        FROM pdf_files pf
+        WHERE pf.user_id = %s
+        LIMIT 20
+    """
+    assert fingerprint(sql) == 'SELECT pf.id, pf.page_count FROM pdf_files pf WHERE pf.user_id = ? LIMIT ?'
@@ -0,0 +1,76 @@
+from unittest import mock
+
+import pytest
+
+from conftest import FakeCursor, fake_cursor_factory
+from controllers import share_controller
+from models import User
+from utils.share_recipients import parse_recipients, split_recipients
+
+SHARE = {'id': 4, 'share_token': 'new-token', 'filename': 'report.pdf'}
+
+
+def test_split_and_parse_recipients():
+    addresses = split_recipients('Ann <ANN@example.com>; bob@example.com\nnot-an-email, ann@example.com')
+
+    assert parse_recipients(addresses) == [
+        {'email': 'ann@example.com', 'status': None},
+        {'email': 'bob@example.com', 'status': None},
+        {'email': 'not-an-email', 'status': 'invalid'},
+        {'email': 'ann@example.com', 'status': 'duplicate'},
+    ]
+
+
+@pytest.fixture
+def share(app, monkeypatch):
+    """Runs share_with_recipients as the owner, recording mail instead of queueing it"""
+    mailed, woken = [], []
+    monkeypatch.setattr(share_controller, 'send_share_emails',
+                        lambda recipients, *args, **kwargs: mailed.append((list(recipients), args[2])))
+    monkeypatch.setattr(share_controller, 'get_mail_outbox',
+                        lambda: type('Outbox', (), {'wake': lambda self: woken.append(True)})())
+    user = User(id=1, name='Ann', email='ann@example.com', created_at=None)
+
+    def run(addresses, existing, resend=False):
+        cursor = FakeCursor(results=[SHARE, [{'email': email} for email in existing]])
+        monkeypatch.setattr(share_controller, 'db_transaction', fake_cursor_factory(cursor))
+        with app.test_request_context(), mock.patch('flask_login.utils._get_user', return_value=user):
+            return share_controller.share_with_recipients(7, addresses, resend=resend)
+
+    run.mailed, run.woken = mailed, woken
+    return run
+
+
+def test_existing_recipients_are_skipped_by_default(share):
+    results = share(['old@example.com', 'new@example.com'], existing=['old@example.com'])
+
+    assert [r['status'] for r in results] == ['already_shared', 'queued']
+    assert share.mailed == [(['new@example.com'], 'http://localhost/shared/new-token')]
+    assert share.woken
+
+
+def test_resend_mails_existing_recipients_again(share):
+    results = share(['old@example.com', 'new@example.com', 'bad'], existing=['old@example.com'], resend=True)
+
+    assert [r['status'] for r in results] == ['resent', 'queued', 'invalid']
+    assert share.mailed[0][0] == ['old@example.com', 'new@example.com']
+
+
+def test_nothing_to_send_wakes_nobody(share):
+    results = share(['old@example.com'], existing=['old@example.com'])
+
+    assert [r['status'] for r in results] == ['already_shared']
+    assert share.mailed == [] and share.woken == []
+
+
+def test_refreshed_link_goes_to_every_recipient(app, monkeypatch):
+    mailed = []
+    monkeypatch.setattr(share_controller, 'send_share_emails',
+                        lambda recipients, *args, **kwargs: mailed.append((list(recipients), args[2])))
+    cursor = FakeCursor(results=[[{'email': 'a@example.com'}, {'email': 'b@example.com'}]])
+    user = User(id=1, name='Ann', email='ann@example.com', created_at=None)
+
+    with app.test_request_context(), mock.patch('flask_login.utils._get_user', return_value=user):
+        assert share_controller.resend_share_link(cursor, 4, 'fresh-token', 'report.pdf') == 2
+
+    assert mailed == [(['a@example.com', 'b@example.com'], 'http://localhost/shared/fresh-token')]
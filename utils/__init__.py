@@ -11,5 +11,6 @@ from .file_upload import allowed_file, save_uploaded_file
 from .mail_utils import (
     send_email,
     send_share_email,
+    send_share_emails,
     send_password_reset_email
 )
\ No newline at end of file
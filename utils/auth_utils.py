@@ -1,10 +1,11 @@
 import secrets
 from flask import current_app
-from flask_bcrypt import Bcrypt
 from models import User
 import re
 
-from utils.database import db_cursor
+from utils.database import db_cursor, execute, query_one
+from utils.password_hasher import PasswordHasherBusy, get_password_hasher
+from utils.user_cache import invalidate_user
 
 def validate_registration(name, email, password):
     """Validate user registration data"""
@@ -21,26 +22,33 @@ def validate_registration(name, email, password):
 
 def validate_login(email, password):
     try:
-        connection = current_app.db_pool.get_connection()
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
-        user_data = cursor.fetchone()
+        user_data = query_one("SELECT * FROM users WHERE email = %s", (email,))
 
-        if user_data and current_app.bcrypt.check_password_hash(user_data['password'], password):
+        if user_data and User.check_password_hash(user_data['password'], password):
+            rehash_password(user_data, password)
             return User(**user_data), None
         else:
             return None, "Invalid email or password"
+    except PasswordHasherBusy:
+        return None, "The server is busy, please try again in a moment"
     except Exception as e:
         print(f"Error during login: {e}")
         return None, "An error occurred during login"
 
+def rehash_password(user_data, password):
+    """Upgrade a stored hash made with an older bcrypt cost; the login goes ahead either way"""
+    hasher = get_password_hasher()
+    if not hasher.needs_rehash(user_data['password']):
+        return
+    try:
+        user_data['password'] = hasher.hash(password)
+        execute("UPDATE users SET password = %s WHERE id = %s", (user_data['password'], user_data['id']))
+        invalidate_user(user_data['id'])
+    except Exception as e:
+        current_app.logger.warning(f"Password rehash for user {user_data['id']} skipped: {str(e)}")
+
 def is_email_registered(email):
-    connection = current_app.db_pool.get_connection()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
-    user = cursor.fetchone()
-    cursor.close()
-    connection.close()
+    user = query_one("SELECT id FROM users WHERE email = %s", (email,))
     return user is not None
 
 def validate_password_change(current_password, new_password, confirm_password):
@@ -62,7 +70,7 @@ def generate_reset_token():
 
 def validate_reset_token(token):
     """Validate a password reset token"""
-    with current_app.db_pool.cursor() as cursor:
+    with db_cursor() as cursor:
         cursor.execute("""
             SELECT prt.*, u.email 
             FROM password_reset_tokens prt
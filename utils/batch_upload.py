@@ -0,0 +1,190 @@
+import os
+import posixpath
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from config import Config
+
+from utils.blob_store import blob_name, commit_blobs, discard_temp, write_temp_blob
+from utils.database import db_transaction
+from utils.fragment_cache import bump_files_version
+from utils.job_queue import enqueue_many, get_job_queue
+
+# PDF readers accept the header anywhere in the first 1024 bytes
+HEADER_WINDOW = 1024
+FILENAME_MAX_LENGTH = 255
+
+# Shared by every batch request, so concurrent batches can't multiply the threads
+_pool = ThreadPoolExecutor(max_workers=Config.BATCH_UPLOAD_WORKERS, thread_name_prefix='batch-upload')
+
+
+class BatchUploadError(Exception):
+    """The batch as a whole was rejected (nothing was stored)"""
+
+
+class _LimitedStream:
+    """Read-through wrapper that refuses to go past max_bytes"""
+
+    def __init__(self, stream, max_bytes):
+        self.stream = stream
+        self.remaining = max_bytes
+
+    def read(self, size=-1):
+        chunk = self.stream.read(size)
+        self.remaining -= len(chunk)
+        if self.remaining < 0:
+            raise ValueError('File is too large')
+        return chunk
+
+
+def _is_pdf(path):
+    with open(path, 'rb') as f:
+        return b'%PDF-' in f.read(HEADER_WINDOW)
+
+
+def _ingest(open_stream):
+    """(temp_path, content_hash, byte_size) for one file, or raise ValueError"""
+    with open_stream() as stream:
+        temp_path, content_hash, byte_size = write_temp_blob(_LimitedStream(stream, Config.MAX_UPLOAD_SIZE))
+    if not _is_pdf(temp_path):
+        discard_temp(temp_path)
+        raise ValueError('Not a PDF file')
+    return temp_path, content_hash, byte_size
+
+
+def _zip_entries(archive, zip_name):
+    """(filename, opener, size or error) per ZIP member, skipping folders and macOS metadata"""
+    entries = []
+    for info in archive.infolist():
+        name = posixpath.basename(info.filename)
+        if info.is_dir() or info.filename.startswith('__MACOSX/') or name.startswith('.'):
+            continue
+        if not name.lower().endswith('.pdf'):
+            entries.append((name, None, f"Skipped: {name} in {zip_name} is not a PDF"))
+            continue
+        entries.append((name, lambda info=info: archive.open(info), info.file_size))
+    return entries
+
+
+class _Borrowed:
+    """Context manager that hands out a stream without closing it (the request owns it)"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def __enter__(self):
+        return self.stream
+
+    def __exit__(self, *exc):
+        return False
+
+
+def _stream_size(stream):
+    """Length of a spooled request file, leaving its position where it was"""
+    position = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(position)
+    return size
+
+
+def _collect(files):
+    """Flatten uploaded PDFs and ZIP members into (filename, opener, size or error)"""
+    entries, archives = [], []
+    for file in files:
+        name = file.filename or ''
+        extension = name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+        if extension == 'pdf':
+            entries.append((name, lambda file=file: _Borrowed(file.stream), _stream_size(file.stream)))
+        elif extension == 'zip':
+            try:
+                archive = zipfile.ZipFile(file.stream)
+            except zipfile.BadZipFile:
+                entries.append((name, None, 'Not a valid ZIP archive'))
+                continue
+            archives.append(archive)
+            entries.extend(_zip_entries(archive, name))
+        else:
+            entries.append((name, None, 'Only PDF and ZIP files are allowed'))
+    return entries, archives
+
+
+def save_batch(files, user_id):
+    """Store many uploads at once and record them in one transaction.
+
+    files are request FileStorage objects, each a PDF or a ZIP of PDFs.
+    Every PDF is streamed to a temp file, hashed and checked for a PDF
+    header on the shared worker pool; the ones that pass get their blob
+    references, pdf_files rows and process_upload jobs in a single
+    multi-row statement each. Returns one result dict per file, in order.
+    """
+    entries, archives = _collect(files)
+    try:
+        pdf_count = sum(1 for _, opener, _ in entries if opener)
+        if pdf_count > Config.BATCH_UPLOAD_MAX_FILES:
+            raise BatchUploadError(f"At most {Config.BATCH_UPLOAD_MAX_FILES} files per batch")
+        # Uploaded PDFs at their spooled size, ZIP members at their uncompressed size
+        declared = sum(size for _, opener, size in entries if opener)
+        if declared > Config.BATCH_UPLOAD_MAX_BYTES:
+            raise BatchUploadError('Batch is too large')
+
+        futures = [_pool.submit(_ingest, opener) if opener else None for _, opener, _ in entries]
+        results, stored = [], []
+        for (name, opener, detail), future in zip(entries, futures):
+            result = {'filename': name[:FILENAME_MAX_LENGTH]}
+            if future is None:
+                result.update(success=False, error=detail)
+            else:
+                try:
+                    stored.append((result, *future.result()))
+                    result['success'] = True
+                except ValueError as e:
+                    result.update(success=False, error=str(e))
+                except Exception as e:
+                    # Unreadable or encrypted ZIP member, disk errors
+                    current_app.logger.warning(f"Batch upload of {name} failed: {str(e)}")
+                    result.update(success=False, error='Could not read file')
+            results.append(result)
+
+        try:
+            if stored:
+                _register_batch(stored, user_id)
+        finally:
+            # Only left behind for duplicates or if registration failed
+            for _, temp_path, _, _ in stored:
+                discard_temp(temp_path)
+        return results
+    finally:
+        for archive in archives:
+            archive.close()
+
+
+def _register_batch(stored, user_id):
+    """One transaction: blob references, pdf_files rows and jobs, one statement each"""
+    blobs = {}
+    for _, temp_path, content_hash, byte_size in stored:
+        blobs.setdefault(content_hash, (byte_size, []))[1].append(temp_path)
+
+    with db_transaction() as cursor:
+        commit_blobs(cursor, blobs)
+        cursor.execute(f"""
+            INSERT INTO pdf_files (user_id, filename, filepath, content_hash, original_size)
+            VALUES {', '.join(['(%s, %s, %s, %s, %s)'] * len(stored))}
+        """, [value for result, _, content_hash, byte_size in stored
+              for value in (user_id, result['filename'], blob_name(content_hash), content_hash, byte_size)])
+        # lastrowid is the first id, but with interleaved auto-increment locking a
+        # concurrent upload can take ids in between; read ours back and match them
+        cursor.execute("""
+            SELECT id, filename, content_hash FROM pdf_files
+            WHERE user_id = %s AND id >= %s ORDER BY id
+        """, (user_id, cursor.lastrowid))
+        ids = {}
+        for row in cursor.fetchall():
+            ids.setdefault((row['filename'], row['content_hash']), []).append(row['id'])
+        jobs = []
+        for result, _, content_hash, _ in stored:
+            result['file_id'] = ids[(result['filename'], content_hash)].pop(0)
+            jobs.append(({'file_id': result['file_id'], 'content_hash': content_hash}, user_id, result['file_id']))
+        enqueue_many(cursor, 'process_upload', jobs)
+        bump_files_version(cursor, user_id)
+    get_job_queue().wake()
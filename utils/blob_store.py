@@ -0,0 +1,156 @@
+import hashlib
+import os
+import uuid
+from config import Config
+
+from utils.database import db_transaction
+
+CHUNK_SIZE = 64 * 1024
+TEMP_FOLDER = os.path.join(Config.UPLOAD_FOLDER, '.tmp')
+
+
+def blob_name(content_hash):
+    """Name of the stored file for a content hash"""
+    return f"{content_hash}.pdf"
+
+
+def blob_path(content_hash):
+    return os.path.join(Config.UPLOAD_FOLDER, blob_name(content_hash))
+
+
+def optimized_blob_name(content_hash):
+    """Name of the linearized copy served in place of the original, if any"""
+    return f"{content_hash}.linear.pdf"
+
+
+def optimized_blob_path(content_hash):
+    return os.path.join(Config.UPLOAD_FOLDER, optimized_blob_name(content_hash))
+
+
+def new_temp_path():
+    """Reserve a unique path for an in-flight upload"""
+    os.makedirs(TEMP_FOLDER, exist_ok=True)
+    return os.path.join(TEMP_FOLDER, f"{uuid.uuid4().hex}.part")
+
+
+def write_temp_blob(stream, temp_path=None):
+    """Stream an upload to a temp file, hashing the bytes as they arrive.
+
+    Returns (temp_path, sha256 hex digest, byte size).
+    """
+    temp_path = temp_path or new_temp_path()
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(temp_path, 'wb') as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+    except Exception:
+        discard_temp(temp_path)
+        raise
+    return temp_path, digest.hexdigest(), size
+
+
+def hash_file(path):
+    """SHA-256 of a file already on disk"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def discard_temp(temp_path):
+    if temp_path and os.path.exists(temp_path):
+        os.remove(temp_path)
+
+
+def commit_blob(cursor, temp_path, content_hash, byte_size):
+    """Take a reference on the blob for content_hash, storing temp_path as its bytes.
+
+    Must run inside db_transaction(): the upsert locks the blob row, so a
+    concurrent drop_blob_files() cannot unlink the file between our reference
+    being taken and the file being moved into place.
+    """
+    commit_blobs(cursor, {content_hash: (byte_size, [temp_path])})
+    return blob_name(content_hash)
+
+
+def commit_blobs(cursor, blobs):
+    """commit_blob for many blobs in one upsert.
+
+    blobs maps content_hash -> (byte_size, [temp paths with those bytes]);
+    each temp path takes one reference. Must run inside db_transaction().
+    """
+    rows = [(content_hash, blob_name(content_hash), byte_size, len(temp_paths))
+            for content_hash, (byte_size, temp_paths) in blobs.items()]
+    cursor.execute(f"""
+        INSERT INTO pdf_blobs (content_hash, filepath, byte_size, ref_count)
+        VALUES {', '.join(['(%s, %s, %s, %s)'] * len(rows))}
+        ON DUPLICATE KEY UPDATE ref_count = ref_count + VALUES(ref_count)
+    """, [value for row in rows for value in row])
+
+    for content_hash, (_, temp_paths) in blobs.items():
+        target = blob_path(content_hash)
+        for temp_path in temp_paths:
+            if os.path.exists(target):
+                # Same bytes already stored; the upload was a duplicate
+                discard_temp(temp_path)
+            else:
+                os.replace(temp_path, target)
+
+
+def release_blob(cursor, content_hash):
+    """Drop one reference to a blob.
+
+    Must run inside db_transaction(). Returns the paths to unlink once
+    that transaction has committed (see drop_blob_files), or [] while
+    other files still reference the bytes. Nothing is removed here, so a
+    rollback leaves every remaining row pointing at its bytes.
+    """
+    cursor.execute("""
+        SELECT ref_count FROM pdf_blobs
+        WHERE content_hash = %s
+        FOR UPDATE
+    """, (content_hash,))
+    blob = cursor.fetchone()
+    if not blob:
+        return []
+
+    if blob['ref_count'] > 1:
+        cursor.execute("""
+            UPDATE pdf_blobs SET ref_count = ref_count - 1
+            WHERE content_hash = %s
+        """, (content_hash,))
+        return []
+
+    cursor.execute("DELETE FROM pdf_blobs WHERE content_hash = %s", (content_hash,))
+    return [blob_path(content_hash), optimized_blob_path(content_hash)]
+
+
+def drop_blob_files(content_hash, paths):
+    """Unlink the files of a released blob after its release has committed.
+
+    The same bytes may have been uploaded again in between; then the new
+    row owns the files and they stay. The locking read also covers the
+    missing row (a gap lock under REPEATABLE READ), so a concurrent
+    commit_blobs waits until the files are gone and then stores its own.
+    Returns True if the files were removed.
+    """
+    with db_transaction() as cursor:
+        cursor.execute("""
+            SELECT 1 FROM pdf_blobs
+            WHERE content_hash = %s
+            FOR UPDATE
+        """, (content_hash,))
+        if cursor.fetchone():
+            return False
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+    return True
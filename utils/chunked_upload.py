@@ -0,0 +1,181 @@
+import fcntl
+import hashlib
+import os
+import threading
+import uuid
+from config import Config
+
+from utils.blob_store import CHUNK_SIZE, TEMP_FOLDER, discard_temp, hash_file
+from utils.database import db_cursor
+from utils.file_upload import register_upload
+
+# Running SHA-256 per session, valid only while chunks keep landing on this
+# process in order. Anything else falls back to re-hashing at finalize.
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+class UploadSessionError(Exception):
+    """Client-facing upload session failure with an HTTP status"""
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def part_path(session_id):
+    return os.path.join(TEMP_FOLDER, f"{session_id}.part")
+
+
+def current_offset(session_id):
+    """Bytes received so far; the part file on disk is the source of truth"""
+    path = part_path(session_id)
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def create_session(user_id, filename, total_size):
+    """Open a resumable upload and return its session id"""
+    if total_size <= 0:
+        raise UploadSessionError('File size must be positive')
+    if total_size > Config.MAX_UPLOAD_SIZE:
+        raise UploadSessionError('File is too large', status=413)
+
+    purge_stale_sessions()
+
+    session_id = uuid.uuid4().hex
+    os.makedirs(TEMP_FOLDER, exist_ok=True)
+    open(part_path(session_id), 'wb').close()
+
+    with db_cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO upload_sessions (id, user_id, filename, total_size)
+            VALUES (%s, %s, %s, %s)
+        """, (session_id, user_id, filename, total_size))
+
+    with _hashers_lock:
+        _hashers[session_id] = (0, hashlib.sha256())
+    return session_id
+
+
+def get_session(session_id, user_id):
+    """Load a session owned by user_id, with its current offset"""
+    with db_cursor() as cursor:
+        cursor.execute("""
+            SELECT id, filename, total_size, status, created_at
+            FROM upload_sessions
+            WHERE id = %s AND user_id = %s
+        """, (session_id, user_id))
+        session = cursor.fetchone()
+
+    if not session:
+        raise UploadSessionError('Upload session not found', status=404)
+    session['offset'] = current_offset(session_id)
+    return session
+
+
+def append_chunk(session, offset, stream):
+    """Append a chunk read from stream at offset; returns the new offset"""
+    session_id = session['id']
+    path = part_path(session_id)
+    if not os.path.exists(path):
+        raise UploadSessionError('Upload session not found', status=404)
+    if session['status'] != 'open':
+        raise UploadSessionError('Upload is being finalized', status=409)
+
+    with open(path, 'ab') as out:
+        try:
+            fcntl.flock(out, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadSessionError('Another chunk is being written',
+                                     status=409, offset=current_offset(session_id))
+
+        received = out.tell()
+        if offset != received:
+            raise UploadSessionError('Offset does not match bytes received',
+                                     status=409, offset=received)
+
+        with _hashers_lock:
+            hasher_offset, digest = _hashers.pop(session_id, (None, None))
+        if hasher_offset != received:
+            digest = None
+
+        try:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if received + len(chunk) > session['total_size']:
+                    raise UploadSessionError('Chunk runs past the declared size',
+                                             status=413, offset=received)
+                out.write(chunk)
+                received += len(chunk)
+                if digest:
+                    digest.update(chunk)
+        except Exception:
+            # Keep the bytes that made it; the client resumes from here
+            out.flush()
+            out.truncate(received)
+            raise
+        finally:
+            if digest and out.tell() == received:
+                with _hashers_lock:
+                    _hashers[session_id] = (received, digest)
+
+    return received
+
+
+def finalize_session(session, user_id):
+    """Move a complete upload into the blob store and insert its pdf_files row"""
+    session_id = session['id']
+    path = part_path(session_id)
+    received = current_offset(session_id)
+    if received != session['total_size']:
+        raise UploadSessionError('Upload is incomplete', status=409, offset=received)
+
+    # Only one call may register the file (a client retrying after a
+    # timeout races the original); the loser sees the claim and backs off
+    with db_cursor() as cursor:
+        cursor.execute("""
+            UPDATE upload_sessions SET status = 'finalizing'
+            WHERE id = %s AND status = 'open'
+        """, (session_id,))
+        claimed = cursor.rowcount == 1
+    if not claimed:
+        raise UploadSessionError('Upload is already being finalized', status=409)
+
+    try:
+        with _hashers_lock:
+            hasher_offset, digest = _hashers.pop(session_id, (None, None))
+        content_hash = digest.hexdigest() if hasher_offset == received else hash_file(path)
+        stored_name = register_upload(path, content_hash, received, session['filename'], user_id)
+    except Exception:
+        # Nothing was recorded; reopen so the client can try again
+        with db_cursor() as cursor:
+            cursor.execute("UPDATE upload_sessions SET status = 'open' WHERE id = %s", (session_id,))
+        raise
+    _delete_session(session_id)
+    return stored_name
+
+
+def abort_session(session):
+    _delete_session(session['id'])
+
+
+def _delete_session(session_id):
+    with _hashers_lock:
+        _hashers.pop(session_id, None)
+    discard_temp(part_path(session_id))
+    with db_cursor() as cursor:
+        cursor.execute("DELETE FROM upload_sessions WHERE id = %s", (session_id,))
+
+
+def purge_stale_sessions():
+    """Drop sessions opened more than UPLOAD_SESSION_TTL_HOURS ago"""
+    with db_cursor() as cursor:
+        cursor.execute("""
+            SELECT id FROM upload_sessions
+            WHERE created_at < NOW() - INTERVAL %s HOUR
+        """, (Config.UPLOAD_SESSION_TTL_HOURS,))
+        stale = cursor.fetchall()
+    for row in stale:
+        _delete_session(row['id'])
@@ -0,0 +1,204 @@
+from config import Config
+
+from utils.pagination import decode_cursor, encode_cursor
+
+# Comments are stored as a materialized path: each row's path is its
+# parent's path plus its own zero-padded id and a '/', e.g.
+#   0000000012/                         root comment 12
+#   0000000012/0000000040/              reply 40 to comment 12
+# Sorting by path gives depth-first thread order, and a whole subtree is
+# the index range [path, path with its trailing '/' bumped to '0').
+#
+# Deleting a comment tombstones its whole subtree (deleted_at) rather than
+# removing rows, and every insert or tombstone is appended to
+# comment_events, whose auto-increment id doubles as the file's sync cursor.
+# Ids are taken at INSERT but show up at COMMIT, so a slow transaction can
+# land below an id a client has already seen; cursors handed out therefore
+# stop short of events younger than COMMENT_SYNC_SETTLE_SECONDS, and those
+# are sent again (clients skip comments they already show).
+SEGMENT_WIDTH = 10
+
+COMMENT_COLUMNS = """
+    c.id, c.file_id, c.user_id, c.parent_id, c.path, c.depth, c.content, c.created_at,
+    COALESCE(u.name, c.guest_name, 'Guest') AS user_name
+"""
+
+
+class CommentThreadError(ValueError):
+    """Reply target is missing, on another file, or nested too deeply"""
+
+
+def root_path(comment_id):
+    return f"{comment_id:0{SEGMENT_WIDTH}d}/"
+
+
+def subtree_end(path):
+    """Smallest path sorting after every descendant of path"""
+    return path[:-1] + '0'
+
+
+def insert_comment(cursor, file_id, content, parent_id=None, user_id=None, guest_name=None):
+    """Insert a comment or reply and fill in its path; returns (id, depth, event_id).
+
+    Run inside db_transaction(), so the row is never visible (or left
+    behind) without its path.
+    """
+    parent_path, depth = '', 0
+    if parent_id:
+        cursor.execute("""
+            SELECT path, depth FROM comments
+            WHERE id = %s AND file_id = %s AND deleted_at IS NULL
+        """, (parent_id, file_id))
+        parent = cursor.fetchone()
+        if not parent:
+            raise CommentThreadError('Parent comment not found')
+        if parent['depth'] + 1 > Config.COMMENT_MAX_DEPTH:
+            raise CommentThreadError('Reply thread is too deep')
+        parent_path, depth = parent['path'], parent['depth'] + 1
+
+    cursor.execute("""
+        INSERT INTO comments
+        (file_id, user_id, guest_name, content, parent_id, depth, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s, NOW())
+    """, (file_id, user_id, guest_name, content, parent_id or None, depth))
+    comment_id = cursor.lastrowid
+
+    path = parent_path + root_path(comment_id)
+    cursor.execute("UPDATE comments SET path = %s WHERE id = %s", (path, comment_id))
+    cursor.execute("""
+        INSERT INTO comment_events (file_id, comment_id, event)
+        VALUES (%s, %s, 'added')
+    """, (file_id, comment_id))
+    return comment_id, depth, cursor.lastrowid
+
+
+def delete_thread(cursor, file_id, path):
+    """Tombstone a comment and all of its replies; returns (ids, last event_id).
+
+    Run inside db_transaction(), so FOR UPDATE holds the subtree until the
+    tombstones commit. The event id returned is the last one written here,
+    not the file's latest: an add committing concurrently may land below
+    MAX(id), and a client advancing past it would never see that add.
+    """
+    cursor.execute("""
+        SELECT id FROM comments
+        WHERE file_id = %s AND path >= %s AND path < %s AND deleted_at IS NULL
+        FOR UPDATE
+    """, (file_id, path, subtree_end(path)))
+    ids = [row['id'] for row in cursor.fetchall()]
+    if not ids:
+        return [], None
+
+    placeholders = ', '.join(['%s'] * len(ids))
+    cursor.execute(f"UPDATE comments SET deleted_at = NOW(), content = '' WHERE id IN ({placeholders})", ids)
+    event_id = None
+    for comment_id in ids:
+        cursor.execute("""
+            INSERT INTO comment_events (file_id, comment_id, event)
+            VALUES (%s, %s, 'deleted')
+        """, (file_id, comment_id))
+        event_id = cursor.lastrowid
+    return ids, event_id
+
+
+def latest_event_id(cursor, file_id):
+    """Newest event id for a file: changes whenever any of its comments do.
+
+    A cache key, not a cursor for clients; see settled_event_id.
+    """
+    cursor.execute("SELECT MAX(id) AS event_id FROM comment_events WHERE file_id = %s", (file_id,))
+    return cursor.fetchone()['event_id'] or 0
+
+
+def settled_event_id(cursor, file_id):
+    """Sync cursor for a file: its newest event older than the commit window"""
+    cursor.execute("""
+        SELECT id FROM comment_events
+        WHERE file_id = %s AND created_at < NOW() - INTERVAL %s SECOND
+        ORDER BY id DESC
+        LIMIT 1
+    """, (file_id, Config.COMMENT_SYNC_SETTLE_SECONDS))
+    row = cursor.fetchone()
+    return row['id'] if row else 0
+
+
+def changes_since(cursor, file_id, since, limit=None):
+    """Comment events after the since cursor, oldest first.
+
+    Returns (rows, has_more, sync_cursor); each row is the event plus the
+    comment as it is now, so an 'added' row for a since-deleted comment
+    comes back blanked, followed by its 'deleted' row. sync_cursor stops
+    before the first event inside the commit window, so those rows are
+    returned again next time.
+    """
+    limit = limit or Config.COMMENT_SYNC_BATCH_SIZE
+    cursor.execute(f"""
+        SELECT e.id AS event_id, e.event,
+               e.created_at < NOW() - INTERVAL %s SECOND AS settled, {COMMENT_COLUMNS}
+        FROM comment_events e
+        JOIN comments c ON c.id = e.comment_id
+        LEFT JOIN users u ON c.user_id = u.id
+        WHERE e.file_id = %s AND e.id > %s
+        ORDER BY e.id
+        LIMIT %s
+    """, (Config.COMMENT_SYNC_SETTLE_SECONDS, file_id, since, limit + 1))
+    rows = cursor.fetchall()
+    rows, has_more = rows[:limit], len(rows) > limit
+
+    sync_cursor = since
+    for row in rows:
+        if not row['settled']:
+            # Everything after this is newer still; wait for the next sync
+            return rows, False, sync_cursor
+        sync_cursor = row['event_id']
+    return rows, has_more, sync_cursor
+
+
+def load_threads(cursor, file_id, after=None, limit=None):
+    """One page of root threads with every reply, in depth-first order.
+
+    Two index range scans regardless of thread size: the page of roots on
+    (file_id, depth, path), then all of their descendants on (file_id, path).
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    limit = limit or Config.COMMENT_THREADS_PER_PAGE
+    start = root_path(decode_cursor(after, int)[0]) if after else ''
+
+    cursor.execute("""
+        SELECT id, path FROM comments
+        WHERE file_id = %s AND depth = 0 AND path > %s AND deleted_at IS NULL
+        ORDER BY path
+        LIMIT %s
+    """, (file_id, start, limit + 1))
+    roots = cursor.fetchall()
+    if not roots:
+        return [], None
+
+    next_cursor = None
+    if len(roots) > limit:
+        roots = roots[:limit]
+        next_cursor = encode_cursor(roots[-1]['id'])
+
+    cursor.execute(f"""
+        SELECT {COMMENT_COLUMNS}
+        FROM comments c
+        LEFT JOIN users u ON c.user_id = u.id
+        WHERE c.file_id = %s AND c.path >= %s AND c.path < %s AND c.deleted_at IS NULL
+        ORDER BY c.path
+    """, (file_id, roots[0]['path'], subtree_end(roots[-1]['path'])))
+    return cursor.fetchall(), next_cursor
+
+
+def build_tree(rows):
+    """Nest path-ordered rows under their parents at any depth, in one pass"""
+    by_id = {}
+    roots = []
+    for row in rows:
+        node = dict(row, replies=[])
+        by_id[node['id']] = node
+        parent = by_id.get(node['parent_id'])
+        if parent is not None:
+            parent['replies'].append(node)
+        else:
+            roots.append(node)
+    return roots
@@ -0,0 +1,288 @@
+import logging
+import threading
+import time
+import traceback
+import weakref
+from collections import deque
+import mysql.connector
+from mysql.connector import errors
+
+LEAK_POLL_SECONDS = 0.5
+
+
+class PooledConnection:
+    """Connection proxy handed out by ConnectionPool; close() returns it to the pool"""
+
+    def __init__(self, pool, conn, created_at, stack=None):
+        self._pool = pool
+        self._conn = conn
+        self.created_at = created_at
+        self.checked_out_at = time.monotonic()
+        self.stack = stack
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool._release(conn, self.created_at, self.checked_out_at, self.stack, id(self))
+
+    def __del__(self):
+        # Dropped without close(). Finalizers run at arbitrary points inside
+        # other code, so no locks or I/O here: just hand the connection over
+        # and let the next checkout roll it back and return it
+        conn = self.__dict__.get('_conn')
+        if conn is not None:
+            self._conn = None
+            self._pool._leaked.append((conn, self.created_at, self.checked_out_at, self.stack))
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get('_conn')
+        if conn is None:
+            raise errors.InterfaceError('Connection has been returned to the pool')
+        return getattr(conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """Bounded MySQL connection pool with blocking checkout.
+
+    Grows on demand from min_size up to max_size; when every connection is
+    in use, get_connection() waits up to timeout seconds before raising
+    PoolError. Borrowed connections are pinged if they sat idle longer than
+    ping_interval, and connections older than recycle seconds (or idle past
+    idle_timeout, above min_size) are closed instead of reused.
+
+    Connections garbage-collected without close() are reclaimed and logged
+    as leaks. With leak_threshold_ms set, the checkout stack is recorded and
+    logged for any connection held longer than that, both when it comes back
+    and whenever a caller has to wait on an exhausted pool.
+    """
+
+    def __init__(self, connect_args, min_size=2, max_size=20, timeout=10,
+                 recycle=3600, idle_timeout=300, ping_interval=30,
+                 leak_threshold_ms=None, logger=None):
+        self.connect_args = connect_args
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.idle_timeout = idle_timeout
+        self.ping_interval = ping_interval
+        self.leak_threshold = leak_threshold_ms / 1000.0 if leak_threshold_ms else None
+        self.logger = logger or logging.getLogger(__name__)
+        self._outstanding = weakref.WeakValueDictionary()  # debug mode only
+        # Connections dropped without close(), queued by PooledConnection.__del__;
+        # deque.append is atomic, so the finalizer needs no lock
+        self._leaked = deque()
+
+        self._idle = deque()  # (conn, created_at, returned_at), most recent on the right
+        self._size = 0        # open connections, idle or checked out
+        self._cond = threading.Condition()
+        self.metrics = {
+            'checkouts': 0,
+            'exhausted': 0,
+            'timeouts': 0,
+            'created': 0,
+            'recycled': 0,
+            'health_check_failures': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+            'checkout_seconds_total': 0.0,
+            'checkout_seconds_max': 0.0,
+            'leaked': 0,
+        }
+
+    def prefill(self):
+        """Open min_size connections up front"""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._idle.append((conn, time.monotonic(), time.monotonic()))
+                self._cond.notify()
+
+    def get_connection(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        counted_exhaustion = False
+        while True:
+            self._reclaim_leaks()
+            entry = None
+            with self._cond:
+                while not self._idle and self._size >= self.max_size and not self._leaked:
+                    if not counted_exhaustion:
+                        self.metrics['exhausted'] += 1
+                        counted_exhaustion = True
+                        self._report_long_checkouts()
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.metrics['timeouts'] += 1
+                        raise errors.PoolError(
+                            f"No connection available within {self.timeout}s "
+                            f"({self._size}/{self.max_size} in use)")
+                    # Leaks arrive without a notify, so wake up now and then to look
+                    self._cond.wait(min(remaining, LEAK_POLL_SECONDS))
+                if not self._idle and self._size >= self.max_size:
+                    continue  # a leaked connection to reclaim first
+                if self._idle:
+                    entry = self._idle.pop()
+                else:
+                    self._size += 1
+
+            if entry is None:
+                try:
+                    conn, created_at = self._connect(), time.monotonic()
+                except Exception:
+                    self._discard(None)
+                    raise
+            else:
+                conn, created_at, returned_at = entry
+                if not self._usable(conn, created_at, returned_at):
+                    continue
+
+            waited = time.monotonic() - started
+            stack = traceback.format_stack()[:-1] if self.leak_threshold else None
+            pooled = PooledConnection(self, conn, created_at, stack)
+            with self._cond:
+                self.metrics['checkouts'] += 1
+                self.metrics['wait_seconds_total'] += waited
+                self.metrics['wait_seconds_max'] = max(self.metrics['wait_seconds_max'], waited)
+                if self.leak_threshold:
+                    self._outstanding[id(pooled)] = pooled
+            return pooled
+
+    def _usable(self, conn, created_at, returned_at):
+        """Health-check a connection taken from the idle list; discards it if stale"""
+        now = time.monotonic()
+        if now - created_at > self.recycle:
+            self._count('recycled')
+            self._discard(conn)
+            return False
+        if now - returned_at >= self.ping_interval:
+            try:
+                conn.ping(reconnect=False)
+            except Exception:
+                self._count('health_check_failures')
+                self._discard(conn)
+                return False
+        return True
+
+    def _release(self, conn, created_at, checked_out_at, stack, pooled_id=None):
+        held = time.monotonic() - checked_out_at
+        if self.leak_threshold:
+            with self._cond:
+                self._outstanding.pop(pooled_id, None)
+            if held > self.leak_threshold:
+                self.logger.warning(
+                    f"DB connection held for {held * 1000:.0f}ms, checked out at:\n"
+                    + ''.join(stack))
+        reusable = True
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            reusable = False
+
+        with self._cond:
+            self.metrics['checkout_seconds_total'] += held
+            self.metrics['checkout_seconds_max'] = max(self.metrics['checkout_seconds_max'], held)
+            if reusable:
+                self._idle.append((conn, created_at, time.monotonic()))
+                stale = self._trim_idle()
+                self._cond.notify()
+            else:
+                stale = []
+
+        if not reusable:
+            self._discard(conn)
+        for old in stale:
+            self._close_quietly(old)
+
+    def _reclaim_leaks(self):
+        """Roll back and return connections queued by PooledConnection.__del__"""
+        while self._leaked:
+            try:
+                conn, created_at, checked_out_at, stack = self._leaked.popleft()
+            except IndexError:
+                return
+            self._count('leaked')
+            where = (", checked out at:\n" + ''.join(stack)) if stack \
+                else " (set DB_LEAK_THRESHOLD_MS to log the checkout stack)"
+            self.logger.error(f"DB connection leaked: garbage-collected without close(){where}")
+            self._release(conn, created_at, checked_out_at, stack)
+
+    def _report_long_checkouts(self):
+        """Log who is holding connections past the threshold (lock held)"""
+        if not self.leak_threshold:
+            return
+        now = time.monotonic()
+        for pooled in list(self._outstanding.values()):
+            held = now - pooled.checked_out_at
+            if held > self.leak_threshold:
+                self.logger.warning(
+                    f"Pool exhausted; connection held for {held * 1000:.0f}ms, checked out at:\n"
+                    + ''.join(pooled.stack))
+
+    def _trim_idle(self):
+        """Pop connections idle past idle_timeout while above min_size (lock held)"""
+        stale = []
+        now = time.monotonic()
+        while self._idle and self._size > self.min_size:
+            conn, _, returned_at = self._idle[0]
+            if now - returned_at < self.idle_timeout:
+                break
+            self._idle.popleft()
+            self._size -= 1
+            stale.append(conn)
+        return stale
+
+    def _discard(self, conn):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+        if conn is not None:
+            self._close_quietly(conn)
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _connect(self):
+        conn = mysql.connector.connect(**self.connect_args)
+        self._count('created')
+        return conn
+
+    def _count(self, key):
+        with self._cond:
+            self.metrics[key] += 1
+
+    def stats(self):
+        self._reclaim_leaks()
+        with self._cond:
+            idle = len(self._idle)
+            return dict(self.metrics,
+                        size=self._size,
+                        idle=idle,
+                        in_use=self._size - idle,
+                        max_size=self.max_size)
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+        for conn, _, _ in idle:
+            self._close_quietly(conn)
@@ -1,7 +1,11 @@
+import time
 from contextlib import contextmanager
-from mysql.connector import pooling
 from flask import current_app
 
+from utils.connection_pool import ConnectionPool
+from utils.metrics import get_metrics
+from utils.query_tracer import get_query_tracer
+
 class DatabasePool:
     def __init__(self, app=None):
         self.pool = None
@@ -10,16 +14,29 @@ class DatabasePool:
     
     def init_app(self, app):
         """Initialize with app context"""
-        self.pool = pooling.MySQLConnectionPool(
-            pool_name="pdf_pool",
-            pool_size=5,
-            host=app.config['DB_HOST'],
-            user=app.config['DB_USER'],
-            password=app.config['DB_PASSWORD'],
-            database=app.config['DB_NAME'],
-            buffered=True,
-            autocommit=True
+        self.pool = ConnectionPool(
+            connect_args=dict(
+                host=app.config['DB_HOST'],
+                user=app.config['DB_USER'],
+                password=app.config['DB_PASSWORD'],
+                database=app.config['DB_NAME'],
+                buffered=True,
+                autocommit=True
+            ),
+            min_size=app.config['DB_POOL_MIN_SIZE'],
+            max_size=app.config['DB_POOL_MAX_SIZE'],
+            timeout=app.config['DB_POOL_TIMEOUT'],
+            recycle=app.config['DB_POOL_RECYCLE'],
+            idle_timeout=app.config['DB_POOL_IDLE_TIMEOUT'],
+            ping_interval=app.config['DB_POOL_PING_INTERVAL'],
+            leak_threshold_ms=app.config['DB_LEAK_THRESHOLD_MS'],
+            logger=app.logger
         )
+        try:
+            self.pool.prefill()
+        except Exception as e:
+            # The pool opens connections on demand, so a slow database at boot isn't fatal
+            app.logger.warning(f"Could not prefill DB pool: {str(e)}")
     
     def get_connection(self):
         """Get connection from pool with validation"""
@@ -27,6 +44,10 @@ class DatabasePool:
             raise RuntimeError("Connection pool not initialized")
         return self.pool.get_connection()
 
+    def stats(self):
+        """Pool size, wait time, checkout duration and exhaustion counters"""
+        return self.pool.stats() if self.pool else {}
+
 db_pool = None
 
 def get_db_pool():
@@ -36,14 +57,57 @@ def get_db_pool():
     return db_pool
 
 
+class InstrumentedCursor:
+    """Cursor proxy that reports every statement to utils.metrics and utils.query_tracer"""
+
+    def __init__(self, cursor, conn):
+        self._cursor = cursor
+        self._conn = conn
+
+    def execute(self, operation, params=None, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, **kwargs)
+        finally:
+            self._observe(operation, params, time.perf_counter() - started)
+
+    def executemany(self, operation, seq_params):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params)
+        finally:
+            self._observe(operation, None, time.perf_counter() - started)
+
+    def _observe(self, operation, params, seconds):
+        get_metrics().observe_query(seconds)
+        get_query_tracer().record(self._conn, operation, params, seconds)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def _checkout():
+    started = time.perf_counter()
+    conn = current_app.db_pool.get_connection()
+    get_metrics().observe_pool_wait(time.perf_counter() - started)
+    return conn
+
 
 @contextmanager
 def db_cursor():
-    """Improved cursor handling with null checks"""
+    """Dictionary cursor on a pooled connection, always returned to the pool.
+
+    Every query in the app goes through this (or db_transaction), so
+    connections can't leak past the end of the with-block.
+    """
     conn = None
+    cursor = None
     try:
-        conn = current_app.db_pool.get_connection()
-        cursor = conn.cursor(dictionary=True)
+        conn = _checkout()
+        cursor = InstrumentedCursor(conn.cursor(dictionary=True), conn)
         yield cursor
         conn.commit()
     except Exception as e:
@@ -55,4 +119,48 @@ def db_cursor():
         if cursor:
             cursor.close()
         if conn:
-            conn.close()
\ No newline at end of file
+            conn.close()
+
+
+@contextmanager
+def db_transaction():
+    """Cursor wrapped in an explicit transaction (row locks held until commit)"""
+    conn = None
+    cursor = None
+    try:
+        conn = _checkout()
+        conn.start_transaction()
+        cursor = InstrumentedCursor(conn.cursor(dictionary=True), conn)
+        yield cursor
+        conn.commit()
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        current_app.logger.error(f"DB transaction failed: {str(e)}", exc_info=True)
+        raise
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
+
+def query_one(sql, params=()):
+    """Run a query and return its first row (or None)"""
+    with db_cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone()
+
+
+def query_all(sql, params=()):
+    """Run a query and return all rows"""
+    with db_cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def execute(sql, params=()):
+    """Run a write and return (rowcount, lastrowid)"""
+    with db_cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount, cursor.lastrowid
@@ -0,0 +1,95 @@
+import os
+import threading
+import uuid
+
+
+class DiskCache:
+    """Size-bounded directory of derived files with LRU eviction.
+
+    Recency is the file mtime: hits touch the file, and eviction removes the
+    oldest entries until the cache is back under 90% of max_bytes. Entries
+    are written to a temp name and renamed into place, so concurrent
+    processes sharing the directory never see partial files.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._bytes_since_scan = None
+
+    def path(self, content_hash, name):
+        """Entries are grouped per blob: <root>/<ab>/<hash>/<name>"""
+        return os.path.join(self.root, content_hash[:2], content_hash, name)
+
+    def get(self, path):
+        """Return path if cached (marking it recently used), else None"""
+        try:
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            return None
+
+    def temp_path(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return f"{path}.{uuid.uuid4().hex}.tmp"
+
+    def put(self, temp_path, path):
+        """Move a fully written temp file into the cache"""
+        os.replace(temp_path, path)
+        self._account(os.path.getsize(path))
+        return path
+
+    def discard(self, content_hash):
+        """Drop every entry derived from a blob"""
+        directory = os.path.join(self.root, content_hash[:2], content_hash)
+        if not os.path.isdir(directory):
+            return
+        for name in os.listdir(directory):
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+        try:
+            os.rmdir(directory)
+        except OSError:
+            pass
+
+    def _account(self, size):
+        # Only rescan the directory after ~5% of the budget has been written
+        with self._lock:
+            if self._bytes_since_scan is not None:
+                self._bytes_since_scan += size
+                if self._bytes_since_scan < self.max_bytes // 20:
+                    return
+            self._bytes_since_scan = 0
+        self.enforce_limit()
+
+    def enforce_limit(self):
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if '.tmp' in name:
+                    continue  # Being written right now
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        target = self.max_bytes * 9 // 10
+        entries.sort()
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
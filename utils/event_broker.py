@@ -0,0 +1,77 @@
+import itertools
+import queue
+import threading
+from collections import defaultdict
+
+
+class TooManySubscribers(Exception):
+    """The per-process subscriber limit has been reached"""
+
+
+class EventBroker:
+    """In-process pub/sub for live updates, one bounded queue per subscriber.
+
+    Publishing never blocks: a subscriber whose queue is full is dropped
+    and receives None, so its stream ends and the client reconnects and
+    resyncs. Only subscribers in this process see an event.
+    """
+
+    def __init__(self, max_subscribers=100, queue_size=100):
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self._channels = defaultdict(set)
+        self._count = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                raise TooManySubscribers(f"{self._count} live subscribers already")
+            self._channels[channel].add(subscriber)
+            self._count += 1
+        return subscriber
+
+    def unsubscribe(self, channel, subscriber):
+        with self._lock:
+            subscribers = self._channels.get(channel)
+            if subscribers is None or subscriber not in subscribers:
+                return
+            subscribers.discard(subscriber)
+            self._count -= 1
+            if not subscribers:
+                del self._channels[channel]
+
+    def publish(self, channel, event, data):
+        message = (next(self._ids), event, data)
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                self.unsubscribe(channel, subscriber)
+                self._close(subscriber)
+
+    def _close(self, subscriber):
+        # Make room for the end-of-stream marker
+        try:
+            subscriber.get_nowait()
+            subscriber.put_nowait(None)
+        except (queue.Empty, queue.Full):
+            pass  # The stream still ends at LIVE_STREAM_MAX_SECONDS
+
+    def stats(self):
+        with self._lock:
+            return {'channels': len(self._channels), 'subscribers': self._count}
+
+
+event_broker = None
+
+def get_event_broker():
+    global event_broker
+    if event_broker is None:
+        from config import Config
+        event_broker = EventBroker(max_subscribers=Config.LIVE_MAX_SUBSCRIBERS)
+    return event_broker
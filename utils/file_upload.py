@@ -1,10 +1,15 @@
-import os
-import uuid
-from datetime import datetime
+from flask import current_app
 from config import Config
 import logging
 
-from utils.database import db_cursor
+from utils.blob_store import commit_blob, discard_temp, write_temp_blob
+from utils.database import db_transaction
+from utils.fragment_cache import bump_files_version
+from utils.job_queue import enqueue, get_job_queue, job_handler
+from utils.pdf_metadata import extract_metadata
+from utils.pdf_optimize import optimize_blob, optimizer_available
+from utils.pdf_text import index_blob
+from utils.preview_cache import PreviewUnavailable, render_thumbnail, renderer_available
 
 def allowed_file(filename):
     """Check if file has allowed extension"""
@@ -12,27 +17,45 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
 
 def save_uploaded_file(file, user_id):
-    """Save uploaded file with unique name and store metadata"""
+    """Store upload in the content-addressed blob store and record its metadata"""
+    temp_path, content_hash, byte_size = write_temp_blob(file.stream)
     try:
-        # Generate unique filename
-        ext = file.filename.rsplit('.', 1)[1].lower()
-        unique_name = f"{uuid.uuid4().hex}.{ext}"
-        filepath = os.path.join(Config.UPLOAD_FOLDER, unique_name)
-        
-        # Save file
-        file.save(filepath)
-        
-        # Store file metadata in database
-        with db_cursor() as cursor:
-            cursor.execute("""
-                INSERT INTO pdf_files 
-                (user_id, filename, filepath) 
-                VALUES (%s, %s, %s)
-            """, (user_id, file.filename, unique_name))
-            
-        return unique_name
-    except Exception as e:
-        # Clean up if file was partially saved
-        if 'filepath' in locals() and os.path.exists(filepath):
-            os.remove(filepath)
-        raise e
\ No newline at end of file
+        return register_upload(temp_path, content_hash, byte_size, file.filename, user_id)
+    finally:
+        # Only left behind if registration failed
+        discard_temp(temp_path)
+
+def register_upload(temp_path, content_hash, byte_size, filename, user_id):
+    """Move a hashed temp file into the blob store, insert its pdf_files row
+    and queue post-upload processing"""
+    with db_transaction() as cursor:
+        stored_name = commit_blob(cursor, temp_path, content_hash, byte_size)
+        cursor.execute("""
+            INSERT INTO pdf_files 
+            (user_id, filename, filepath, content_hash, original_size) 
+            VALUES (%s, %s, %s, %s, %s)
+        """, (user_id, filename, stored_name, content_hash, byte_size))
+        file_id = cursor.lastrowid
+        enqueue(cursor, 'process_upload',
+                {'file_id': file_id, 'content_hash': content_hash},
+                user_id=user_id, file_id=file_id)
+        bump_files_version(cursor, user_id)
+    get_job_queue().wake()
+    return stored_name
+
+@job_handler('process_upload')
+def process_upload(payload):
+    """Post-upload pipeline; every step is idempotent so retries are safe.
+
+    A PDF that can't be rendered still gets the steps after the thumbnail;
+    the dashboard simply falls back to no thumbnail for it.
+    """
+    extract_metadata(payload['content_hash'])
+    index_blob(payload['content_hash'])
+    if renderer_available():
+        try:
+            render_thumbnail(payload['content_hash'])
+        except PreviewUnavailable as e:
+            current_app.logger.warning(f"No thumbnail for {payload['content_hash']}: {str(e)}")
+    if optimizer_available():
+        optimize_blob(payload['content_hash'])
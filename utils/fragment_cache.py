@@ -0,0 +1,55 @@
+from flask import render_template
+from markupsafe import Markup
+from config import Config
+
+from utils.cache import TTLCache
+from utils.comment_threads import load_threads
+
+# Rendered template fragments keyed on the version of the data they show, so a
+# changed version simply misses; the TTL only bounds anything a version misses
+# (renamed users in comment bylines, for one)
+fragment_cache = TTLCache(maxsize=Config.FRAGMENT_CACHE_SIZE, ttl=Config.FRAGMENT_CACHE_TTL)
+
+
+def cached_fragment(key, build):
+    """Value cached under key, calling build() to produce and store it on a miss"""
+    value = fragment_cache.get(key)
+    if value is None:
+        value = build()
+        fragment_cache.set(key, value)
+    return value
+
+
+def files_version(cursor, user_id):
+    """Version of everything on a user's dashboard; changes whenever a card would"""
+    cursor.execute("SELECT files_version FROM users WHERE id = %s", (user_id,))
+    row = cursor.fetchone()
+    return row['files_version'] if row else None
+
+
+def bump_files_version(cursor, user_id):
+    """Call on the cursor that changes a user's files, shares or their processing state"""
+    cursor.execute("UPDATE users SET files_version = files_version + 1 WHERE id = %s", (user_id,))
+
+
+def bump_files_version_for_job(cursor, job_id):
+    """Bump the owner of the file a job was processing, if any"""
+    cursor.execute("""
+        UPDATE users u
+        JOIN jobs j ON j.user_id = u.id
+        SET u.files_version = u.files_version + 1
+        WHERE j.id = %s AND j.file_id IS NOT NULL
+    """, (job_id,))
+
+
+def comment_thread_fragment(cursor, file_id, event_id, after=None, can_reply=True):
+    """(rows, next_cursor, rendered _comment_list.html) for a page of threads.
+
+    event_id is the file's latest comment event id, which every added or
+    deleted comment moves, so it versions the thread for free.
+    """
+    def build():
+        rows, next_cursor = load_threads(cursor, file_id, after)
+        html = Markup(render_template('_comment_list.html', comments=rows, can_reply=can_reply))
+        return rows, next_cursor, html
+    return cached_fragment(('comments', file_id, event_id, after or '', can_reply), build)
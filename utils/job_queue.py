@@ -0,0 +1,169 @@
+import json
+import threading
+import time
+import traceback
+
+from utils.database import db_cursor, db_transaction
+from utils.fragment_cache import bump_files_version_for_job
+
+_handlers = {}
+
+
+def job_handler(job_type):
+    """Register a function(payload) as the handler for job_type"""
+    def decorator(func):
+        _handlers[job_type] = func
+        return func
+    return decorator
+
+
+def enqueue(cursor, job_type, payload, user_id=None, file_id=None, max_attempts=None):
+    """Queue a job on the caller's cursor, so it commits with the caller's writes.
+
+    Call get_job_queue().wake() once that commit is done; a worker woken
+    before it would find nothing to claim and sleep out the poll interval.
+    """
+    cursor.execute("""
+        INSERT INTO jobs (job_type, payload, user_id, file_id, max_attempts)
+        VALUES (%s, %s, %s, %s, COALESCE(%s, max_attempts))
+    """, (job_type, json.dumps(payload), user_id, file_id, max_attempts))
+    return cursor.lastrowid
+
+
+def enqueue_many(cursor, job_type, jobs):
+    """Queue [(payload, user_id, file_id)] in one multi-row INSERT on the caller's cursor (wake as for enqueue)"""
+    if not jobs:
+        return
+    cursor.execute(f"""
+        INSERT INTO jobs (job_type, payload, user_id, file_id)
+        VALUES {', '.join(['(%s, %s, %s, %s)'] * len(jobs))}
+    """, [value for payload, user_id, file_id in jobs
+          for value in (job_type, json.dumps(payload), user_id, file_id)])
+
+
+class JobQueue:
+    def __init__(self, app=None):
+        self.app = None
+        self.workers = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._last_maintenance = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Start the in-process worker pool (JOB_WORKERS=0 leaves it to worker.py)"""
+        self.app = app
+        if app.config['JOB_WORKERS'] > 0:
+            self.start(app.config['JOB_WORKERS'])
+
+    def start(self, count):
+        for i in range(count):
+            worker = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+
+    def wake(self):
+        """Nudge idle workers instead of waiting out the poll interval"""
+        self._wakeup.set()
+
+    def _worker_loop(self):
+        config = self.app.config
+        while not self._stopping.is_set():
+            try:
+                with self.app.app_context():
+                    self._maintenance()
+                    job = self._claim()
+                    if job:
+                        self._run(job)
+                        continue
+            except Exception as e:
+                self.app.logger.error(f"Job worker error: {str(e)}", exc_info=True)
+            self._wakeup.wait(config['JOB_POLL_INTERVAL'])
+            self._wakeup.clear()
+
+    def _claim(self):
+        """Lock the next due job for this worker; SKIP LOCKED keeps workers apart"""
+        with db_transaction() as cursor:
+            cursor.execute("""
+                SELECT id, job_type, payload, attempts, max_attempts
+                FROM jobs
+                WHERE status = 'queued' AND run_after <= NOW()
+                ORDER BY run_after, id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            """)
+            job = cursor.fetchone()
+            if not job:
+                return None
+            cursor.execute("""
+                UPDATE jobs
+                SET status = 'running', attempts = attempts + 1, locked_at = NOW()
+                WHERE id = %s
+            """, (job['id'],))
+        job['attempts'] += 1
+        return job
+
+    def _run(self, job):
+        config = self.app.config
+        handler = _handlers.get(job['job_type'])
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for {job['job_type']}")
+            handler(json.loads(job['payload']))
+        except Exception as e:
+            self.app.logger.warning(f"Job {job['id']} ({job['job_type']}) failed: {str(e)}")
+            error = traceback.format_exc()[-4000:]
+            if job['attempts'] >= job['max_attempts']:
+                self._finish(job['id'], 'failed', error)
+            else:
+                delay = min(config['JOB_RETRY_BASE_SECONDS'] * 2 ** (job['attempts'] - 1),
+                            config['JOB_RETRY_MAX_SECONDS'])
+                with db_cursor() as cursor:
+                    cursor.execute("""
+                        UPDATE jobs
+                        SET status = 'queued', locked_at = NULL, last_error = %s,
+                            run_after = NOW() + INTERVAL %s SECOND
+                        WHERE id = %s
+                    """, (error, delay, job['id']))
+            return
+        self._finish(job['id'], 'done')
+
+    def _finish(self, job_id, status, error=None):
+        with db_cursor() as cursor:
+            cursor.execute("""
+                UPDATE jobs SET status = %s, locked_at = NULL, last_error = %s
+                WHERE id = %s
+            """, (status, error, job_id))
+            # Its file's dashboard card stops showing "Processing"
+            bump_files_version_for_job(cursor, job_id)
+
+    def _maintenance(self):
+        """Requeue jobs orphaned by a dead worker and prune old finished ones"""
+        config = self.app.config
+        now = time.monotonic()
+        if now - self._last_maintenance < config['JOB_STALE_SECONDS']:
+            return
+        self._last_maintenance = now
+        with db_cursor() as cursor:
+            cursor.execute("""
+                UPDATE jobs SET status = 'queued', locked_at = NULL
+                WHERE status = 'running' AND locked_at < NOW() - INTERVAL %s SECOND
+            """, (config['JOB_STALE_SECONDS'],))
+            cursor.execute("""
+                DELETE FROM jobs
+                WHERE status = 'done' AND updated_at < NOW() - INTERVAL %s DAY
+            """, (config['JOB_RETENTION_DAYS'],))
+
+
+job_queue = None
+
+def get_job_queue():
+    global job_queue
+    if job_queue is None:
+        job_queue = JobQueue()
+    return job_queue
@@ -0,0 +1,253 @@
+import smtplib
+import socket
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import ExitStack
+from flask_mail import Message
+
+from extensions import mail
+from utils.database import db_cursor, db_transaction
+
+# The SMTP session is gone; says nothing about the message being sent. Kept
+# narrow on purpose: every SMTPException is an OSError, and a refused
+# recipient or rejected message must only fail that one message
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError,
+                     ConnectionError, socket.timeout)
+
+
+def enqueue_mail(cursor, recipients, subject, body=None, html=None, max_attempts=None):
+    """Queue one message per recipient on the caller's cursor, so it commits with the caller's writes.
+
+    Call get_mail_outbox().wake() once that commit is done; a worker woken
+    before it would find nothing to claim and go back to sleep.
+    """
+    cursor.executemany("""
+        INSERT INTO mail_outbox (recipient, subject, body, html, max_attempts)
+        VALUES (%s, %s, %s, %s, COALESCE(%s, max_attempts))
+    """, [(recipient, subject, body, html, max_attempts) for recipient in recipients])
+    return len(recipients)
+
+
+def queue_mail(recipients, subject, body=None, html=None):
+    """enqueue_mail in a transaction of its own, waking a worker after it commits"""
+    with db_cursor() as cursor:
+        count = enqueue_mail(cursor, recipients, subject, body=body, html=html)
+    get_mail_outbox().wake()
+    return count
+
+
+class MailOutbox:
+    """Delivers mail_outbox rows in the background.
+
+    Each worker claims a batch with SKIP LOCKED and sends it, and every
+    batch after it, over one SMTP session until the outbox is drained.
+    Sends are spaced to MAIL_RATE_PER_MINUTE across the process, and
+    failures are retried with exponential backoff like jobs.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.workers = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._last_maintenance = 0
+        self._next_send = 0.0
+        self._rate_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Start the in-process delivery threads (MAIL_WORKERS=0 leaves it to worker.py)"""
+        self.app = app
+        if app.config['MAIL_WORKERS'] > 0:
+            self.start(app.config['MAIL_WORKERS'])
+
+    def start(self, count):
+        for i in range(count):
+            worker = threading.Thread(target=self._worker_loop, name=f"mail-worker-{i}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def _worker_loop(self):
+        config = self.app.config
+        while not self._stopping.is_set():
+            try:
+                with self.app.app_context():
+                    self._maintenance()
+                    if self._deliver():
+                        continue
+            except Exception as e:
+                self.app.logger.error(f"Mail worker error: {str(e)}", exc_info=True)
+            self._wakeup.wait(config['MAIL_POLL_INTERVAL'])
+            self._wakeup.clear()
+
+    def _deliver(self):
+        """Send claimed batches over a single SMTP session; False if there was nothing to send"""
+        batch = self._claim()
+        if not batch:
+            return False
+
+        sent = []
+        try:
+            with ExitStack() as session:
+                try:
+                    # Connect, EHLO, STARTTLS and login
+                    connection = session.enter_context(mail.connect())
+                except Exception as e:
+                    # No session at all (credentials, TLS, DNS): charge every
+                    # claimed message, so a lasting failure ends in 'failed'
+                    # instead of cycling through the outbox
+                    self.app.logger.warning(f"Could not open SMTP session: {str(e)}")
+                    while batch:
+                        self._retry_or_fail(batch.popleft(), e)
+                    return True
+                while batch:
+                    while batch:
+                        row = batch[0]
+                        self._throttle()
+                        try:
+                            connection.send(self._message(row))
+                        except CONNECTION_ERRORS:
+                            raise
+                        except Exception as e:
+                            self._retry_or_fail(row, e)
+                        else:
+                            sent.append(row['id'])
+                        batch.popleft()
+                    self._mark_sent(sent)
+                    sent = []
+                    if self._stopping.is_set():
+                        break
+                    batch = self._claim()
+        except CONNECTION_ERRORS as e:
+            # Charge the message in flight, hand back the rest untouched
+            self.app.logger.warning(f"SMTP session failed: {str(e)}")
+            if batch:
+                self._retry_or_fail(batch.popleft(), e)
+                self._release(batch)
+        finally:
+            self._mark_sent(sent)
+        return True
+
+    def _claim(self):
+        with db_transaction() as cursor:
+            cursor.execute("""
+                SELECT id, recipient, subject, body, html, attempts, max_attempts
+                FROM mail_outbox
+                WHERE status = 'queued' AND run_after <= NOW()
+                ORDER BY run_after, id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, (self.app.config['MAIL_BATCH_SIZE'],))
+            rows = cursor.fetchall()
+            if not rows:
+                return deque()
+            ids = [row['id'] for row in rows]
+            cursor.execute(f"""
+                UPDATE mail_outbox
+                SET status = 'sending', attempts = attempts + 1, locked_at = NOW()
+                WHERE id IN ({', '.join(['%s'] * len(ids))})
+            """, ids)
+        for row in rows:
+            row['attempts'] += 1
+        return deque(rows)
+
+    def _message(self, row):
+        return Message(
+            subject=row['subject'],
+            recipients=[row['recipient']],
+            body=row['body'],
+            html=row['html'],
+            sender=self.app.config['MAIL_DEFAULT_SENDER']
+        )
+
+    def _throttle(self):
+        """Space sends out to MAIL_RATE_PER_MINUTE across this process's workers"""
+        rate = self.app.config['MAIL_RATE_PER_MINUTE']
+        if rate <= 0:
+            return
+        with self._rate_lock:
+            now = time.monotonic()
+            wait = self._next_send - now
+            self._next_send = max(now, self._next_send) + 60.0 / rate
+        if wait > 0:
+            time.sleep(wait)
+
+    def _mark_sent(self, ids):
+        if not ids:
+            return
+        with db_cursor() as cursor:
+            cursor.execute(f"""
+                UPDATE mail_outbox
+                SET status = 'sent', locked_at = NULL, sent_at = NOW()
+                WHERE id IN ({', '.join(['%s'] * len(ids))})
+            """, ids)
+
+    def _release(self, rows):
+        """Requeue claimed rows that were never attempted"""
+        if not rows:
+            return
+        ids = [row['id'] for row in rows]
+        with db_cursor() as cursor:
+            cursor.execute(f"""
+                UPDATE mail_outbox
+                SET status = 'queued', attempts = attempts - 1, locked_at = NULL
+                WHERE id IN ({', '.join(['%s'] * len(ids))})
+            """, ids)
+
+    def _retry_or_fail(self, row, error):
+        config = self.app.config
+        self.app.logger.warning(f"Mail {row['id']} to {row['recipient']} failed: {str(error)}")
+        detail = ''.join(traceback.format_exception_only(type(error), error))[-4000:]
+        with db_cursor() as cursor:
+            if row['attempts'] >= row['max_attempts']:
+                cursor.execute("""
+                    UPDATE mail_outbox SET status = 'failed', locked_at = NULL, last_error = %s
+                    WHERE id = %s
+                """, (detail, row['id']))
+                return
+            delay = min(config['MAIL_RETRY_BASE_SECONDS'] * 2 ** (row['attempts'] - 1),
+                        config['MAIL_RETRY_MAX_SECONDS'])
+            cursor.execute("""
+                UPDATE mail_outbox
+                SET status = 'queued', locked_at = NULL, last_error = %s,
+                    run_after = NOW() + INTERVAL %s SECOND
+                WHERE id = %s
+            """, (detail, delay, row['id']))
+
+    def _maintenance(self):
+        """Requeue mail orphaned by a dead worker and prune old sent mail"""
+        config = self.app.config
+        now = time.monotonic()
+        if now - self._last_maintenance < config['MAIL_STALE_SECONDS']:
+            return
+        self._last_maintenance = now
+        with db_cursor() as cursor:
+            # attempts was charged at claim time; out of attempts means done trying
+            cursor.execute("""
+                UPDATE mail_outbox
+                SET status = IF(attempts >= max_attempts, 'failed', 'queued'), locked_at = NULL
+                WHERE status = 'sending' AND locked_at < NOW() - INTERVAL %s SECOND
+            """, (config['MAIL_STALE_SECONDS'],))
+            cursor.execute("""
+                DELETE FROM mail_outbox
+                WHERE status = 'sent' AND sent_at < NOW() - INTERVAL %s DAY
+            """, (config['MAIL_RETENTION_DAYS'],))
+
+
+mail_outbox = None
+
+def get_mail_outbox():
+    global mail_outbox
+    if mail_outbox is None:
+        mail_outbox = MailOutbox()
+    return mail_outbox
@@ -1,36 +1,29 @@
-from flask import current_app, url_for
-from flask_mail import Message
-from threading import Thread
-from extensions import mail
+from flask import current_app
+from utils.mail_outbox import enqueue_mail, queue_mail
 
-def send_async_email(app, msg):
-    """Send email asynchronously using a background thread"""
-    with app.app_context():
-        mail.send(msg)
+# Everything here only queues mail in the outbox; utils.mail_outbox delivers it.
+# Pass the caller's cursor to commit the message together with its writes, and
+# wake the outbox (get_mail_outbox().wake()) once that transaction has committed.
 
-def send_email(subject, recipients, template, **kwargs):
-    """Send email with the given template"""
-    app = mail.app
-    msg = Message(
-        subject=subject,
-        recipients=recipients,
-        sender=app.config['MAIL_DEFAULT_SENDER']
-    )
-    msg.body = template.format(**kwargs)
-    # For HTML emails, you could add:
-    # msg.html = render_template(template + '.html', **kwargs)
-    
-    # Send email in background thread
-    thr = Thread(target=send_async_email, args=[app, msg])
-    thr.start()
-    return thr
+def _queue(cursor, recipients, subject, body=None, html=None):
+    if cursor is None:
+        return queue_mail(recipients, subject, body=body, html=html)
+    return enqueue_mail(cursor, recipients, subject, body=body, html=html)
 
-def send_share_email(recipient, sharer_name, filename, share_url):
+def send_email(subject, recipients, template, cursor=None, **kwargs):
+    """Queue an email with the given template"""
+    return _queue(cursor, recipients, subject, body=template.format(**kwargs))
+
+def send_share_email(recipient, sharer_name, filename, share_url, cursor=None):
+    return send_share_emails([recipient], sharer_name, filename, share_url, cursor=cursor)
+
+def send_share_emails(recipients, sharer_name, filename, share_url, cursor=None):
+    """Queue the share notification for every recipient in one batched insert"""
     try:
-        msg = Message(
-            subject=f"{sharer_name} shared a PDF with you",
-            recipients=[recipient],
-            sender=current_app.config['MAIL_DEFAULT_SENDER'],
+        _queue(
+            cursor,
+            recipients,
+            f"{sharer_name} shared a PDF with you",
             html=f"""
             <html>
                 <body>
@@ -44,14 +37,13 @@ def send_share_email(recipient, sharer_name, filename, share_url):
             </html>
             """
         )
-        mail.send(msg)
-        current_app.logger.info(f"Email successfully sent to {recipient}")
+        current_app.logger.info(f"Share email queued for {len(recipients)} recipient(s)")
         return True
     except Exception as e:
-        current_app.logger.error(f"Failed to send email to {recipient}: {str(e)}")
+        current_app.logger.error(f"Failed to queue share email: {str(e)}")
         raise
 
-def send_password_reset_email(user, reset_url):
+def send_password_reset_email(user, reset_url, cursor=None):
     try:
         # Handle both User objects and dictionaries
         user_name = user.name if hasattr(user, 'name') else user.get('name', 'User')
@@ -67,13 +59,7 @@ This link will expire in 1 hour.
 
 If you didn't request this, please ignore this email.
 """
-        msg = Message(
-            subject="Password Reset Request",
-            recipients=[user_email],
-            body=template,
-            sender=current_app.config['MAIL_DEFAULT_SENDER']
-        )
-        mail.send(msg)
+        _queue(cursor, [user_email], "Password Reset Request", body=template)
     except Exception as e:
-        current_app.logger.error(f"Failed to send password reset email: {str(e)}")
+        current_app.logger.error(f"Failed to queue password reset email: {str(e)}")
         raise
\ No newline at end of file
@@ -0,0 +1,233 @@
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from flask import Response, current_app, g, has_request_context, request
+from flask.signals import before_render_template, template_rendered
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus text format"""
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    le = _labels(self.label_names, labels, [('le', _number(bound))])
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                le = _labels(self.label_names, labels, [('le', '+Inf')])
+                lines.append(f"{self.name}_bucket{le} {series[-1]}")
+                label_text = _labels(self.label_names, labels)
+                lines.append(f"{self.name}_sum{label_text} {_number(series[-2])}")
+                lines.append(f"{self.name}_count{label_text} {series[-1]}")
+        return lines
+
+
+class Metrics:
+    """Request, database and template instrumentation exposed on /metrics.
+
+    Counts are per process (gunicorn runs one worker, so that is the app).
+    Database numbers come from utils.database calling observe_query and
+    observe_pool_wait; per-request totals are kept on flask.g.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.profiler = None
+        self.in_progress = 0
+        self._lock = threading.Lock()
+        self.request_seconds = Histogram(
+            'http_request_duration_seconds', 'Time to produce a response',
+            labels=('method', 'endpoint', 'status'))
+        self.request_queries = Histogram(
+            'http_request_db_queries', 'SQL statements run per request',
+            labels=('endpoint',), buckets=COUNT_BUCKETS)
+        self.request_db_seconds = Histogram(
+            'http_request_db_seconds', 'Time spent in SQL per request', labels=('endpoint',))
+        self.query_seconds = Histogram('db_query_duration_seconds', 'Time per SQL statement')
+        self.pool_wait_seconds = Histogram('db_pool_wait_seconds', 'Time to check a connection out of the pool')
+        self.template_seconds = Histogram(
+            'template_render_seconds', 'Jinja template render time', labels=('template',))
+        self.bytes_served = Counter(
+            'pdf_bytes_served_total', 'PDF bytes sent in response bodies', labels=('endpoint',))
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        if not app.config['METRICS_ENABLED']:
+            return
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        # Route names, pool and queue depths aren't for the public: no token, no endpoint
+        if app.config['METRICS_TOKEN']:
+            app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+        else:
+            app.logger.info("METRICS_TOKEN is not set; /metrics is not served")
+
+        if app.config['PROFILE_SLOW_REQUEST_MS'] > 0:
+            from utils.profiler import SamplingProfiler
+            self.profiler = SamplingProfiler(
+                interval=app.config['PROFILE_SAMPLE_INTERVAL_MS'] / 1000.0,
+                out_dir=app.config['PROFILE_DIR'],
+                logger=app.logger)
+            self.profiler.start()
+
+    def observe_query(self, seconds):
+        self.query_seconds.observe(seconds)
+        if has_request_context() and 'metrics_started' in g:
+            g.db_queries += 1
+            g.db_seconds += seconds
+
+    def observe_pool_wait(self, seconds):
+        self.pool_wait_seconds.observe(seconds)
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        g.db_queries = 0
+        g.db_seconds = 0.0
+        g.templates = []
+        with self._lock:
+            self.in_progress += 1
+        if self.profiler:
+            self.profiler.begin()
+
+    def _after_request(self, response):
+        if 'metrics_started' not in g:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        elapsed = time.perf_counter() - g.metrics_started
+        self.request_seconds.observe(elapsed, request.method, endpoint, str(response.status_code))
+        self.request_queries.observe(g.db_queries, endpoint)
+        self.request_db_seconds.observe(g.db_seconds, endpoint)
+        if response.mimetype == 'application/pdf' and response.status_code in (200, 206) \
+                and request.method == 'GET' and response.content_length:
+            self.bytes_served.inc(response.content_length, endpoint)
+        if self.profiler:
+            self.profiler.end(endpoint, elapsed, self.app.config['PROFILE_SLOW_REQUEST_MS'] / 1000.0)
+        return response
+
+    def _teardown_request(self, exc):
+        if g.pop('metrics_started', None) is None:
+            return
+        with self._lock:
+            self.in_progress -= 1
+        if self.profiler:
+            self.profiler.discard()  # No-op unless the request died before after_request
+
+    def _before_render(self, sender, template, context, **extra):
+        if has_request_context() and 'templates' in g:
+            g.templates.append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        if has_request_context() and g.get('templates'):
+            self.template_seconds.observe(time.perf_counter() - g.templates.pop(), template.name or 'string')
+
+    def metrics_view(self):
+        expected = f"Bearer {current_app.config['METRICS_TOKEN']}"
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied.encode(), expected.encode()):
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+    def render(self):
+        lines = []
+        for metric in (self.request_seconds, self.request_queries, self.request_db_seconds,
+                       self.query_seconds, self.pool_wait_seconds, self.template_seconds,
+                       self.bytes_served):
+            lines.extend(metric.render())
+        lines.extend(self._gauges())
+        return '\n'.join(lines) + '\n'
+
+    def _gauges(self):
+        """Point-in-time values read from the pool and broker at scrape time"""
+        values = {'http_requests_in_progress': self.in_progress}
+        pool = self.app.db_pool.stats() if getattr(self.app, 'db_pool', None) else {}
+        for key, value in pool.items():
+            values[f"db_pool_{key}"] = value
+        from utils.event_broker import get_event_broker
+        for key, value in get_event_broker().stats().items():
+            values[f"live_{key}"] = value
+
+        lines = []
+        for name, value in values.items():
+            kind = 'counter' if name.endswith('_total') or name in _POOL_COUNTERS else 'gauge'
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {_number(value)}")
+        return lines
+
+
+_POOL_COUNTERS = {f"db_pool_{key}" for key in (
+    'checkouts', 'exhausted', 'timeouts', 'created', 'recycled', 'health_check_failures', 'leaked')}
+
+
+metrics = None
+
+def get_metrics():
+    global metrics
+    if metrics is None:
+        metrics = Metrics()
+    return metrics
@@ -0,0 +1,98 @@
+import os
+import threading
+from functools import lru_cache
+from PyPDF2 import PdfFileReader, PdfFileWriter
+from config import Config
+
+from utils.blob_store import blob_path
+from utils.disk_cache import DiskCache
+
+page_cache = DiskCache(Config.PAGE_CACHE_DIR, Config.PAGE_CACHE_MAX_BYTES)
+_split_slots = threading.BoundedSemaphore(Config.PAGE_SPLIT_MAX_CONCURRENT)
+# Seconds a client is told to wait when every split slot stays taken
+BUSY_RETRY_AFTER = 5
+
+
+class PageUnavailable(Exception):
+    """The source is missing or unreadable, or the pages don't exist"""
+
+
+class PageSplitBusy(Exception):
+    """Every split slot stayed taken for PAGE_SPLIT_TIMEOUT; the caller should retry"""
+
+
+def page_etag(content_hash, first, last):
+    return f"{content_hash}-p{first}-{last}"
+
+
+def _open(path):
+    """PdfFileReader on an open file; the caller closes reader.stream"""
+    if not os.path.exists(path):
+        raise PageUnavailable('Source PDF is missing')
+    f = open(path, 'rb')
+    try:
+        reader = PdfFileReader(f, strict=False)
+        if reader.isEncrypted and not reader.decrypt(''):
+            raise PageUnavailable('Document is encrypted')
+    except Exception as e:
+        f.close()
+        if isinstance(e, PageUnavailable):
+            raise
+        raise PageUnavailable(f"Unreadable PDF: {str(e)}")
+    return reader
+
+
+@lru_cache(maxsize=4096)
+def page_count(content_hash):
+    """Number of pages in a blob (content-addressed, so it never goes stale)"""
+    reader = _open(blob_path(content_hash))
+    try:
+        return reader.getNumPages()
+    finally:
+        reader.stream.close()
+
+
+def viewer_page_count(content_hash):
+    """page_count, or None when the viewer should fall back to the whole file"""
+    if not content_hash:
+        return None
+    try:
+        return page_count(content_hash)
+    except PageUnavailable:
+        return None
+
+
+def split_pages(content_hash, first, last):
+    """Path to a standalone PDF of pages first..last (1-based, inclusive), split on a cache miss"""
+    path = page_cache.path(content_hash, f"p{first}-{last}.pdf")
+    if page_cache.get(path):
+        return path
+
+    total = page_count(content_hash)
+    if first < 1 or last < first or last > total:
+        raise PageUnavailable(f"Pages {first}-{last} are outside 1-{total}")
+
+    if not _split_slots.acquire(timeout=Config.PAGE_SPLIT_TIMEOUT):
+        raise PageSplitBusy('Too many page splits in progress')
+    try:
+        # Another request may have split it while we waited
+        if page_cache.get(path):
+            return path
+
+        temp_path = page_cache.temp_path(path)
+        reader = _open(blob_path(content_hash))
+        try:
+            writer = PdfFileWriter()
+            for index in range(first - 1, last):
+                writer.addPage(reader.getPage(index))
+            with open(temp_path, 'wb') as out:
+                writer.write(out)
+            return page_cache.put(temp_path, path)
+        except Exception as e:
+            raise PageUnavailable(f"Splitting pages {first}-{last} failed: {str(e)}")
+        finally:
+            reader.stream.close()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    finally:
+        _split_slots.release()
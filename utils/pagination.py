@@ -0,0 +1,30 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+
+class InvalidCursor(ValueError):
+    """Cursor token is malformed or was not issued by encode_cursor"""
+
+
+def encode_cursor(*values):
+    """Opaque, URL-safe token for the sort key of the last row on a page"""
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, *types):
+    """Inverse of encode_cursor; converts each value to the matching type"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursor(str(e))
+    if not isinstance(values, list) or len(values) != len(types):
+        raise InvalidCursor('Cursor has the wrong shape')
+    try:
+        return tuple(datetime.fromisoformat(v) if t is datetime else t(v)
+                     for v, t in zip(values, types))
+    except (TypeError, ValueError) as e:
+        raise InvalidCursor(str(e))
@@ -0,0 +1,106 @@
+import math
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+
+# bcrypt only reads the first 72 bytes; newer versions raise instead of
+# truncating, so cut explicitly to keep existing hashes verifying
+MAX_PASSWORD_BYTES = 72
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+
+
+class PasswordHasherBusy(Exception):
+    """Too many hashes in flight; the caller should shed the request"""
+
+
+def _encode(password):
+    return password.encode('utf-8')[:MAX_PASSWORD_BYTES]
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(_encode(password), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _verify(hashed, password):
+    try:
+        return bcrypt.checkpw(_encode(password), hashed.encode('utf-8'))
+    except ValueError:
+        return False  # Not a bcrypt hash
+
+
+def calibrate_rounds(target_ms):
+    """Largest cost whose hash takes no longer than target_ms on this machine"""
+    probe = 8
+    started = time.perf_counter()
+    _hash('calibration', probe)
+    elapsed_ms = max((time.perf_counter() - started) * 1000, 0.1)
+    # Each extra round doubles the work
+    rounds = probe + int(math.floor(math.log2(target_ms / elapsed_ms)))
+    return max(MIN_ROUNDS, min(MAX_ROUNDS, rounds))
+
+
+class PasswordHasher:
+    """bcrypt on a bounded process pool, off the request threads and the GIL.
+
+    At most PASSWORD_HASH_MAX_PENDING hashes may be queued or running;
+    beyond that hash() and verify() raise PasswordHasherBusy at once
+    rather than letting a login spike back up every request thread.
+    PASSWORD_HASH_WORKERS=0 hashes on the calling thread instead.
+    """
+
+    def __init__(self, app=None):
+        self.rounds = 12
+        self.timeout = 10
+        self.executor = None
+        self._slots = threading.BoundedSemaphore(4)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        self.rounds = config['PASSWORD_HASH_ROUNDS'] or calibrate_rounds(config['PASSWORD_HASH_TARGET_MS'])
+        self.timeout = config['PASSWORD_HASH_TIMEOUT']
+        workers = config['PASSWORD_HASH_WORKERS']
+        self._slots = threading.BoundedSemaphore(config['PASSWORD_HASH_MAX_PENDING'] or max(workers, 1) * 4)
+        if workers > 0:
+            # Fork the pool now, before the app starts its background threads
+            context = multiprocessing.get_context('fork')
+            self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            self.executor.submit(_verify, '', '').result()
+        app.logger.info(f"Password hashing: bcrypt cost {self.rounds}, {workers} worker process(es)")
+
+    def hash(self, password):
+        return self._run(_hash, password, self.rounds)
+
+    def verify(self, hashed, password):
+        return self._run(_verify, hashed, password)
+
+    def needs_rehash(self, hashed):
+        """True when a stored hash was made with a lower cost than the current one"""
+        try:
+            return int(hashed.split('$')[2]) < self.rounds
+        except (AttributeError, IndexError, ValueError):
+            return True
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy('Password hashing is at capacity')
+        try:
+            if self.executor is None:
+                return func(*args)
+            return self.executor.submit(func, *args).result(timeout=self.timeout)
+        finally:
+            self._slots.release()
+
+
+password_hasher = None
+
+def get_password_hasher():
+    global password_hasher
+    if password_hasher is None:
+        password_hasher = PasswordHasher()
+    return password_hasher
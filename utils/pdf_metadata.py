@@ -0,0 +1,103 @@
+import re
+from datetime import datetime
+from flask import current_app
+from PyPDF2 import PdfFileReader
+
+from utils.blob_store import blob_path
+from utils.database import db_cursor
+from utils.fragment_cache import bump_files_version
+
+VERSION_RE = re.compile(rb'%PDF-(\d\.\d)')
+PDF_DATE_RE = re.compile(r'^D:(\d{4})(\d{2})?(\d{2})?(\d{2})?(\d{2})?(\d{2})?')
+INFO_FIELDS = ('title', 'author', 'subject', 'creator', 'producer')
+INFO_MAX_LENGTH = 255
+METADATA_COLUMNS = ('page_count', 'pdf_version', *INFO_FIELDS, 'created_at')
+
+
+def parse_pdf_date(value):
+    """datetime for a PDF date string (D:YYYYMMDDHHmmSS...), ignoring the offset"""
+    match = PDF_DATE_RE.match(str(value or '').strip())
+    if not match:
+        return None
+    parts = [int(p) if p else default for p, default in zip(match.groups(), (None, 1, 1, 0, 0, 0))]
+    try:
+        return datetime(*parts)
+    except ValueError:
+        return None
+
+
+def _text(value):
+    text = ' '.join(str(value).split()) if value is not None else ''
+    return text[:INFO_MAX_LENGTH] or None
+
+
+def _info_value(info, key):
+    """An info dictionary entry with indirect references resolved (get() leaves them as
+    IndirectObject), or None when it is missing or can't be read"""
+    try:
+        return info[key] if key in info else None
+    except Exception:
+        return None
+
+
+def read_metadata(path):
+    """Page count, header version and document info of a PDF, as pdf_files columns.
+
+    Anything that can't be read (encrypted files, broken info dictionaries)
+    is left as None rather than failing the whole upload.
+    """
+    metadata = dict.fromkeys(METADATA_COLUMNS)
+    metadata['page_count'] = 0
+    with open(path, 'rb') as f:
+        match = VERSION_RE.search(f.read(1024))
+        metadata['pdf_version'] = match.group(1).decode() if match else None
+        f.seek(0)
+
+        try:
+            reader = PdfFileReader(f, strict=False)
+            if reader.isEncrypted and not reader.decrypt(''):
+                return metadata
+            metadata['page_count'] = reader.getNumPages()
+            info = reader.getDocumentInfo() or {}
+        except Exception as e:
+            current_app.logger.warning(f"Could not read metadata from {path}: {str(e)}")
+            return metadata
+
+        # Resolved while the file is still open, since they are read lazily
+        for field in INFO_FIELDS:
+            metadata[field] = _text(_info_value(info, f"/{field.capitalize()}"))
+        metadata['created_at'] = parse_pdf_date(_info_value(info, '/CreationDate'))
+    return metadata
+
+
+def extract_metadata(content_hash):
+    """Fill the metadata columns of every file with this content that lacks them.
+
+    Parses the blob only if no other file with the same bytes has been done.
+    """
+    with db_cursor() as cursor:
+        cursor.execute("""
+            SELECT id, user_id, metadata_at FROM pdf_files WHERE content_hash = %s
+        """, (content_hash,))
+        files = cursor.fetchall()
+    pending = [f for f in files if not f['metadata_at']]
+    if not pending:
+        return
+
+    done = next((f for f in files if f['metadata_at']), None)
+    if done:
+        with db_cursor() as cursor:
+            cursor.execute(f"SELECT {', '.join(METADATA_COLUMNS)} FROM pdf_files WHERE id = %s", (done['id'],))
+            metadata = cursor.fetchone()
+    else:
+        metadata = read_metadata(blob_path(content_hash))
+
+    assignments = ', '.join(f"{column} = %s" for column in METADATA_COLUMNS)
+    with db_cursor() as cursor:
+        cursor.executemany(f"""
+            UPDATE pdf_files SET {assignments}, metadata_at = NOW()
+            WHERE id = %s
+        """, [(*(metadata[c] for c in METADATA_COLUMNS), f['id']) for f in pending])
+        # Cards show page counts, so the owners' dashboards are now stale
+        for user_id in {f['user_id'] for f in pending}:
+            bump_files_version(cursor, user_id)
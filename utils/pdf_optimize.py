@@ -0,0 +1,68 @@
+import os
+import shutil
+import subprocess
+from flask import current_app
+from config import Config
+
+from utils.blob_store import blob_path, discard_temp, new_temp_path, optimized_blob_path
+from utils.database import db_cursor
+
+# qpdf exits 3 when it succeeded with warnings (common on slightly broken PDFs)
+QPDF_OK = (0, 3)
+
+
+def optimizer_available():
+    return Config.PDF_OPTIMIZE_ENABLED and shutil.which(Config.QPDF_PATH) is not None
+
+
+def linearize(source, target):
+    """Rewrite source as a linearized PDF with compressed object streams at target"""
+    temp_path = new_temp_path()
+    try:
+        result = subprocess.run([
+            Config.QPDF_PATH, '--linearize',
+            '--object-streams=generate', '--compress-streams=y',
+            source, temp_path
+        ], capture_output=True, timeout=Config.PDF_OPTIMIZE_TIMEOUT)
+        if result.returncode not in QPDF_OK or not os.path.exists(temp_path):
+            raise RuntimeError(result.stderr.decode(errors='replace').strip() or f"qpdf exited {result.returncode}")
+        os.replace(temp_path, target)
+    finally:
+        discard_temp(temp_path)
+
+
+def optimize_blob(content_hash):
+    """Store a web-optimized copy of a blob beside the original, once per
+    distinct content, and record both sizes on the files that use it.
+
+    The copy is dropped if it comes out larger than the original, so
+    uploaded_file only ever serves it when it saves bytes.
+    """
+    with db_cursor() as cursor:
+        cursor.execute("""
+            SELECT byte_size, optimized_at FROM pdf_blobs WHERE content_hash = %s
+        """, (content_hash,))
+        blob = cursor.fetchone()
+    if not blob:
+        return
+
+    source, target = blob_path(content_hash), optimized_blob_path(content_hash)
+    if not blob['optimized_at'] and os.path.exists(source):
+        try:
+            linearize(source, target)
+        except (OSError, RuntimeError, subprocess.TimeoutExpired) as e:
+            # Encrypted or damaged input; serve the original rather than retrying forever
+            current_app.logger.warning(f"Could not optimize {content_hash}: {str(e)}")
+        if os.path.exists(target) and os.path.getsize(target) >= blob['byte_size']:
+            os.remove(target)
+
+    optimized_size = os.path.getsize(target) if os.path.exists(target) else None
+    with db_cursor() as cursor:
+        cursor.execute("""
+            UPDATE pdf_blobs SET optimized_at = NOW()
+            WHERE content_hash = %s AND optimized_at IS NULL
+        """, (content_hash,))
+        cursor.execute("""
+            UPDATE pdf_files SET original_size = %s, optimized_size = %s
+            WHERE content_hash = %s AND optimized_size IS NULL
+        """, (blob['byte_size'], optimized_size, content_hash))
@@ -0,0 +1,170 @@
+import os
+import re
+import uuid
+from datetime import datetime, timezone
+from flask import Response, abort, current_app, request
+from werkzeug.http import http_date, is_resource_modified, parse_range_header
+from werkzeug.utils import send_file
+
+HASH_RE = re.compile(r'^[0-9a-f]{64}$')
+READ_SIZE = 64 * 1024
+
+
+def content_etag(filename):
+    """Strong ETag for content-addressed blobs, None for legacy uuid names"""
+    stem = filename.rsplit('.', 1)[0]
+    return stem if HASH_RE.match(stem) else None
+
+
+def send_pdf(path, etag=None, accel_path=None, download_name=None):
+    """Serve a PDF from disk with conditional GET and byte-range support.
+
+    Single ranges and the 200 path go through Werkzeug's send_file, which
+    hands the open file to the server's wsgi.file_wrapper (sendfile(2) under
+    gunicorn). Multi-range requests get a multipart/byteranges response.
+    With PDF_SENDFILE_BACKEND set, the bytes are handed off to the front
+    proxy via X-Accel-Redirect (nginx) or X-Sendfile (apache) instead.
+    """
+    if not os.path.isfile(path):
+        abort(404)
+
+    stat = os.stat(path)
+    last_modified = datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+    backend = current_app.config.get('PDF_SENDFILE_BACKEND')
+    max_age = current_app.config.get('PDF_CACHE_MAX_AGE', 0)
+
+    if backend == 'nginx' and accel_path:
+        response = _accel_redirect_response(accel_path, etag, last_modified)
+    else:
+        ranges = _multi_ranges(stat.st_size, etag, last_modified)
+        if ranges:
+            response = _multipart_range_response(path, stat.st_size, ranges, etag, last_modified)
+        else:
+            response = send_file(
+                path,
+                request.environ,
+                mimetype='application/pdf',
+                download_name=download_name,
+                etag=etag or True,
+                last_modified=last_modified,
+                max_age=max_age,
+                use_x_sendfile=(backend == 'apache'),
+                response_class=current_app.response_class,
+            )
+
+    # Behind login: browsers may keep it, shared caches may not
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.max_age = max_age
+    return response
+
+
+def _accel_redirect_response(accel_path, etag, last_modified):
+    """Let nginx stream the file (and answer Range itself) from an internal location"""
+    if etag and not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = Response(status=304)
+    else:
+        prefix = current_app.config['PDF_ACCEL_REDIRECT_PREFIX'].rstrip('/')
+        response = Response(mimetype='application/pdf')
+        response.headers['X-Accel-Redirect'] = f"{prefix}/{accel_path.lstrip('/')}"
+    if etag:
+        response.set_etag(etag)
+    response.last_modified = last_modified
+    return response
+
+
+def _multi_ranges(size, etag, last_modified):
+    """Satisfiable ranges if this is a multi-range request we should answer, else None"""
+    if request.method not in ('GET', 'HEAD') or 'HTTP_RANGE' not in request.environ:
+        return None
+
+    # If-Range mismatch means the client wants the whole (new) file
+    if 'HTTP_IF_RANGE' in request.environ and is_resource_modified(
+            request.environ, etag=etag, last_modified=last_modified, ignore_if_range=False):
+        return None
+    # Let send_file answer 304s
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+
+    parsed = parse_range_header(request.environ['HTTP_RANGE'])
+    if parsed is None or parsed.units != 'bytes' or len(parsed.ranges) < 2:
+        return None
+
+    ranges = []
+    for start, end in parsed.ranges:
+        if end is None:
+            end = size
+            if start < 0:
+                start = max(size + start, 0)
+        end = min(end, size)
+        if start < end:
+            ranges.append((start, end))
+
+    if not ranges:
+        abort(Response(status=416, headers={'Content-Range': f"bytes */{size}"}))
+
+    # Coalesce overlapping/adjacent ranges so clients can't amplify reads
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        if start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    if len(merged) > current_app.config.get('PDF_MAX_RANGES', 16):
+        # RFC 7233 allows ignoring Range; send the whole file instead
+        return None
+    return merged
+
+
+def _multipart_range_response(path, size, ranges, etag, last_modified):
+    if len(ranges) == 1:
+        # Coalesced down to one range; a plain 206 is cheaper
+        start, end = ranges[0]
+        request.environ['HTTP_RANGE'] = f"bytes={start}-{end - 1}"
+        return send_file(
+            path,
+            request.environ,
+            mimetype='application/pdf',
+            etag=etag or True,
+            last_modified=last_modified,
+            response_class=current_app.response_class,
+        )
+
+    boundary = uuid.uuid4().hex
+    part_headers = [
+        (f"\r\n--{boundary}\r\n"
+         f"Content-Type: application/pdf\r\n"
+         f"Content-Range: bytes {start}-{end - 1}/{size}\r\n\r\n").encode('ascii')
+        for start, end in ranges
+    ]
+    closing = f"\r\n--{boundary}--\r\n".encode('ascii')
+    content_length = sum(len(h) for h in part_headers) + len(closing) + \
+        sum(end - start for start, end in ranges)
+
+    def generate():
+        with open(path, 'rb') as f:
+            for header, (start, end) in zip(part_headers, ranges):
+                yield header
+                f.seek(start)
+                remaining = end - start
+                while remaining > 0:
+                    chunk = f.read(min(READ_SIZE, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    yield chunk
+            yield closing
+
+    response = current_app.response_class(
+        generate(),
+        status=206,
+        mimetype=f"multipart/byteranges; boundary={boundary}",
+    )
+    response.headers['Content-Length'] = str(content_length)
+    response.headers['Accept-Ranges'] = 'bytes'
+    if etag:
+        response.set_etag(etag)
+    response.headers['Last-Modified'] = http_date(last_modified)
+    return response
@@ -0,0 +1,112 @@
+import re
+from flask import current_app
+from markupsafe import Markup, escape
+from PyPDF2 import PdfFileReader
+
+from utils.blob_store import blob_path
+from utils.database import db_cursor
+
+SNIPPET_RADIUS = 80
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def extract_pages(path):
+    """Yield (page_number, text) for every page with extractable text.
+
+    Files that aren't readable PDFs (uploads are only checked by extension)
+    yield nothing, so they are indexed as empty rather than failing the job.
+    """
+    with open(path, 'rb') as f:
+        try:
+            reader = PdfFileReader(f, strict=False)
+            if reader.isEncrypted and not reader.decrypt(''):
+                return
+            page_count = reader.getNumPages()
+        except Exception as e:
+            current_app.logger.warning(f"Could not read text from {path}: {str(e)}")
+            return
+        for index in range(page_count):
+            try:
+                text = reader.getPage(index).extractText()
+            except Exception as e:
+                current_app.logger.warning(f"Text extraction failed on page {index + 1}: {str(e)}")
+                continue
+            text = ' '.join(text.split())
+            if text:
+                yield index + 1, text
+
+
+def index_blob(content_hash):
+    """Extract page text for a blob into pdf_text_pages, once per distinct content"""
+    with db_cursor() as cursor:
+        cursor.execute("""
+            SELECT text_indexed_at FROM pdf_blobs WHERE content_hash = %s
+        """, (content_hash,))
+        blob = cursor.fetchone()
+    if not blob or blob['text_indexed_at']:
+        return
+
+    pages = list(extract_pages(blob_path(content_hash)))
+
+    with db_cursor() as cursor:
+        cursor.execute("DELETE FROM pdf_text_pages WHERE content_hash = %s", (content_hash,))
+        if pages:
+            cursor.executemany("""
+                INSERT INTO pdf_text_pages (content_hash, page_number, content)
+                VALUES (%s, %s, %s)
+            """, [(content_hash, number, text) for number, text in pages])
+        cursor.execute("""
+            UPDATE pdf_blobs SET text_indexed_at = NOW() WHERE content_hash = %s
+        """, (content_hash,))
+
+
+def search_pages(user_id, query, limit=50):
+    """Ranked page hits inside the user's documents, with highlighted snippets"""
+    with db_cursor() as cursor:
+        cursor.execute("""
+            SELECT pf.id, pf.filename, tp.page_number, tp.content,
+                   MATCH(tp.content) AGAINST (%s IN NATURAL LANGUAGE MODE) AS score
+            FROM pdf_text_pages tp
+            JOIN pdf_files pf ON pf.content_hash = tp.content_hash
+            WHERE pf.user_id = %s
+            AND MATCH(tp.content) AGAINST (%s IN NATURAL LANGUAGE MODE)
+            ORDER BY score DESC
+            LIMIT %s
+        """, (query, user_id, query, limit))
+        rows = cursor.fetchall()
+
+    terms = [t.lower() for t in WORD_RE.findall(query)]
+    return [{
+        'id': row['id'],
+        'filename': row['filename'],
+        'page_number': row['page_number'],
+        'score': float(row['score']),
+        'snippet': make_snippet(row['content'], terms)
+    } for row in rows]
+
+
+def make_snippet(text, terms):
+    """Window of text around the first query term, with terms wrapped in <mark>"""
+    lowered = text.lower()
+    positions = [lowered.find(t) for t in terms if t in lowered]
+    first = min(positions) if positions else 0
+
+    start = max(first - SNIPPET_RADIUS, 0)
+    end = min(first + SNIPPET_RADIUS, len(text))
+    window = text[start:end]
+
+    if terms:
+        pattern = re.compile('|'.join(re.escape(t) for t in terms), re.IGNORECASE)
+        pieces, last = [], 0
+        for match in pattern.finditer(window):
+            pieces.append(escape(window[last:match.start()]))
+            pieces.append(Markup('<mark>%s</mark>') % match.group(0))
+            last = match.end()
+        pieces.append(escape(window[last:]))
+        snippet = Markup('').join(pieces)
+    else:
+        snippet = escape(window)
+
+    prefix = '… ' if start > 0 else ''
+    suffix = ' …' if end < len(text) else ''
+    return Markup(prefix) + snippet + Markup(suffix)
@@ -0,0 +1,70 @@
+import os
+import shutil
+import subprocess
+import threading
+from config import Config
+
+from utils.blob_store import blob_path
+from utils.disk_cache import DiskCache
+
+preview_cache = DiskCache(Config.PREVIEW_CACHE_DIR, Config.PREVIEW_CACHE_MAX_BYTES)
+_render_slots = threading.BoundedSemaphore(Config.PREVIEW_MAX_CONCURRENT_RENDERS)
+
+
+class PreviewUnavailable(Exception):
+    """No renderer installed, or the page could not be rendered"""
+
+
+def renderer_available():
+    return shutil.which(Config.PREVIEW_RENDERER) is not None
+
+
+def preview_etag(content_hash, page, width):
+    return f"{content_hash}-p{page}-w{width}"
+
+
+def render_page(content_hash, page, width):
+    """Path to a PNG of one page scaled to width, rendering it on a cache miss"""
+    path = preview_cache.path(content_hash, f"p{page}-w{width}.png")
+    if preview_cache.get(path):
+        return path
+
+    if not renderer_available():
+        raise PreviewUnavailable(f"{Config.PREVIEW_RENDERER} is not installed")
+
+    source = blob_path(content_hash)
+    if not os.path.exists(source):
+        raise PreviewUnavailable('Source PDF is missing')
+
+    if not _render_slots.acquire(timeout=Config.PREVIEW_RENDER_TIMEOUT):
+        raise PreviewUnavailable('Too many previews rendering')
+    try:
+        # Another request may have rendered it while we waited
+        if preview_cache.get(path):
+            return path
+
+        temp_path = preview_cache.temp_path(path)
+        try:
+            # pdftoppm appends .png to the output root when -singlefile is set
+            subprocess.run([
+                Config.PREVIEW_RENDERER, '-png', '-singlefile',
+                '-f', str(page), '-l', str(page),
+                '-scale-to-x', str(width), '-scale-to-y', '-1',
+                source, temp_path
+            ], check=True, capture_output=True, timeout=Config.PREVIEW_RENDER_TIMEOUT)
+            rendered = f"{temp_path}.png"
+            if not os.path.exists(rendered):
+                raise PreviewUnavailable(f"Page {page} does not exist")
+            return preview_cache.put(rendered, path)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            raise PreviewUnavailable(f"Rendering page {page} failed: {str(e)}")
+        finally:
+            for leftover in (temp_path, f"{temp_path}.png"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+    finally:
+        _render_slots.release()
+
+
+def render_thumbnail(content_hash):
+    return render_page(content_hash, 1, Config.THUMBNAIL_WIDTH)
@@ -0,0 +1,82 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+
+class SamplingProfiler:
+    """Samples the stacks of threads serving requests every `interval` seconds.
+
+    Samples are kept per request; when a request turns out slow they are
+    written as folded stacks ("outer;inner;leaf count" per line), ready for
+    flamegraph.pl or speedscope. Fast requests just drop theirs, so the
+    cost is one sys._current_frames() call per interval while any request
+    is in flight.
+    """
+
+    def __init__(self, interval=0.01, out_dir='profiles', logger=None):
+        self.interval = interval
+        self.out_dir = out_dir
+        self.logger = logger
+        self._active = {}  # thread ident -> Counter of folded stacks
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        self._thread.start()
+
+    def begin(self):
+        with self._lock:
+            self._active[threading.get_ident()] = Counter()
+
+    def discard(self):
+        with self._lock:
+            return self._active.pop(threading.get_ident(), None)
+
+    def end(self, label, elapsed, threshold):
+        """Stop sampling this thread; dump its stacks if the request took threshold or longer"""
+        samples = self.discard()
+        if not samples or elapsed < threshold:
+            return None
+        name = f"{datetime.now():%Y%m%d-%H%M%S}-{label.replace('.', '-')}-{elapsed * 1000:.0f}ms.folded"
+        path = os.path.join(self.out_dir, name)
+        try:
+            with open(path, 'w') as f:
+                for stack, count in samples.most_common():
+                    f.write(f"{stack} {count}\n")
+        except OSError as e:
+            if self.logger:
+                self.logger.warning(f"Could not write profile {path}: {str(e)}")
+            return None
+        if self.logger:
+            self.logger.warning(f"Slow request {label} took {elapsed * 1000:.0f}ms; profile in {path}")
+        return path
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                idents = list(self._active)
+            frames = sys._current_frames()
+            stacks = {ident: _fold(frames[ident]) for ident in idents if ident != me and ident in frames}
+            with self._lock:
+                for ident, stack in stacks.items():
+                    samples = self._active.get(ident)
+                    if samples is not None:
+                        samples[stack] += 1
+
+
+def _fold(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
@@ -0,0 +1,139 @@
+import re
+from functools import lru_cache
+from flask import current_app, g, has_request_context, request
+
+from utils.cache import TTLCache
+
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_SPACE_RE = re.compile(r"\s+")
+EXPLAINABLE = ('select', 'with', 'update', 'delete')
+EXPLAIN_COLUMNS = ('id', 'select_type', 'table', 'type', 'possible_keys', 'key', 'rows', 'filtered', 'Extra')
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """SQL with literals and placeholders replaced by ?, IN lists folded and whitespace collapsed.
+
+    Statements that differ only in their values (or the length of an IN
+    list) share a fingerprint.
+    """
+    text = _STRING_RE.sub('?', sql)
+    text = text.replace('%s', '?')
+    text = _NUMBER_RE.sub('?', text)
+    text = _IN_LIST_RE.sub('IN (...)', text)
+    return _SPACE_RE.sub(' ', text).strip()
+
+
+class QueryTracer:
+    """Per-request SQL trace fed by utils.database's cursors.
+
+    Flags a request that runs the same statement shape QUERY_REPEAT_THRESHOLD
+    times or more (usually a query in a loop, i.e. N+1), and logs statements
+    slower than SLOW_QUERY_MS with their EXPLAIN plan. Each finding is
+    logged at most once per QUERY_TRACE_LOG_INTERVAL so a hot endpoint
+    doesn't flood the log. With QUERY_TRACE_HEADER on (the default in debug
+    mode) every response carries an X-Query-Summary header.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self.slow_seconds = None
+        self.header = False
+        self._reported = TTLCache(maxsize=1024, ttl=300)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        config = app.config
+        self.enabled = config['QUERY_TRACE_ENABLED']
+        if not self.enabled:
+            return
+        self.slow_seconds = config['SLOW_QUERY_MS'] / 1000.0 if config['SLOW_QUERY_MS'] > 0 else None
+        self._reported = TTLCache(maxsize=1024, ttl=config['QUERY_TRACE_LOG_INTERVAL'])
+        header = config['QUERY_TRACE_HEADER']
+        self.header = app.debug if header is None else str(header).lower() in ['true', 'on', '1']
+        app.after_request(self._after_request)
+
+    def record(self, conn, sql, params, seconds):
+        if not self.enabled:
+            return
+        if self.slow_seconds is not None and seconds >= self.slow_seconds:
+            self._report_slow(conn, sql, params, seconds)
+        if not has_request_context():
+            return
+        trace = g.get('query_trace')
+        if trace is None:
+            trace = g.query_trace = {}
+        entry = trace.setdefault(fingerprint(sql), [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def summary(self):
+        """(statements, seconds, [(fingerprint, count, seconds)] repeated past the threshold) for this request"""
+        trace = g.get('query_trace') or {}
+        threshold = self.app.config['QUERY_REPEAT_THRESHOLD']
+        repeated = sorted(((fp, count, secs) for fp, (count, secs) in trace.items() if count >= threshold),
+                          key=lambda item: -item[1])
+        return (sum(count for count, _ in trace.values()),
+                sum(secs for _, secs in trace.values()),
+                repeated)
+
+    def _after_request(self, response):
+        if 'query_trace' not in g:
+            return response
+        total, seconds, repeated = self.summary()
+        endpoint = request.endpoint or 'unmatched'
+        for fp, count, secs in repeated:
+            if self._first_report(('repeat', endpoint, fp)):
+                current_app.logger.warning(
+                    f"Possible N+1 in {endpoint}: {count} x ({secs * 1000:.1f}ms) {fp}")
+        if self.header:
+            response.headers['X-Query-Summary'] = \
+                f"{total} queries; {seconds * 1000:.1f}ms; {len(repeated)} repeated"
+        return response
+
+    def _report_slow(self, conn, sql, params, seconds):
+        fp = fingerprint(sql)
+        if not self._first_report(('slow', fp)):
+            return
+        where = f" in {request.endpoint}" if has_request_context() else ''
+        message = f"Slow query ({seconds * 1000:.0f}ms){where}: {_SPACE_RE.sub(' ', sql).strip()}"
+        if self.app.config['SLOW_QUERY_EXPLAIN'] and fp.lower().startswith(EXPLAINABLE):
+            message += '\n' + self._explain(conn, sql, params)
+        self.app.logger.warning(message)
+
+    def _explain(self, conn, sql, params):
+        """EXPLAIN on the statement's own connection, through a separate cursor so its results survive"""
+        cursor = None
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute('EXPLAIN ' + sql, params)
+            rows = cursor.fetchall()
+        except Exception as e:
+            return f"(EXPLAIN failed: {str(e)})"
+        finally:
+            if cursor:
+                cursor.close()
+        lines = [' | '.join(EXPLAIN_COLUMNS)]
+        for row in rows:
+            lines.append(' | '.join(str(row.get(column)) for column in EXPLAIN_COLUMNS))
+        return '\n'.join(lines)
+
+    def _first_report(self, key):
+        if self._reported.get(key):
+            return False
+        self._reported.set(key, True)
+        return True
+
+
+query_tracer = None
+
+def get_query_tracer():
+    global query_tracer
+    if query_tracer is None:
+        query_tracer = QueryTracer()
+    return query_tracer
@@ -0,0 +1,44 @@
+from datetime import datetime
+from config import Config
+
+from utils.cache import TTLCache
+from utils.database import query_one
+
+# Cached in place of a row for tokens that don't exist
+INVALID = 'invalid'
+
+share_cache = TTLCache(maxsize=Config.SHARE_CACHE_SIZE, ttl=Config.SHARE_CACHE_TTL)
+
+
+def resolve_share_token(token):
+    """Share link for a live token as {file_id, allow_comments, allow_download, expires_at}, else None.
+
+    Unknown tokens are cached too (for SHARE_CACHE_NEGATIVE_TTL), so a
+    flood of bad links doesn't reach MySQL either. Expiry is checked on
+    every call, not just when the entry is loaded.
+    """
+    if not token:
+        return None
+    share = share_cache.get(token)
+    if share is None:
+        share = query_one("""
+            SELECT file_id, allow_comments, allow_download, expires_at
+            FROM shared_files
+            WHERE share_token = %s
+        """, (token,))
+        if share:
+            share_cache.set(token, share)
+        else:
+            share = INVALID
+            share_cache.set(token, share, ttl=Config.SHARE_CACHE_NEGATIVE_TTL)
+
+    if share is INVALID:
+        return None
+    if share['expires_at'] is not None and share['expires_at'] <= datetime.now():
+        return None
+    return share
+
+
+def invalidate_share(file_id):
+    """Forget cached tokens for a file after its link or permissions change"""
+    share_cache.delete_where(lambda token, share: share is not INVALID and share['file_id'] == file_id)
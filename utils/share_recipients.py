@@ -0,0 +1,68 @@
+import csv
+import io
+import re
+from email.utils import parseaddr
+
+# Same shape check as registration, anchored and without whitespace
+EMAIL_RE = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+
+
+def split_recipients(text):
+    """Addresses from free text separated by commas, semicolons, spaces or newlines;
+    "Name <addr>" entries work too"""
+    addresses = []
+    for part in re.split(r"[,;\n]", text):
+        if '<' in part:
+            addresses.append(parseaddr(part)[1] or part)
+        else:
+            addresses.extend(part.split())
+    return addresses
+
+
+def read_csv_recipients(data):
+    """Every cell that looks like an address, so header rows and name columns are skipped"""
+    text = data.decode('utf-8-sig', errors='replace') if isinstance(data, bytes) else data
+    return [cell.strip() for row in csv.reader(io.StringIO(text)) for cell in row if '@' in cell]
+
+
+def parse_recipients(addresses):
+    """Normalize, validate and dedupe in one pass, keeping input order.
+
+    Returns [{'email', 'status'}] with status 'invalid' or 'duplicate' for
+    rejects and None for addresses still to be shared with.
+    """
+    seen = set()
+    entries = []
+    for address in addresses:
+        email = address.strip().strip('<>').lower()
+        if not email:
+            continue
+        if len(email) > 254 or not EMAIL_RE.fullmatch(email):
+            status = 'invalid'
+        elif email in seen:
+            status = 'duplicate'
+        else:
+            status = None
+            seen.add(email)
+        entries.append({'email': email, 'status': status})
+    return entries
+
+
+def add_recipients(cursor, share_id, emails, user_id):
+    """Record recipients of a share link; returns the emails that were not recorded before"""
+    if not emails:
+        return []
+    placeholders = ', '.join(['%s'] * len(emails))
+    cursor.execute(f"""
+        SELECT email FROM share_recipients
+        WHERE share_id = %s AND email IN ({placeholders})
+    """, (share_id, *emails))
+    existing = {row['email'] for row in cursor.fetchall()}
+    new = [email for email in emails if email not in existing]
+    if new:
+        # mysql-connector sends an INSERT executemany as one multi-row statement
+        cursor.executemany("""
+            INSERT IGNORE INTO share_recipients (share_id, email, created_by)
+            VALUES (%s, %s, %s)
+        """, [(share_id, email, user_id) for email in new])
+    return new
@@ -0,0 +1,107 @@
+import json
+from datetime import datetime
+from flask import current_app
+
+from utils.cache import TTLCache
+from utils.database import query_one
+
+try:
+    import redis
+except ImportError:  # Optional shared backend
+    redis = None
+
+# Everything Flask-Login's current_user needs; never the password hash
+USER_COLUMNS = "id, name, email, created_at"
+
+
+class UserCache:
+    """Identity cache for the Flask-Login user loader.
+
+    A per-process LRU with a TTL, optionally backed by Redis so workers can
+    share lookups. Invalidation clears this process and the shared backend;
+    other processes' local copies expire within USER_CACHE_TTL.
+    """
+
+    def __init__(self, app=None):
+        self.local = None
+        self.shared = None
+        self.ttl = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config['USER_CACHE_TTL']
+        self.local = TTLCache(maxsize=app.config['USER_CACHE_SIZE'], ttl=self.ttl)
+        url = app.config['USER_CACHE_REDIS_URL']
+        if url:
+            if redis is None:
+                app.logger.warning("USER_CACHE_REDIS_URL is set but redis is not installed; "
+                                   "using the per-process user cache only")
+            else:
+                self.shared = redis.Redis.from_url(url)
+
+    def get(self, user_id):
+        user_data = self.local.get(user_id)
+        if user_data is not None or self.shared is None:
+            return user_data
+        try:
+            raw = self.shared.get(self._key(user_id))
+        except Exception as e:
+            current_app.logger.warning(f"Shared user cache read failed: {str(e)}")
+            return None
+        if raw is None:
+            return None
+        user_data = json.loads(raw)
+        if user_data.get('created_at'):
+            user_data['created_at'] = datetime.fromisoformat(user_data['created_at'])
+        self.local.set(user_id, user_data)
+        return user_data
+
+    def set(self, user_id, user_data):
+        self.local.set(user_id, user_data)
+        if self.shared is None:
+            return
+        try:
+            self.shared.setex(self._key(user_id), self.ttl,
+                              json.dumps(user_data, default=lambda v: v.isoformat()))
+        except Exception as e:
+            current_app.logger.warning(f"Shared user cache write failed: {str(e)}")
+
+    def invalidate(self, user_id):
+        self.local.delete(user_id)
+        if self.shared is None:
+            return
+        try:
+            self.shared.delete(self._key(user_id))
+        except Exception as e:
+            current_app.logger.warning(f"Shared user cache invalidation failed: {str(e)}")
+
+    def _key(self, user_id):
+        return f"pdfcollab:user:{user_id}"
+
+
+user_cache = None
+
+def get_user_cache():
+    global user_cache
+    if user_cache is None:
+        user_cache = UserCache()
+    return user_cache
+
+
+def load_cached_user(user_id):
+    """User for Flask-Login, from cache when possible"""
+    from models import User
+    user_id = int(user_id)
+    cache = get_user_cache()
+    user_data = cache.get(user_id)
+    if user_data is None:
+        user_data = query_one(f"SELECT {USER_COLUMNS} FROM users WHERE id = %s", (user_id,))
+        if not user_data:
+            return None
+        cache.set(user_id, user_data)
+    return User(**user_data)
+
+
+def invalidate_user(user_id):
+    get_user_cache().invalidate(int(user_id))
@@ -0,0 +1,28 @@
+import os
+import signal
+
+# The web app's own worker threads and processes are not wanted in this process
+os.environ.setdefault('JOB_WORKERS', '0')
+os.environ.setdefault('MAIL_WORKERS', '0')
+os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+
+from app import app
+
+def main():
+    count = int(os.environ.get('WORKER_THREADS', 4))
+    mail_count = int(os.environ.get('MAIL_WORKER_THREADS', 1))
+    app.job_queue.start(count)
+    app.mail_outbox.start(mail_count)
+    app.logger.info(f"Worker running with {count} job threads and {mail_count} mail threads")
+
+    def shutdown(signum, frame):
+        app.job_queue.stop()
+        app.mail_outbox.stop()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    for thread in app.job_queue.workers + app.mail_outbox.workers:
+        thread.join()
+
+if __name__ == '__main__':
+    main()